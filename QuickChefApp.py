@@ -1,248 +1,421 @@
 import tkinter as tk
 from tkinter import messagebox
-from queue import PriorityQueue
-from datetime import datetime, timedelta
-from dataclasses import dataclass
-from typing import List
-import csv
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from bootstrap import AppPaths, KitchenState, load_kitchen
+from events import EventBuffer
+from kitchen_display import display_tickets
+from menu import Menu
+from menu_store import MenuStore
+from metrics import KitchenMetrics, MetricsRegistry, log_slow_sections
+from models import Dish
+from order_board import OrderBoard, Section, TicketRows
+from order_trace import TraceRecorder
+import argparse
 import os
 
-@dataclass
-class Dish:
-    name: str
-    prep_time: int  # in minutes
-    ingredients: List[str]
-    type: str  # tapas or main dish
-
-current_dir = os.getcwd()
-
-class Order:
-
-    def __init__(self, table_number: int, dish: Dish, order_time: datetime):
-        self.table_number = table_number
-        self.dish = dish
-        self.order_time = order_time
-        self.status = "pending"
-        self.priority = order_time.timestamp()
-        self.estimated_completion = None
-
-
-    def __lt__(self, other):
-        return self.priority < other.priority
-
+EVENT_POLL_MS = 250  # how often the mainloop picks up order events
+LOAD_POLL_MS = 50  # how often the mainloop checks whether the menu and orders are loaded
+METRICS_WRITE_MS = 15000  # how often --metrics-file is rewritten
 
 class KitchenQueueSystemGUI:
-    def __init__(self, root):
+    def __init__(self, root, server=None, metrics_port=None, metrics_file=None, profile_slow=None, trace=None,
+                 paths=None):
         self.root = root
         self.root.title("Restaurant Kitchen Queue System")
-        self.tapas_queue = []  # FIFO queue for tapas
-        self.main_dishes_queue = PriorityQueue()  # Priority queue for main dishes
-        self.currently_cooking = []
-        self.completed_orders = []
-        self.tapas_orders = []  # Orders for tapas
-        self.main_dish_orders = []  # Orders for main dishes
-        self.available_dishes = []  # This will be populated dynamically
-        self.load_menu(current_dir + "/Menu.csv")  # Load the menu from the CSV file
+        self.root.protocol("WM_DELETE_WINDOW", self.exit_app)
+        self.paths = paths or AppPaths.under(os.getcwd())  # Menu.csv, Menu.db, orders.log, ...
+        # Timings of button presses and menu I/O, plus the kitchen's queues (see metrics.py)
+        self.metrics = MetricsRegistry(log_slow_sections(profile_slow) if profile_slow else None)
+        self.metrics_file = metrics_file
+        self.trace_path = trace
+        self.trace = None
+        # Filled in by adopt() once the menu and orders are loaded
+        self.menu = Menu()
+        self.menu_store = None
+        self.inventory = None
+        self.engine = None  # Holds every order; the GUI only reads and forwards actions
+        self.remote = None
+        self.prep_stats = None
+        self.history = None
+        self.events = EventBuffer()  # Order events waiting to be shown
+        self.replies = []  # (Future, callback) of actions sent to a shared server, not answered yet
+        self.menu_version = 0  # version of the shared server's menu on display
+        self.order_board = None
+        self.tickets = None  # TicketRows of the board on display, kept up to date from order events
+        self.live_board = False  # refresh on every poll (countdowns) rather than only on events
+        self.screen = None  # frame of the screen on display
+        self.screen_name = None  # set if that screen is cached
+        self.screens = {}  # name -> frame of a screen built once and shown again as it is
+        self.boards = {}  # name -> OrderBoard of a cached board screen
+        self.after_load = None  # screen asked for before loading finished
+
+        # The login screen comes up straight away while the menu and orders load on a worker thread
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.loading = executor.submit(load_kitchen, self.paths, server)
+        executor.shutdown(wait=False)
         self.create_login_screen()
+        self.root.after(LOAD_POLL_MS, self.check_loaded)
+        if metrics_port is not None:
+            self.metrics.serve(port=metrics_port)  # http://127.0.0.1:<port>/metrics
+        if metrics_file is not None:
+            self.root.after(METRICS_WRITE_MS, self.write_metrics)
 
-    def load_menu(self, file_path):
+    def timed_action(self, action):
+        return self.metrics.timer("quickchef_action_seconds", "Time spent handling a button press", action=action)
+
+    def timed_menu_io(self, op):
+        return self.metrics.timer("quickchef_menu_io_seconds", "Time spent reading or writing the menu", op=op)
+
+    def write_metrics(self):
         try:
-            with open(file_path, mode='r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip header row if there is one
-                for row in reader:
-                    name, prep_time, dish_type, ingredients = row
-                    ingredients_list = ingredients.split(", ")  # Split ingredients into a list
-                    self.available_dishes.append(Dish(name, int(prep_time), ingredients_list, dish_type))
-            print(f"Loaded {len(self.available_dishes)} dishes from {file_path}.")
-        except FileNotFoundError:
-            messagebox.showerror("File Error", f"Menu file '{file_path}' not found!")
+            self.metrics.write(self.metrics_file)
+        except OSError as e:
+            print(f"Could not write metrics to {self.metrics_file}: {e}")
+        self.root.after(METRICS_WRITE_MS, self.write_metrics)
+
+    def check_loaded(self):
+        if not self.loading.done():
+            self.root.after(LOAD_POLL_MS, self.check_loaded)
+            return
+        try:
+            state = self.loading.result()
         except Exception as e:
-            messagebox.showerror("File Error", f"An error occurred while loading the menu: {e}")
+            messagebox.showerror("Startup Error", f"Could not start the kitchen: {e}")
+            self.root.quit()
+            return
 
+        self.adopt(state)
+        for kind, title, message in state.messages:
+            (messagebox.showwarning if kind == "warning" else messagebox.showerror)(title, message)
+        self.root.after(EVENT_POLL_MS, self.poll_events)
+        if self.after_load is not None:
+            show, self.after_load = self.after_load, None
+            show()
+
+    def adopt(self, state: KitchenState):
+        # Takes over what load_kitchen read, on the Tk thread
+        self.menu = state.menu
+        self.inventory = state.inventory
+        self.engine = state.engine
+        self.remote = state.remote
+        if self.remote is not None:
+            self.menu_version = self.remote.menu_version
+        self.prep_stats = state.prep_stats
+        self.history = state.history
+        for step, seconds in state.timings.items():
+            self.metrics.histogram("quickchef_startup_seconds", "Time spent loading at startup",
+                                   step=step).observe(seconds)
+        try:
+            self.menu_store = MenuStore(self.paths.menu_db)  # this thread's own connection, for edits
+        except Exception as e:
+            state.messages.append(("error", "File Error", f"An error occurred while opening the menu: {e}"))
+        if self.remote is None:
+            KitchenMetrics(self.engine, self.metrics)
+        self.engine.subscribe(self.events.push)
+        # Every order placed (on any terminal when sharing a server), for load_generator.py to replay
+        if self.trace_path:
+            self.trace = TraceRecorder(self.trace_path)
+            self.engine.subscribe(self.trace.on_event)
+
+    def when_loaded(self, show):
+        # Shows a screen that needs the menu and orders, or says they are still loading and shows
+        # it as soon as they are in
+        if self.engine is not None:
+            show()
+            return
+        self.after_load = show
+        self.loading_label.config(text="Loading the menu and orders...")
+
+    def exit_app(self):
+        if self.engine is None:
+            try:
+                self.adopt(self.loading.result())  # let loading finish so its files are closed properly
+            except Exception:
+                pass
+        if self.engine is not None and self.engine.journal is not None:
+            self.engine.journal.close()
+        if self.menu_store is not None:
+            self.menu_store.close()
+        if self.trace is not None:
+            self.trace.close()
+        if self.remote is not None:
+            self.remote.close()
+        elif self.engine is not None:
+            self.prep_stats.save(self.paths.prep_stats)
+            self.history.close()
+        self.root.quit()
 
     def create_login_screen(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Restaurant Management System", font=("Arial", 18)).pack(pady=20)
+        if not self.open_screen("login"):
+            return
+        tk.Label(self.screen, text="Restaurant Management System", font=("Arial", 18)).pack(pady=20)
 
-        tk.Label(self.root, text="Username:", font=("Arial", 14)).pack(pady=5)
-        self.username_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Username:", font=("Arial", 14)).pack(pady=5)
+        self.username_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.username_entry.pack(pady=5)
 
-        tk.Label(self.root, text="Password:", font=("Arial", 14)).pack(pady=5)
-        self.password_entry = tk.Entry(self.root, font=("Arial", 14), show="*")
+        tk.Label(self.screen, text="Password:", font=("Arial", 14)).pack(pady=5)
+        self.password_entry = tk.Entry(self.screen, font=("Arial", 14), show="*")
         self.password_entry.pack(pady=5)
 
-        tk.Button(self.root, text="Login", font=("Arial", 14), command=self.handle_login, width=10).pack(pady=20)
+        tk.Button(self.screen, text="Login", font=("Arial", 14), command=self.handle_login, width=10).pack(pady=20)
+        self.loading_label = tk.Label(self.screen, text="", font=("Arial", 12))
+        self.loading_label.pack()
 
     def handle_login(self):
         username = self.username_entry.get().strip()
         password = self.password_entry.get().strip()
 
         if username == "admin" and password == "admin123":
-            self.main_menu()
+            self.when_loaded(self.main_menu)
         else:
             messagebox.showerror("Login Failed", "Invalid username or password")
 
     def main_menu(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Main Interface", font=("Arial", 18)).pack(pady=20)
+        if not self.open_screen("main_menu"):
+            return
+        tk.Label(self.screen, text="Main Interface", font=("Arial", 18)).pack(pady=20)
 
-        tk.Button(self.root, text="Chef Interface", font=("Arial", 14), command=self.chef_menu, width=20).pack(pady=10)
-        tk.Button(self.root, text="Waiter Interface", font=("Arial", 14), command=self.waiter_menu, width=20).pack(
+        tk.Button(self.screen, text="Chef Interface", font=("Arial", 14), command=self.chef_menu, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Waiter Interface", font=("Arial", 14), command=self.waiter_menu, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="Exit", font=("Arial", 14), command=self.root.quit, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Exit", font=("Arial", 14), command=self.exit_app, width=20).pack(pady=10)
 
     def chef_menu(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Chef Interface", font=("Arial", 18)).pack(pady=20)
+        if not self.open_screen("chef_menu"):
+            return
+        tk.Label(self.screen, text="Chef Interface", font=("Arial", 18)).pack(pady=20)
 
-        tk.Button(self.root, text="View Orders", font=("Arial", 14), command=self.view_orders, width=20).pack(
+        tk.Button(self.screen, text="View Orders", font=("Arial", 14), command=self.view_orders, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="Start Cooking", font=("Arial", 14), command=self.start_cooking, width=20).pack(
+        tk.Button(self.screen, text="Start Cooking", font=("Arial", 14), command=self.start_cooking, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="View Currently Preparing", font=("Arial", 14), command=self.currently_preparing,
+        tk.Button(self.screen, text="View Currently Preparing", font=("Arial", 14), command=self.currently_preparing,
+                  width=20).pack(pady=10)
+        tk.Button(self.screen, text="Send Out Completed Dishes", font=("Arial", 14), command=self.send_out_dish,
                   width=20).pack(pady=10)
-        tk.Button(self.root, text="Send Out Completed Dishes", font=("Arial", 14), command=self.send_out_dish,
+        tk.Button(self.screen, text="Kitchen Display", font=("Arial", 14), command=self.kitchen_display,
                   width=20).pack(pady=10)
-        tk.Button(self.root, text="Menu Management", font=("Arial", 14), command=self.menu_management, width=20).pack(
+        tk.Button(self.screen, text="Menu Management", font=("Arial", 14), command=self.menu_management, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="Back to Main Menu", font=("Arial", 14), command=self.main_menu, width=20).pack(
+        tk.Button(self.screen, text="Back to Main Menu", font=("Arial", 14), command=self.main_menu, width=20).pack(
             pady=10)
 
 
-    def view_orders(self):
-        self.clear_screen()
-        tk.Label(self.root, text="View Orders", font=("Arial", 18)).pack(pady=20)
-
-        # Display tapas orders
-        tk.Label(self.root, text="Tapas Orders", font=("Arial", 16)).pack(pady=10)
-        if not self.tapas_orders:
-            tk.Label(self.root, text="No Tapas Orders.", font=("Arial", 14)).pack(pady=5)
+    def show_board(self, title, board_rows, on_click=None, name=None):
+        # Shared layout of the order and menu lists: one virtualised board instead of a widget per
+        # row. A named board screen is built once and only refreshed when shown again. Returns
+        # True when the caller still has to add its buttons below the board.
+        built = self.open_screen(name)
+        if built:
+            tk.Label(self.screen, text=title, font=("Arial", 18)).pack(pady=20)
+            self.boards[name] = OrderBoard(self.screen, on_click=on_click)
+            self.boards[name].pack(pady=10, fill="both", expand=True)
+        self.order_board = self.boards[name]
+        self.board_rows = board_rows  # called again to reload the board
+        self.refresh_board()
+        return built
+
+    def refresh_board(self):
+        # Reloads the whole board; between reloads, TicketRows boards follow the order events
+        rows = self.board_rows()
+        self.tickets = rows if isinstance(rows, TicketRows) else None
+        self.order_board.set_rows(rows)
+
+    def act(self, action, call, done=None):
+        # Runs a button's engine action and hands its result to `done`. A shared server answers
+        # later: the reply (or error) is picked up by poll_events, so the mainloop never waits on
+        # the network.
+        try:
+            with self.timed_action(action):
+                result = call()
+        except ValueError as e:  # StockOutError too
+            messagebox.showerror("Error", str(e))
+            return
+        if isinstance(result, Future):
+            self.replies.append((result, done))
+        elif done is not None:
+            done(result)
+
+    def take_replies(self):
+        waiting = []
+        for reply, done in self.replies:
+            if not reply.done():
+                waiting.append((reply, done))
+                continue
+            try:
+                result = reply.result()
+            except (ValueError, ConnectionError, TimeoutError) as e:  # ServerError is a ValueError
+                messagebox.showerror("Error", str(e))
+                continue
+            if done is not None:
+                done(result)
+        self.replies = waiting
+
+    def poll_events(self):
+        # Marks dishes whose time is up as ready (freeing their slots for the next orders), moves
+        # the tickets in everything the engine published since the last poll, redraws the rows in
+        # view, then returns to the mainloop straight away. A shared server keeps its own clock,
+        # and its answers to this terminal's actions and edits to its menu come in here too.
+        if self.remote is None:
+            self.engine.tick()
         else:
-            for order in self.tapas_orders:
-                tk.Label(self.root, text=f"Table {order.table_number}: {order.dish.name}", font=("Arial", 14)).pack()
+            if self.replies:
+                self.take_replies()
+            if self.remote.menu_version != self.menu_version:
+                self.menu_version = self.remote.menu_version
+                self.menu = self.remote.menu()
+        events = self.events.drain()
+        if self.tickets is not None and (self.tickets.apply(events) or self.live_board):
+            self.order_board.refresh()
+        self.root.after(EVENT_POLL_MS, self.poll_events)
+
+    def kitchen_display(self):
+        built = self.show_board("Kitchen Display", lambda: display_tickets(self.engine),
+                                on_click=self.send_out_from_display, name="kitchen_display")
+        self.live_board = True
+        if not built:
+            return
+        tk.Label(self.screen, text="Click a dish when it is done, then click it at the pass to send it out.",
+                 font=("Arial", 12)).pack()
+        tk.Button(self.screen, text="Start Cooking", font=("Arial", 14), command=lambda: self.act("start_cooking", self.engine.start_cooking),
+                  width=20).pack(pady=10)
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.chef_menu, width=20).pack(pady=10)
 
-        # Display main dish orders
-        tk.Label(self.root, text="Main Dish Orders", font=("Arial", 16)).pack(pady=10)
-        if not self.main_dish_orders:
-            tk.Label(self.root, text="No Main Dish Orders.", font=("Arial", 14)).pack(pady=5)
+    def send_out_from_display(self, order_id):
+        # A dish on the stove, or one whose time is up, is called done; a ready one is sent out
+        order = self.engine.get_order(order_id)
+        if order is not None and order.status in ("cooking", "due"):
+            self.act("mark_ready", lambda: self.engine.mark_ready(order_id))
         else:
-            for order in self.main_dish_orders:
-                tk.Label(self.root, text=f"Table {order.table_number}: {order.dish.name}", font=("Arial", 14)).pack()
+            self.act("send_out", lambda: self.engine.complete_order(order_id))
+
+    def view_orders(self):
+        if not self.show_board("View Orders", self.pending_rows, name="view_orders"):
+            return
 
         # Buttons for navigation
-        tk.Button(self.root, text="To Chef Interface", font=("Arial", 14), command=self.chef_menu, width=20).pack(
+        tk.Button(self.screen, text="To Chef Interface", font=("Arial", 14), command=self.chef_menu, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="To Waiter Interface", font=("Arial", 14), command=self.waiter_menu, width=20).pack(
+        tk.Button(self.screen, text="To Waiter Interface", font=("Arial", 14), command=self.waiter_menu, width=20).pack(
             pady=10)
 
-    def start_cooking(self):
-        # Cooking limits
-        tapas_limit = 3
-        main_dish_limit = 2
-
-        # Add up to 3 tapas to the currently cooking list
-        while len([o for o in self.currently_cooking if o.dish.type == "tapas"]) < tapas_limit and self.tapas_orders:
-            order = self.tapas_orders.pop(0)
-            self.currently_cooking.append(order)
-
-        # Sort main dish orders by preparation time (highest first)
-        self.main_dish_orders.sort(key=lambda o: o.dish.prep_time, reverse=True)
+    def pending_rows(self):
+        # Waiting orders of every station, in the order they will be started
+        snapshot = self.engine.snapshot()
+        tickets = TicketRows([Section(station, f"{station.title()} Orders",
+                                      lambda order: f"Table {order.table_number}: {order.dish.name}",
+                                      f"No {station.title()} Orders.", sort_key=lambda order: order.priority)
+                              for station in snapshot.pending],
+                             lambda order: order.station if order.status == "pending" else None)
+        tickets.load(order for orders in snapshot.pending.values() for order in orders)
+        return tickets
 
-        # Add up to 2 main dishes to the currently cooking list
-        while len([o for o in self.currently_cooking if
-                   o.dish.type == "main dish"]) < main_dish_limit and self.main_dish_orders:
-            order = self.main_dish_orders.pop(0)
-            self.currently_cooking.append(order)
+    def start_cooking(self):
+        # The engine admits orders until every station's slots are full (see Stations.csv or default_stations)
+        self.act("start_cooking", self.engine.start_cooking, self.show_started)
 
-        if not self.currently_cooking:
+    def show_started(self, started):
+        if not started:
             messagebox.showinfo("No Orders", "No orders available to start cooking.")
         else:
-            cooking_dishes = ", ".join([order.dish.name for order in self.currently_cooking])
+            cooking_dishes = ", ".join([order.dish.name for order in started])
             messagebox.showinfo("Cooking", f"Started cooking: {cooking_dishes}")
 
     def currently_preparing(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Currently Preparing", font=("Arial", 18)).pack(pady=20)
-
-        # Display tapas currently being prepared
-        tk.Label(self.root, text="Tapas", font=("Arial", 16)).pack(pady=10)
-        tapas_preparing = [order for order in self.currently_cooking if order.dish.type == "tapas"]
-        if not tapas_preparing:
-            tk.Label(self.root, text="No tapas are being prepared.", font=("Arial", 14)).pack(pady=5)
-        else:
-            for order in tapas_preparing:
-                tk.Label(self.root, text=f"Table {order.table_number}: {order.dish.name} ({order.dish.prep_time} min)",
-                         font=("Arial", 14)).pack(pady=5)
-
-        # Display main dishes currently being prepared
-        tk.Label(self.root, text="Main Dishes", font=("Arial", 16)).pack(pady=10)
-        main_dishes_preparing = [order for order in self.currently_cooking if order.dish.type == "main dish"]
-        if not main_dishes_preparing:
-            tk.Label(self.root, text="No main dishes are being prepared.", font=("Arial", 14)).pack(pady=5)
-        else:
-            for order in main_dishes_preparing:
-                tk.Label(self.root, text=f"Table {order.table_number}: {order.dish.name} ({order.dish.prep_time} min)",
-                         font=("Arial", 14)).pack(pady=5)
-
-
-        tk.Button(self.root, text="Back", font=("Arial", 14), command=self.chef_menu, width=20).pack(pady=20)
+        if not self.show_board("Currently Preparing", self.preparing_rows, name="currently_preparing"):
+            return
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.chef_menu, width=20).pack(pady=20)
+
+    def preparing_rows(self):
+        snapshot = self.engine.snapshot()
+        tickets = TicketRows([Section(station, station.title(),  # every station, in the order they were configured
+                                      lambda order: f"Table {order.table_number}: {order.dish.name} "
+                                                    f"({order.prep_estimate:.0f} min)",
+                                      f"Nothing is being prepared at {station}.")
+                              for station in snapshot.pending],
+                             lambda order: order.station if order.status == "cooking" else None)
+        tickets.load(snapshot.currently_cooking)
+        return tickets
 
     def send_out_dish(self):
-        if not self.currently_cooking:
+        snapshot = self.engine.snapshot()
+        if not snapshot.ready and not snapshot.currently_cooking:
             messagebox.showinfo("No Dishes", "No dishes are currently being prepared.")
             return
 
-        self.clear_screen()
-        tk.Label(self.root, text="Select Dish to Send Out", font=("Arial", 18)).pack(pady=20)
-
-        for idx, order in enumerate(self.currently_cooking):
-            dish_info = f"{idx + 1}. Table {order.table_number}: {order.dish.name} ({order.dish.type})"
-            tk.Button(self.root, text=dish_info, font=("Arial", 14),
-                      command=lambda i=idx: self.complete_and_send_out(i), width=40).pack(pady=5)
-
-        tk.Button(self.root, text="Back", font=("Arial", 14), command=self.chef_menu, width=20).pack(pady=10)
-
-    def complete_and_send_out(self, index):
-        order = self.currently_cooking.pop(index)
-        self.completed_orders.append(order)
+        if not self.show_board("Select Dish to Send Out", self.send_out_rows, on_click=self.complete_and_send_out,
+                               name="send_out"):
+            return
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.chef_menu, width=20).pack(pady=10)
+
+    def send_out_rows(self):
+        # Ready dishes first, then the ones still on the stove
+        snapshot = self.engine.snapshot()
+        tickets = TicketRows([Section(status, f"{status.title()}:",
+                                      lambda order: f"Table {order.table_number}: {order.dish.name} "
+                                                    f"({order.dish.type}) - {order.status}",
+                                      f"Nothing {status}.")
+                              for status in ("ready", "cooking")],
+                             lambda order: "ready" if order.status == "due" else order.status)
+        tickets.load(snapshot.ready + snapshot.currently_cooking)
+        return tickets
+
+    def complete_and_send_out(self, order_id):
+        self.act("send_out", lambda: self.engine.complete_order(order_id), self.sent_out)
+
+    def sent_out(self, order):
         messagebox.showinfo("Dish Completed", f"{order.dish.name} for Table {order.table_number} sent out!")
-        self.send_out_dish()
+        if self.screen_name != "send_out":
+            return  # a shared server answered after the chef moved on
+        snapshot = self.engine.snapshot()  # a shared server's may not have caught up with this order yet
+        if any(other.order_id != order.order_id for other in snapshot.ready + snapshot.currently_cooking):
+            self.refresh_board()
+        else:
+            self.chef_menu()
 
     def menu_management(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Menu Management", font=("Arial", 18)).pack(pady=20)
-        tk.Button(self.root, text="Add New Dish", font=("Arial", 14), command=self.add_new_dish, width=20).pack(pady=10)
-        tk.Button(self.root, text="Delete Recipe", font=("Arial", 14), command=self.delete_recipe, width=20).pack(
+        if not self.open_screen("menu_management"):
+            return
+        tk.Label(self.screen, text="Menu Management", font=("Arial", 18)).pack(pady=20)
+        tk.Button(self.screen, text="Add New Dish", font=("Arial", 14), command=self.add_new_dish, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Delete Recipe", font=("Arial", 14), command=self.delete_recipe, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="Edit Recipe", font=("Arial", 14), command=self.edit_recipe, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Edit Recipe", font=("Arial", 14), command=self.edit_recipe, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Ingredient Stock", font=("Arial", 14), command=self.ingredient_stock,
+                  width=20).pack(pady=10)
+        tk.Button(self.screen, text="Export Menu to CSV", font=("Arial", 14), command=self.export_menu_csv,
+                  width=20).pack(pady=10)
+        if self.remote is None:
+            tk.Button(self.screen, text="Export Prep Times", font=("Arial", 14), command=self.export_prep_times,
+                      width=20).pack(pady=10)
 
-        tk.Button(self.root, text="Back to Chef Interface", font=("Arial", 14), command=self.chef_menu, width=20).pack(
+        tk.Button(self.screen, text="Back to Chef Interface", font=("Arial", 14), command=self.chef_menu, width=20).pack(
             pady=20)
 
     def add_new_dish(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Add New Dish", font=("Arial", 18)).pack(pady=20)
+        self.open_screen()
+        tk.Label(self.screen, text="Add New Dish", font=("Arial", 18)).pack(pady=20)
 
-        tk.Label(self.root, text="Dish Name:", font=("Arial", 14)).pack(pady=5)
-        self.new_dish_name_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Dish Name:", font=("Arial", 14)).pack(pady=5)
+        self.new_dish_name_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.new_dish_name_entry.pack(pady=5)
 
-        tk.Label(self.root, text="Dish Type (main dish or tapas):", font=("Arial", 14)).pack(pady=5)
-        self.new_dish_type_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Dish Type (e.g. main dish, tapas):", font=("Arial", 14)).pack(pady=5)
+        self.new_dish_type_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.new_dish_type_entry.pack(pady=5)
 
-        tk.Label(self.root, text="Ingredients (comma separated):", font=("Arial", 14)).pack(pady=5)
-        self.new_dish_ingredients_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Ingredients (comma separated):", font=("Arial", 14)).pack(pady=5)
+        self.new_dish_ingredients_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.new_dish_ingredients_entry.pack(pady=5)
 
-        tk.Label(self.root, text="Preparation Time (in minutes):", font=("Arial", 14)).pack(pady=5)
-        self.new_dish_prep_time_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Preparation Time (in minutes):", font=("Arial", 14)).pack(pady=5)
+        self.new_dish_prep_time_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.new_dish_prep_time_entry.pack(pady=5)
 
-        tk.Button(self.root, text="Add Dish", font=("Arial", 14), command=self.save_new_dish, width=20).pack(pady=10)
-        tk.Button(self.root, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Add Dish", font=("Arial", 14), command=self.save_new_dish, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
 
     def save_new_dish(self):
         name = self.new_dish_name_entry.get().strip()
@@ -255,8 +428,8 @@ class KitchenQueueSystemGUI:
             messagebox.showerror("Input Error", "All fields are required.")
             return
 
-        if dish_type not in ["main dish", "tapas"]:
-            messagebox.showerror("Input Error", "Dish type must be 'main dish' or 'tapas'.")
+        if not self.engine.cooks(dish_type):
+            messagebox.showerror("Input Error", f"No station cooks '{dish_type}' dishes. Add it to Stations.csv first.")
             return
 
         try:
@@ -264,17 +437,19 @@ class KitchenQueueSystemGUI:
         except ValueError:
             messagebox.showerror("Input Error", "Preparation time must be a valid number.")
             return
+        if prep_time <= 0:
+            messagebox.showerror("Input Error", "Preparation time must be at least 1 minute.")
+            return
 
-        # Save the new dish to the CSV file
+        # Save the new dish to the menu store
         try:
-            with open(current_dir + "/Menu.csv", mode='a', encoding='utf-8', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([name, prep_time, dish_type, ingredients])
-
-            # Update the available dishes list
             ingredients_list = ingredients.split(", ")
             new_dish = Dish(name, prep_time, ingredients_list, dish_type)
-            self.available_dishes.append(new_dish)
+            with self.timed_menu_io("add"):
+                self.menu_store.add_dish(new_dish)
+
+            # Update the menu catalogue
+            self.menu.add(new_dish)
 
             messagebox.showinfo("Success", f"New dish '{name}' added successfully!")
             self.chef_menu()  # Go back to the chef menu
@@ -283,18 +458,18 @@ class KitchenQueueSystemGUI:
             messagebox.showerror("Error", f"An error occurred while saving the dish: {e}")
 
     def delete_recipe(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Delete Recipe", font=("Arial", 18)).pack(pady=20)
+        self.open_screen()
+        tk.Label(self.screen, text="Delete Recipe", font=("Arial", 18)).pack(pady=20)
 
         # Create a dropdown list of available dishes
-        dish_names = [dish.name for dish in self.available_dishes]
+        dish_names = self.menu.names()
         self.dish_to_delete = tk.StringVar(value="Select a dish to delete")
-        tk.OptionMenu(self.root, self.dish_to_delete, *dish_names).pack(pady=5)
+        tk.OptionMenu(self.screen, self.dish_to_delete, *dish_names).pack(pady=5)
 
         # Button to confirm deletion
-        tk.Button(self.root, text="Delete", font=("Arial", 14), command=self.confirm_delete_recipe, width=20).pack(
+        tk.Button(self.screen, text="Delete", font=("Arial", 14), command=self.confirm_delete_recipe, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
 
     def confirm_delete_recipe(self):
         dish_name = self.dish_to_delete.get()
@@ -303,45 +478,140 @@ class KitchenQueueSystemGUI:
             messagebox.showerror("Invalid Selection", "Please select a dish to delete.")
             return
 
-        # Find the dish object in available_dishes
-        dish_to_delete = next((dish for dish in self.available_dishes if dish.name == dish_name), None)
+        dish_to_delete = self.menu.get(dish_name)
 
         if dish_to_delete:
-            # Remove from the list of available dishes
-            self.available_dishes = [dish for dish in self.available_dishes if dish != dish_to_delete]
+            # Delete only this dish from the menu store
+            try:
+                with self.timed_menu_io("delete"):
+                    self.menu_store.delete_dish(dish_name)
+            except Exception as e:
+                messagebox.showerror("File Error", f"An error occurred while updating the menu: {e}")
+                return
 
-            # Update the CSV file by rewriting it without the deleted dish
-            self.update_menu_csv()
+            # Remove from the menu catalogue
+            self.menu.remove(dish_name)
 
             messagebox.showinfo("Success", f"Dish '{dish_name}' has been deleted successfully!")
             self.chef_menu()
         else:
             messagebox.showerror("Error", "Dish not found.")
 
-    def update_menu_csv(self):
+    def ingredient_stock(self):
+        self.open_screen()
+        tk.Label(self.screen, text="Ingredient Stock", font=("Arial", 18)).pack(pady=20)
 
+        tk.Label(self.screen, text="Ingredient:", font=("Arial", 14)).pack(pady=5)
+        self.ingredient_entry = tk.Entry(self.screen, font=("Arial", 14))
+        self.ingredient_entry.pack(pady=5)
+
+        tk.Label(self.screen, text="Portions in stock:", font=("Arial", 14)).pack(pady=5)
+        self.stock_quantity_entry = tk.Entry(self.screen, font=("Arial", 14))
+        self.stock_quantity_entry.pack(pady=5)
+
+        tk.Button(self.screen, text="Set Stock Level", font=("Arial", 14), command=self.set_stock_level,
+                  width=20).pack(pady=10)
+        tk.Button(self.screen, text="Mark Out of Stock", font=("Arial", 14), command=lambda: self.set_ingredient_stock(False),
+                  width=20).pack(pady=10)
+        tk.Button(self.screen, text="Mark Back in Stock", font=("Arial", 14), command=lambda: self.set_ingredient_stock(True),
+                  width=20).pack(pady=10)
+
+        self.stock_frame = tk.Frame(self.screen)
+        self.stock_frame.pack()
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
+
+        # A shared server keeps the stock for every terminal, so its levels fill in when it answers
+        if self.remote is None:
+            self.show_stock((self.menu.out_of_stock(), self.inventory.levels(),
+                             self.inventory.projections(datetime.now().timestamp())))
+        else:
+            self.act("stock", self.remote.stock, self.show_stock)
+
+    def show_stock(self, stock):
+        out_of_stock, levels, projections = stock
+        if not self.stock_frame.winfo_exists():
+            return  # left the screen before the server answered
+        text = "Out of stock: " + ", ".join(out_of_stock) if out_of_stock else "Every ingredient is in stock."
+        tk.Label(self.stock_frame, text=text, font=("Arial", 14)).pack(pady=5)
+        for ingredient, portions in levels.items():
+            minutes_left = projections[ingredient]
+            runs_out = f", runs out in ~{minutes_left:.0f} min" if minutes_left is not None else ""
+            tk.Label(self.stock_frame, text=f"{ingredient}: {portions:g} portions{runs_out}", font=("Arial", 14)).pack()
+
+    def set_stock_level(self):
+        ingredient = self.ingredient_entry.get().strip()
         try:
-            with open(current_dir + "/Menu.csv", mode='w', encoding='utf-8', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(["name", "prep_time", "type", "ingredients"])  # Write the header
-                for dish in self.available_dishes:
-                    writer.writerow([dish.name, dish.prep_time, dish.type, ", ".join(dish.ingredients)])
-            print(f"Menu updated, {len(self.available_dishes)} dishes remaining.")
+            quantity = int(self.stock_quantity_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Input Error", "Portions must be a whole number.")
+            return
+        if not ingredient:
+            messagebox.showerror("Input Error", "Please enter an ingredient.")
+            return
+
+        if self.remote is None:
+            self.inventory.set_stock(ingredient, quantity)
+            self.ingredient_stock()
+        else:
+            self.act("set_stock", lambda: self.remote.set_stock(ingredient, quantity),
+                     lambda _: self.ingredient_stock())
+
+    def set_ingredient_stock(self, in_stock):
+        ingredient = self.ingredient_entry.get().strip()
+        if not ingredient:
+            messagebox.showerror("Input Error", "Please enter an ingredient.")
+            return
+
+        if self.remote is not None:
+            # 86'd on the server, so on every terminal; the menu follows in poll_events
+            change = self.remote.mark_in_stock if in_stock else self.remote.mark_out_of_stock
+            self.act("in_stock" if in_stock else "out_of_stock", lambda: change(ingredient),
+                     lambda result: self.stock_changed(in_stock, ingredient, *result))
+        elif in_stock:
+            dishes = self.menu.mark_in_stock(ingredient)
+            self.stock_changed(True, ingredient, [dish.name for dish in dishes], self.inventory.available(ingredient))
+        else:
+            dishes = self.menu.mark_out_of_stock(ingredient)
+            self.stock_changed(False, ingredient, [dish.name for dish in dishes], None)
+
+    def stock_changed(self, in_stock, ingredient, dish_names, portions):
+        if in_stock:
+            message = "Available again: "
+            if portions is not None and portions < 1:
+                message = f"No portions of {ingredient} are left; set a stock level to bring it back. " + message
+        else:
+            message = "86'd: "
+        messagebox.showinfo("Ingredient Stock", message + (", ".join(dish_names) or "no dishes"))
+        self.ingredient_stock()
+
+    def export_menu_csv(self):
+        try:
+            with self.timed_menu_io("export"):
+                count = self.menu_store.export_csv(self.paths.menu_csv)
+            messagebox.showinfo("Success", f"Exported {count} dishes to {self.paths.menu_csv}.")
         except Exception as e:
-            messagebox.showerror("File Error", f"An error occurred while updating the menu: {e}")
+            messagebox.showerror("File Error", f"An error occurred while exporting the menu: {e}")
+
+    def export_prep_times(self):
+        # How long each dish really took (and how each station compares to the typed times)
+        try:
+            count = self.prep_stats.export_csv(self.paths.prep_times_csv)
+            messagebox.showinfo("Success", f"Exported prep times of {count} dishes and stations to prep_times.csv.")
+        except OSError as e:
+            messagebox.showerror("File Error", f"An error occurred while exporting the prep times: {e}")
 
     def edit_recipe(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Edit Recipe", font=("Arial", 18)).pack(pady=20)
+        self.open_screen()
+        tk.Label(self.screen, text="Edit Recipe", font=("Arial", 18)).pack(pady=20)
 
-        tk.Label(self.root, text="Select Recipe to Edit:", font=("Arial", 14)).pack(pady=5)
+        tk.Label(self.screen, text="Select Recipe to Edit:", font=("Arial", 14)).pack(pady=5)
         self.recipe_var = tk.StringVar(value="Select a recipe")
-        recipe_names = [dish.name for dish in self.available_dishes]
-        tk.OptionMenu(self.root, self.recipe_var, *recipe_names).pack(pady=5)
+        recipe_names = self.menu.names()
+        tk.OptionMenu(self.screen, self.recipe_var, *recipe_names).pack(pady=5)
 
-        tk.Button(self.root, text="Edit Selected Recipe", font=("Arial", 14), command=self.edit_selected_recipe,
+        tk.Button(self.screen, text="Edit Selected Recipe", font=("Arial", 14), command=self.edit_selected_recipe,
                   width=20).pack(pady=10)
-        tk.Button(self.root, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
 
     def edit_selected_recipe(self):
         selected_recipe_name = self.recipe_var.get()
@@ -349,37 +619,37 @@ class KitchenQueueSystemGUI:
             messagebox.showerror("Error", "Please select a recipe to edit.")
             return
 
-        self.selected_dish = next((dish for dish in self.available_dishes if dish.name == selected_recipe_name), None)
+        self.selected_dish = self.menu.get(selected_recipe_name)
         if not self.selected_dish:
             messagebox.showerror("Error", "Recipe not found.")
             return
 
-        self.clear_screen()
-        tk.Label(self.root, text=f"Editing Recipe: {self.selected_dish.name}", font=("Arial", 18)).pack(pady=20)
+        self.open_screen()
+        tk.Label(self.screen, text=f"Editing Recipe: {self.selected_dish.name}", font=("Arial", 18)).pack(pady=20)
 
-        tk.Label(self.root, text="Name:", font=("Arial", 14)).pack(pady=5)
-        self.new_name_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Name:", font=("Arial", 14)).pack(pady=5)
+        self.new_name_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.new_name_entry.insert(0, self.selected_dish.name)
         self.new_name_entry.pack(pady=5)
 
-        tk.Label(self.root, text="Preparation Time (minutes):", font=("Arial", 14)).pack(pady=5)
-        self.new_prep_time_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Preparation Time (minutes):", font=("Arial", 14)).pack(pady=5)
+        self.new_prep_time_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.new_prep_time_entry.insert(0, str(self.selected_dish.prep_time))
         self.new_prep_time_entry.pack(pady=5)
 
-        tk.Label(self.root, text="Type (tapas/main dish):", font=("Arial", 14)).pack(pady=5)
-        self.new_type_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Type (e.g. main dish, tapas):", font=("Arial", 14)).pack(pady=5)
+        self.new_type_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.new_type_entry.insert(0, self.selected_dish.type)
         self.new_type_entry.pack(pady=5)
 
-        tk.Label(self.root, text="Ingredients (comma-separated):", font=("Arial", 14)).pack(pady=5)
-        self.new_ingredients_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Ingredients (comma-separated):", font=("Arial", 14)).pack(pady=5)
+        self.new_ingredients_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.new_ingredients_entry.insert(0, ", ".join(self.selected_dish.ingredients))
         self.new_ingredients_entry.pack(pady=5)
 
-        tk.Button(self.root, text="Save Changes", font=("Arial", 14), command=self.save_recipe_changes, width=20).pack(
+        tk.Button(self.screen, text="Save Changes", font=("Arial", 14), command=self.save_recipe_changes, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.menu_management, width=20).pack(pady=10)
 
     def save_recipe_changes(self):
         new_name = self.new_name_entry.get().strip()
@@ -388,63 +658,65 @@ class KitchenQueueSystemGUI:
         except ValueError:
             messagebox.showerror("Error", "Preparation time must be a number.")
             return
+        if new_prep_time <= 0:
+            messagebox.showerror("Error", "Preparation time must be at least 1 minute.")
+            return
 
-        new_type = self.new_type_entry.get().strip()
+        new_type = self.new_type_entry.get().strip().lower()
         new_ingredients = self.new_ingredients_entry.get().strip().split(", ")
 
         if not new_name or not new_type or not new_ingredients:
             messagebox.showerror("Error", "All fields must be filled out.")
             return
 
-        # Update the dish in available_dishes
-        self.selected_dish.name = new_name
-        self.selected_dish.prep_time = new_prep_time
-        self.selected_dish.type = new_type
-        self.selected_dish.ingredients = new_ingredients
+        if not self.engine.cooks(new_type):
+            messagebox.showerror("Error", f"No station cooks '{new_type}' dishes. Add it to Stations.csv first.")
+            return
 
-        # Update the CSV file
+        # Update the dish in the menu store, then in the menu catalogue
+        changes = Dish(new_name, new_prep_time, new_ingredients, new_type)
         try:
-            with open(current_dir + "/Menu.csv", mode="w", encoding="utf-8", newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow(["name", "prep_time", "type", "ingredients"])  # Write header
-                for dish in self.available_dishes:
-                    writer.writerow([dish.name, dish.prep_time, dish.type, ", ".join(dish.ingredients)])
-            messagebox.showinfo("Success", "Recipe updated successfully!")
+            with self.timed_menu_io("update"):
+                self.menu_store.update_dish(self.selected_dish.name, changes)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update the recipe: {e}")
             return
 
+        self.menu.update(self.selected_dish.name, changes)
+        messagebox.showinfo("Success", "Recipe updated successfully!")
+
         self.menu_management()
 
     def waiter_menu(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Waiter Interface", font=("Arial", 18)).pack(pady=20)
+        if not self.open_screen("waiter_menu"):
+            return
+        tk.Label(self.screen, text="Waiter Interface", font=("Arial", 18)).pack(pady=20)
 
-        tk.Button(self.root, text="Add New Order", font=("Arial", 14), command=self.add_order, width=20).pack(
+        tk.Button(self.screen, text="Add New Order", font=("Arial", 14), command=self.add_order, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="View Orders", font=("Arial", 14), command=self.view_orders, width=20).pack(
+        tk.Button(self.screen, text="View Orders", font=("Arial", 14), command=self.view_orders, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="Display Menu", font=("Arial", 14), command=self.display_menu, width=20).pack(
+        tk.Button(self.screen, text="Display Menu", font=("Arial", 14), command=self.display_menu, width=20).pack(
             pady=10)
-        tk.Button(self.root, text="Back to Main Menu", font=("Arial", 14), command=self.main_menu, width=20).pack(
+        tk.Button(self.screen, text="Back to Main Menu", font=("Arial", 14), command=self.main_menu, width=20).pack(
             pady=10)
 
 
     def add_order(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Add New Order", font=("Arial", 18)).pack(pady=20)
+        self.open_screen()
+        tk.Label(self.screen, text="Add New Order", font=("Arial", 18)).pack(pady=20)
 
-        tk.Label(self.root, text="Table Number:", font=("Arial", 14)).pack(pady=5)
-        self.table_number_entry = tk.Entry(self.root, font=("Arial", 14))
+        tk.Label(self.screen, text="Table Number:", font=("Arial", 14)).pack(pady=5)
+        self.table_number_entry = tk.Entry(self.screen, font=("Arial", 14))
         self.table_number_entry.pack(pady=5)
 
-        tk.Label(self.root, text="Select Dish:", font=("Arial", 14)).pack(pady=5)
+        tk.Label(self.screen, text="Select Dish:", font=("Arial", 14)).pack(pady=5)
         self.dish_var = tk.StringVar(value="Select a dish")
-        dish_options = [dish.name for dish in self.available_dishes]
-        tk.OptionMenu(self.root, self.dish_var, *dish_options).pack(pady=5)
+        dish_options = [dish.name for dish in self.menu.available()]
+        tk.OptionMenu(self.screen, self.dish_var, *dish_options).pack(pady=5)
 
-        tk.Button(self.root, text="Place Order", font=("Arial", 14), command=self.place_order, width=20).pack(pady=10)
-        tk.Button(self.root, text="Back", font=("Arial", 14), command=self.waiter_menu, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Place Order", font=("Arial", 14), command=self.place_order, width=20).pack(pady=10)
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.waiter_menu, width=20).pack(pady=10)
 
     def place_order(self):
         try:
@@ -458,47 +730,76 @@ class KitchenQueueSystemGUI:
             messagebox.showerror("Invalid Input", "Please select a dish.")
             return
 
-        dish = next((d for d in self.available_dishes if d.name == dish_name), None)
+        dish = self.menu.get(dish_name)
         if not dish:
             messagebox.showerror("Error", "Dish not found.")
             return
 
-        order_time = datetime.now()
-        order = Order(table_number, dish, order_time)
-
-        if dish.type == "tapas":
-            self.tapas_orders.append(order)
-        elif dish.type == "main dish":
-            self.main_dish_orders.append(order)
-
-        messagebox.showinfo("Success", f"Order for {dish_name} added successfully!")
-        self.waiter_menu()
+        if not self.menu.is_available(dish_name):
+            messagebox.showerror("Unavailable", f"{dish_name} is 86'd: an ingredient is out of stock.")
+            return
 
-        if dish.type == "tapas":
-            self.tapas_queue.append(order)
-        elif dish.type == "main dish":
-            self.main_dishes_queue.put(order)
+        self.act("place_order", lambda: self.engine.submit_order(table_number, dish, datetime.now()),
+                 self.order_placed)
 
-        messagebox.showinfo("Success", f"Order for {dish_name} added successfully!")
+    def order_placed(self, order):
+        messagebox.showinfo("Success", f"Order for {order.dish.name} added successfully!")
         self.waiter_menu()
 
     def display_menu(self):
-        self.clear_screen()
-        tk.Label(self.root, text="Available Dishes", font=("Arial", 18)).pack(pady=20)
-
-        for dish in self.available_dishes:
-            ingredients_str = ", ".join(dish.ingredients)  # Convert ingredients list to a comma-separated string
-            tk.Label(self.root,
-                     text=f"{dish.name} ({dish.type}) - {dish.prep_time} min\nIngredients: {ingredients_str}",
-                     font=("Arial", 14)).pack()
-
-        tk.Button(self.root, text="Back", font=("Arial", 14), command=self.waiter_menu, width=20).pack(pady=10)
-
-    def clear_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        if not self.show_board("Available Dishes", self.menu_rows, name="display_menu"):
+            return
+        tk.Button(self.screen, text="Back", font=("Arial", 14), command=self.waiter_menu, width=20).pack(pady=10)
+
+    def menu_rows(self):
+        rows = []
+        for dish in self.menu:
+            unavailable = "" if self.menu.is_available(dish.name) else " [86'd]"
+            rows.append((dish.name, f"{dish.name} ({dish.type}) - {dish.prep_time} min{unavailable}", "row"))
+            # Convert ingredients list to a comma-separated string
+            rows.append(((dish.name, "ingredients"), f"    Ingredients: {', '.join(dish.ingredients)}", "note"))
+        return rows
+
+    def open_screen(self, name=None):
+        # Hides the screen on display and switches to screen `name`, which is built once and then
+        # kept; unnamed screens (forms and lists that change with every visit) are built afresh.
+        # Returns True when the screen is new and its widgets still have to be added to self.screen.
+        self.order_board = None
+        self.tickets = None
+        self.live_board = False
+        if self.screen is not None:
+            if self.screen_name is not None:
+                self.screen.pack_forget()
+            else:
+                self.screen.destroy()
+        frame = self.screens.get(name) if name is not None else None
+        built = frame is None
+        if built:
+            frame = tk.Frame(self.root)
+            if name is not None:
+                self.screens[name] = frame
+        frame.pack(fill="both", expand=True)
+        self.screen = frame
+        self.screen_name = name
+        return built
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Restaurant Kitchen Queue System")
+    parser.add_argument("--server", metavar="HOST:PORT", help="share the order queue of an order_server.py")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local port")
+    parser.add_argument("--metrics-file", help="rewrite Prometheus metrics to this file every 15 seconds")
+    parser.add_argument("--profile-slow", type=float, metavar="MS", help="print button presses and menu I/O slower than this")
+    parser.add_argument("--trace", help="append every order placed to this trace file")
+    parser.add_argument("--data-dir", default=os.getcwd(), help="folder of Menu.db, orders.log and the other files")
+    parser.add_argument("--menu", help="menu CSV to import the first time (default: Menu.csv in the data folder)")
+    args = parser.parse_args()
+    server = None
+    if args.server:
+        host, _, port = args.server.rpartition(":")
+        server = (host or "127.0.0.1", int(port))
+
     root = tk.Tk()
-    app = KitchenQueueSystemGUI(root)
+    app = KitchenQueueSystemGUI(root, server, args.metrics_port, args.metrics_file,
+                                args.profile_slow / 1000 if args.profile_slow else None, args.trace,
+                                AppPaths.under(args.data_dir, args.menu))
     root.mainloop()
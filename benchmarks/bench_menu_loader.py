@@ -0,0 +1,67 @@
+# Writes a synthetic chain-wide Menu.csv and times loading it, with a few bad rows mixed in.
+#
+#   python -m benchmarks.bench_menu_loader --rows 100000
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from menu_loader import load_menu_csv
+from menu_store import MenuStore
+
+INGREDIENTS = ["Gambas", "Aceite", "Sal", "Ajo", "Patatas", "Huevos", "Cebolla", "Arroz", "Azafran", "Ternera",
+               "Lubina", "Limon", "Jamon", "Pimientos", "Tomate", "Pan", "Queso", "Chorizo", "Pulpo", "Pimenton"]
+
+
+def write_menu(file_path: str, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(file_path, mode='w', encoding='utf-8') as file:
+        file.write("name,prep_time,type,ingredients\n")
+        for index in range(rows):
+            if index % 1000 == 999:
+                file.write(f"Broken {index},soon,tapas,Sal\n")  # bad prep time
+                continue
+            dish_type = "tapas" if rng.random() < 0.6 else "main dish"
+            ingredients = ", ".join(rng.sample(INGREDIENTS, rng.randint(2, 6)))
+            file.write(f"Dish {index},{rng.randint(3, 40)},{dish_type},\"{ingredients}\"\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time loading a large menu CSV.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "Menu.csv")
+        write_menu(csv_path, args.rows)
+
+        started = time.perf_counter()
+        dishes, report = load_menu_csv(csv_path)
+        elapsed = time.perf_counter() - started
+        print(f"load_menu_csv: {report.loaded} dishes, {len(report.errors)} bad rows in {elapsed * 1000:.0f} ms "
+              f"({report.rows / elapsed:,.0f} rows/s)")
+
+        # Measured separately: tracing allocations slows the load down several times
+        del dishes
+        tracemalloc.start()
+        dishes, report = load_menu_csv(csv_path)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"load_menu_csv memory: {current / 2 ** 20:.1f} MiB held, {peak / 2 ** 20:.1f} MiB peak")
+
+        store = MenuStore(os.path.join(directory, "Menu.db"))
+        started = time.perf_counter()
+        report = store.import_csv(csv_path)
+        elapsed = time.perf_counter() - started
+        print(f"MenuStore.import_csv: {report.loaded} dishes in {elapsed * 1000:.0f} ms")
+
+        started = time.perf_counter()
+        dishes = store.load_dishes()
+        print(f"MenuStore.load_dishes: {len(dishes)} dishes in {(time.perf_counter() - started) * 1000:.0f} ms")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Measures what KitchenMetrics costs per order by pushing the same orders through two
+# KitchenEngines, one with it attached, and shows the metrics it exported.
+#
+#   python -m benchmarks.bench_metrics --orders 200000
+import argparse
+import gc
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from kitchen_engine import KitchenEngine, Station
+from kitchen_sim import SAMPLE_MENU
+from metrics import KitchenMetrics, MetricsRegistry
+
+
+def run_chunk(engine: KitchenEngine, arrivals) -> float:
+    # Every order is placed, started, marked ready by tick() and sent out
+    started = time.perf_counter()
+    for now, table_number, dish in arrivals:
+        for order in engine.tick(now):
+            engine.complete_order(order.order_id, now)
+        engine.submit_order(table_number, dish, now)
+        engine.start_cooking(now)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the overhead of kitchen metrics.")
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--chunk", type=int, default=1000, help="orders each engine takes in turn")
+    parser.add_argument("--rate", type=float, default=10_000, help="orders per second to express the cost at")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    start = datetime(2000, 1, 1, 12)
+    arrivals = [(start + timedelta(seconds=index * 0.5), rng.randint(1, 60), rng.choice(SAMPLE_MENU))
+                for index in range(args.orders)]
+    # Both keep the default in-memory history, as the GUI and the server do
+    plain = KitchenEngine([Station("tapas", 10_000), Station("main dish", 10_000)])
+    instrumented = KitchenEngine([Station("tapas", 10_000), Station("main dish", 10_000)])
+    registry = MetricsRegistry()
+    KitchenMetrics(instrumented, registry)
+
+    # The engines take the same chunk in turn, the first one alternating, so a burst of other
+    # load on the machine slows both; the median difference per chunk is what the metrics cost
+    plain_times, instrumented_times, differences = [], [], []
+    gc.disable()
+    try:
+        for index in range(0, args.orders, args.chunk):
+            chunk = arrivals[index:index + args.chunk]
+            if index // args.chunk % 2:
+                instrumented_time, plain_time = run_chunk(instrumented, chunk), run_chunk(plain, chunk)
+            else:
+                plain_time, instrumented_time = run_chunk(plain, chunk), run_chunk(instrumented, chunk)
+            plain_times.append(plain_time / len(chunk))
+            instrumented_times.append(instrumented_time / len(chunk))
+            differences.append((instrumented_time - plain_time) / len(chunk))
+            gc.collect()
+    finally:
+        gc.enable()
+    plain_per_order = statistics.median(plain_times)
+    cost = statistics.median(differences)
+    print(f"engine alone: {plain_per_order * 1e6:.2f} us/order ({1 / plain_per_order:,.0f} orders/s), "
+          f"with metrics: {statistics.median(instrumented_times) * 1e6:.2f} us/order")
+    print(f"metrics cost {cost * 1e6:.2f} us/order: {cost / plain_per_order:.1%} of the engine's own time, "
+          f"{cost * args.rate:.2%} of one core at {args.rate:,.0f} orders/s")
+
+    started = time.perf_counter()
+    for _ in range(100):
+        registry.render()
+    render = (time.perf_counter() - started) / 100
+    print(f"one export takes {render * 1000:.2f} ms")
+    print(registry.render()[:1000])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Times refreshing the order board with a large number of open tickets: the tickets follow the
+# engine's events (one new order per refresh) and the rows in view are redrawn. Without a display
+# only the Tk-free part is timed: applying the events and formatting one screenful of rows.
+#
+#   python -m benchmarks.bench_order_board --tickets 1000
+import argparse
+import time
+import tkinter as tk
+from datetime import datetime, timedelta
+
+from events import EventBuffer
+from kitchen_display import display_tickets
+from kitchen_engine import KitchenEngine
+from kitchen_sim import SAMPLE_MENU
+from order_board import OrderBoard
+
+VISIBLE_ROWS = 16  # rows in view on the default 420-pixel board
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time order board refreshes.")
+    parser.add_argument("--tickets", type=int, default=1000)
+    parser.add_argument("--refreshes", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = KitchenEngine()
+    events = EventBuffer()
+    engine.subscribe(events.push)
+    order_time = datetime.now()
+    for index in range(args.tickets):
+        engine.submit_order(index % 40 + 1, SAMPLE_MENU[index % len(SAMPLE_MENU)], order_time)
+    engine.start_cooking(order_time)
+    tickets = display_tickets(engine)
+    events.drain()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        root = None
+        print("no display: timing the tickets without drawing them")
+    board = None
+    if root is not None:
+        board = OrderBoard(root)
+        board.pack(fill="both", expand=True)
+        board.set_rows(tickets)
+        root.update()
+
+    timings = []
+    for index in range(args.refreshes):
+        # Each refresh sees one ticket more, like a waiter placing an order between refreshes
+        engine.submit_order(index % 40 + 1, SAMPLE_MENU[index % len(SAMPLE_MENU)],
+                            order_time - timedelta(seconds=index))
+        started = time.perf_counter()
+        tickets.apply(events.drain())
+        if board is not None:
+            board.refresh()
+            root.update_idletasks()
+        else:
+            for row in range(min(VISIBLE_ROWS, len(tickets))):
+                tickets[row]
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    print(f"{args.tickets}+ tickets: refresh p50 {timings[len(timings) // 2] * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms, max {timings[-1] * 1000:.2f} ms")
+    if root is not None:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Compares the memory held by sent-out orders before and after OrderHistory: the size of one
+# order kept as the old dict-backed Order, as today's slotted Order and as an OrderRecord, then a
+# 24-hour service of 200k orders run through KitchenEngine with each kind of history.
+#
+#   python -m benchmarks.bench_order_history --orders 200000
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta
+
+from kitchen_engine import KitchenEngine, Station
+from kitchen_sim import SAMPLE_MENU
+from models import Order
+from order_history import OrderHistory, OrderRecord
+
+
+class DictOrder:
+    # Order as it was before it had __slots__, for comparison
+
+    def __init__(self, table_number, dish, order_time, order_id=0):
+        self.order_id = order_id
+        self.table_number = table_number
+        self.dish = dish
+        self.order_time = order_time
+        self.status = "pending"
+        self.station = None
+        self.rushed = False
+        self.priority = order_time.timestamp()
+        self.start_time = None
+        self.estimated_completion = None
+        self.completion_time = None
+
+
+def completed(order, start):
+    order.status = "completed"
+    order.station = order.dish.type
+    order.start_time = start + timedelta(seconds=order.order_id)
+    order.estimated_completion = order.start_time + timedelta(minutes=order.dish.prep_time)
+    order.completion_time = order.estimated_completion
+    return order
+
+
+def bytes_per_order(make, count: int) -> float:
+    tracemalloc.start()
+    kept = [make(index) for index in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / count
+
+
+def run_service(history, orders: int, hours: float, samples: int):
+    # Poisson arrivals spread over `hours`; stations are large enough that nothing queues for long,
+    # so the live orders stay roughly constant and any growth comes from the history
+    rng = random.Random(0)
+    engine = KitchenEngine([Station("tapas", 10_000), Station("main dish", 10_000)], history=history)
+    start = datetime(2000, 1, 1, 12)
+    rate = orders / (hours * 3600)
+    offset = 0.0
+    usage = []
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for index in range(orders):
+        offset += rng.expovariate(rate)
+        now = start + timedelta(seconds=offset)
+        for order in engine.tick(now):
+            engine.complete_order(order.order_id, now)
+        engine.submit_order(rng.randint(1, 60), rng.choice(SAMPLE_MENU), now)
+        engine.start_cooking(now)
+        if (index + 1) % (orders // samples) == 0:
+            usage.append(tracemalloc.get_traced_memory()[0])
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return usage, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory held by order history.")
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--samples", type=int, default=8, help="memory readings during the service")
+    args = parser.parse_args()
+
+    start = datetime(2000, 1, 1, 12)
+    dishes = SAMPLE_MENU
+    kinds = [("dict-backed Order", lambda i: completed(DictOrder(i % 60, dishes[i % 9], start, i), start)),
+             ("slotted Order", lambda i: completed(Order(i % 60, dishes[i % 9], start, i), start)),
+             ("OrderRecord", lambda i: OrderRecord.from_order(completed(Order(i % 60, dishes[i % 9], start, i), start)))]
+    print("Memory per sent-out order:")
+    for label, make in kinds:
+        print(f"  {label:<18} {bytes_per_order(make, 50_000):6.0f} bytes")
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = [("every Order kept (old completed_orders)", deque()),
+                ("OrderHistory, 1000 in memory + archive", OrderHistory(keep=1000, archive_dir=directory))]
+        for label, history in runs:
+            usage, peak, elapsed = run_service(history, args.orders, args.hours, args.samples)
+            readings = " ".join(f"{size / 2 ** 20:.1f}" for size in usage)
+            print(f"{label}: MiB after each {args.orders // args.samples} orders: {readings} "
+                  f"(peak {peak / 2 ** 20:.1f} MiB, {elapsed:.1f}s)")
+        runs[1][1].close()
+        segments = runs[1][1].segments()
+        print(f"archived {sum(1 for _ in runs[1][1].archived())} orders in {len(segments)} segment files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Starts order_server.py in its own process and connects hundreds of waiter terminals and a few
+# chef screens to it, reporting the round-trip time of placing a table's order.
+#
+#   python -m benchmarks.bench_order_server --waiters 500 --chefs 4 --seconds 20
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from kitchen_sim import percentile
+from menu_loader import load_menu_csv
+from order_client import OrderClient, OrderClientPool, ServerError
+
+
+async def waiter(client, dishes, tables, interval, deadline, latencies, refused, rng):
+    # Places one table's order (1 to 4 dishes in one batch) every `interval` seconds on average
+    await asyncio.sleep(rng.uniform(0, interval))
+    while time.perf_counter() < deadline:
+        table = rng.randint(1, tables)
+        started = time.perf_counter()
+        results = await client.submit([(table, rng.choice(dishes)) for _ in range(rng.randint(1, 4))])
+        latencies.append(time.perf_counter() - started)
+        refused[0] += sum(1 for result in results if not result["ok"])
+        await asyncio.sleep(min(rng.expovariate(1 / interval), max(0.0, deadline - time.perf_counter())))
+
+
+async def pooled_waiter(pool, dishes, tables, interval, deadline, latencies, refused, rng):
+    # Same load, but every dish goes through the shared pool and is batched with other waiters'
+    await asyncio.sleep(rng.uniform(0, interval))
+    while time.perf_counter() < deadline:
+        table = rng.randint(1, tables)
+        started = time.perf_counter()
+        replies = await asyncio.gather(*(pool.submit(table, rng.choice(dishes)) for _ in range(rng.randint(1, 4))),
+                                       return_exceptions=True)
+        latencies.append(time.perf_counter() - started)
+        refused[0] += sum(1 for reply in replies if isinstance(reply, ServerError))
+        await asyncio.sleep(min(rng.expovariate(1 / interval), max(0.0, deadline - time.perf_counter())))
+
+
+async def chef(client, deadline):
+    # Starts what fits on the stove and sends out everything already cooking, like a busy pass
+    await client.subscribe()
+    cooking = []
+    while time.perf_counter() < deadline:
+        for order in cooking:
+            await client.request("complete", order_id=order["order_id"])
+        cooking = await client.request("start_cooking")
+        await asyncio.sleep(0.5)
+
+
+async def run(args, port: int, dishes):
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.seconds
+    latencies, refused, received = [], [0], [0]
+
+    def count_events(events):
+        received[0] += len(events)
+
+    chefs = [await OrderClient.connect(port=port, on_events=count_events) for _ in range(args.chefs)]
+    if args.pool:
+        pool = await OrderClientPool(port=port, size=args.pool).open()
+        tasks = [pooled_waiter(pool, dishes, args.tables, args.interval, deadline, latencies, refused,
+                               random.Random(rng.random())) for _ in range(args.waiters)]
+        clients = pool.clients
+    else:
+        clients = [await OrderClient.connect(port=port) for _ in range(args.waiters)]
+        tasks = [waiter(client, dishes, args.tables, args.interval, deadline, latencies, refused,
+                        random.Random(rng.random())) for client in clients]
+    tasks += [chef(client, deadline) for client in chefs]
+
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    status = await clients[0].request("status")
+    for client in clients + chefs:
+        await client.close()
+
+    latencies.sort()
+    connections = len(clients) + len(chefs)
+    print(f"{connections} connections, {len(latencies)} table orders in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:,.0f}/s), {refused[0]} dishes refused, "
+          f"{status['completed_count']} sent out, {sum(status['pending'].values())} still waiting")
+    print(f"submit round trip: p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"{received[0]} events pushed to {len(chefs)} chef screens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the order server with many local terminals.")
+    parser.add_argument("--waiters", type=int, default=500)
+    parser.add_argument("--chefs", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--interval", type=float, default=2.0, help="mean seconds between a waiter's orders")
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--pool", type=int, default=0, help="share this many batched connections between waiters")
+    parser.add_argument("--menu", default="Menu.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dishes = [dish.name for dish in load_menu_csv(args.menu)[0]]
+    with tempfile.TemporaryDirectory() as folder:
+        # A Menu.db of its own, so the server serves exactly the dishes of --menu
+        server = subprocess.Popen([sys.executable, "order_server.py", "--port", "0", "--menu", args.menu,
+                                   "--menu-db", os.path.join(folder, "Menu.db")],
+                                  stdout=subprocess.PIPE, text=True)
+        try:
+            ready = server.stdout.readline()  # "Serving N dishes on host:port"
+            port = int(ready.rsplit(":", 1)[1])
+            asyncio.run(run(args, port, dishes))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
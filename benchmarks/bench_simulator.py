@@ -0,0 +1,65 @@
+# Replays a synthetic order stream against every scheduling policy and reports kitchen
+# metrics plus how fast the simulator ran.
+#
+#   python -m benchmarks.bench_simulator --orders 1000000
+#   python -m benchmarks.bench_simulator --policy table-sync --tapas-slots 4 --trace orders.trace.csv
+#   python -m benchmarks.bench_simulator --stations Stations.csv
+import argparse
+import time
+
+from kitchen_engine import load_stations
+from kitchen_sim import POLICIES, SAMPLE_MENU, load_arrivals, simulate, synthetic_arrivals
+from load_generator import load_dishes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare kitchen scheduling policies on a simulated service.")
+    parser.add_argument("--orders", type=int, default=200_000, help="approximate number of synthetic orders")
+    parser.add_argument("--visits-per-hour", type=float, default=3.0)
+    parser.add_argument("--tables", type=int, default=30)
+    parser.add_argument("--tapas-slots", type=int, default=3)
+    parser.add_argument("--main-slots", type=int, default=2)
+    parser.add_argument("--policy", choices=["all"] + list(POLICIES), default="all")
+    parser.add_argument("--stations", help="stations file (see load_stations) to simulate instead of the policies")
+    parser.add_argument("--trace", help="recorded stream (offset_seconds,table_number,dish[,visit]) instead of synthetic orders")
+    parser.add_argument("--menu-db", default="Menu.db", help="menu the --trace was recorded against")
+    parser.add_argument("--menu", default="Menu.csv", help="menu to read while there is no --menu-db")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.trace:
+        # A captured trace names the restaurant's own dishes
+        arrivals, errors = load_arrivals(args.trace, load_dishes(args.menu_db, args.menu))
+        if errors:
+            print(f"Skipped {len(errors)} orders of {args.trace}:")
+            for error in errors[:5]:
+                print(f"  line {error.line}: {error.message}")
+            if len(errors) > 5:
+                print(f"  ... and {len(errors) - 5} more.")
+    else:
+        # Parties order 3 dishes on average
+        arrivals = synthetic_arrivals(SAMPLE_MENU, max(1, args.orders // 3), args.visits_per_hour,
+                                      args.tables, seed=args.seed)
+    capacities = {"tapas": args.tapas_slots, "main dish": args.main_slots}
+
+    if args.stations:
+        runs = [(args.stations, lambda: load_stations(args.stations))]
+    else:
+        runs = [(policy, lambda policy=policy: POLICIES[policy](capacities))
+                for policy in (list(POLICIES) if args.policy == "all" else [args.policy])]
+    for label, stations in runs:
+        stations = stations()
+        cooked = {dish_type for station in stations for dish_type in station.dish_types}
+        run_arrivals = [arrival for arrival in arrivals if arrival.dish.type in cooked]
+        if len(run_arrivals) < len(arrivals):
+            skipped = sorted({arrival.dish.type for arrival in arrivals} - cooked)
+            print(f"{label}: left out {len(arrivals) - len(run_arrivals)} orders, no station cooks "
+                  f"{', '.join(skipped)} (see --stations)")
+        started = time.perf_counter()
+        report = simulate(run_arrivals, label, stations=stations)
+        elapsed = time.perf_counter() - started
+        print(f"{report.format()} | {report.orders / elapsed:,.0f} orders/s simulated")
+
+
+if __name__ == "__main__":
+    main()
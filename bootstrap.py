@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import os
+import time
+
+from inventory import Inventory
+from kitchen_engine import KitchenEngine, load_stations
+from menu import Menu
+from menu_store import MenuStore
+from order_history import OrderHistory
+from order_log import OrderJournal
+from prep_stats import PrepTimeStats
+
+
+@dataclass(frozen=True)
+class AppPaths:
+    # Where QuickChefApp keeps its files: everything in one data folder, except that the menu CSV
+    # may live elsewhere (e.g. one menu shared by several kitchens)
+    data_dir: str
+    menu_csv: str
+
+    @classmethod
+    def under(cls, data_dir: str, menu_csv: Optional[str] = None) -> "AppPaths":
+        return cls(data_dir, menu_csv or os.path.join(data_dir, "Menu.csv"))
+
+    @property
+    def menu_db(self) -> str:
+        return os.path.join(self.data_dir, "Menu.db")
+
+    @property
+    def orders_log(self) -> str:
+        return os.path.join(self.data_dir, "orders.log")
+
+    @property
+    def stations(self) -> str:
+        return os.path.join(self.data_dir, "Stations.csv")
+
+    @property
+    def prep_stats(self) -> str:
+        return os.path.join(self.data_dir, "prep_times.json")
+
+    @property
+    def prep_times_csv(self) -> str:
+        return os.path.join(self.data_dir, "prep_times.csv")
+
+    @property
+    def history_dir(self) -> str:
+        return os.path.join(self.data_dir, "history")
+
+
+@dataclass
+class KitchenState:
+    # Everything QuickChefApp reads from disk (or the server) before it can take orders
+    menu: Menu
+    inventory: Optional[Inventory]  # None when sharing a server, which keeps the stock levels
+    engine: object  # KitchenEngine, or the RemoteKitchen standing in for it
+    remote: object = None  # the RemoteKitchen when sharing a server
+    prep_stats: Optional[PrepTimeStats] = None
+    history: Optional[OrderHistory] = None
+    # (kind, title, message) to show once the window can, kind being "warning" or "error"
+    messages: List[Tuple[str, str, str]] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)  # step -> seconds
+
+
+def load_kitchen(paths: AppPaths, server: Optional[Tuple[str, int]] = None) -> KitchenState:
+    # Loads the menu (importing the CSV into Menu.db the first time), then either connects to a
+    # shared server or builds the local engine and brings back the queue of the last session.
+    # Touches no Tk, so it can run on a background thread while the login screen is up; problems
+    # are returned as messages rather than shown.
+    messages: List[Tuple[str, str, str]] = []
+    timings: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    menu = Menu()
+    try:
+        # A connection of its own: SQLite connections stay on the thread that opened them
+        store = MenuStore(paths.menu_db)
+        try:
+            dishes = store.load_dishes()
+            if not dishes:
+                report = store.import_csv(paths.menu_csv)
+                timings["import"] = time.perf_counter() - started
+                if report.errors:
+                    messages.append(("warning", "Menu Import", report.summary()))
+                dishes = store.load_dishes()
+        finally:
+            store.close()
+        menu = Menu(dishes)
+        print(f"Loaded {len(menu)} dishes from {paths.menu_db}.")
+    except FileNotFoundError:
+        messages.append(("error", "File Error", f"Menu file '{paths.menu_csv}' not found!"))
+    except Exception as e:
+        messages.append(("error", "File Error", f"An error occurred while loading the menu: {e}"))
+    timings["menu"] = time.perf_counter() - started
+    inventory = Inventory(menu)  # Only ingredients given a stock level are tracked
+
+    started = time.perf_counter()
+    if server is not None:
+        # Another terminal of a shared kitchen: the queue lives in order_server.py
+        from order_client import RemoteKitchen  # asyncio is only imported by terminals that need it
+        host, port = server
+        remote = RemoteKitchen(host, port)  # raises if the server cannot be reached
+        timings["orders"] = time.perf_counter() - started
+        # Orders are checked against the server's menu, which follows its Menu.db and its stock
+        return KitchenState(remote.menu(), None, remote, remote, messages=messages, timings=timings)
+
+    prep_stats = PrepTimeStats()  # learns how long dishes really take
+    if os.path.exists(paths.prep_stats):
+        try:
+            prep_stats.load(paths.prep_stats)
+        except (OSError, ValueError, KeyError) as e:
+            messages.append(("warning", "File Error", f"Could not load the learned prep times, starting afresh: {e}"))
+    stations = None  # tapas and main dish if there is no Stations.csv
+    if os.path.exists(paths.stations):
+        try:
+            stations = load_stations(paths.stations)
+        except (OSError, ValueError) as e:
+            messages.append(("warning", "File Error", f"Could not load the stations, using tapas and main dish: {e}"))
+    # Sent-out orders age out of memory into history/history-*.csv, 10,000 orders per file
+    history = OrderHistory(keep=500, archive_dir=paths.history_dir)
+    engine = KitchenEngine(stations, inventory=inventory, prep_stats=prep_stats, history=history)
+
+    # Bring back the queue from the last session
+    journal = OrderJournal(paths.orders_log)
+    try:
+        replayed = journal.recover(engine, list(menu))
+        engine.journal = journal
+        print(f"Recovered {len(engine.book)} open orders from {replayed} logged events.")
+    except (OSError, ValueError) as e:
+        # Keep what was read so far and journal this session in a new log, never run without one
+        try:
+            moved = journal.start_over(engine)
+            engine.journal = journal
+            messages.append(("error", "File Error",
+                             f"An error occurred while recovering the orders: {e}. Kept the {len(engine.book)} "
+                             f"open orders read before it and moved the order log aside to {', '.join(moved)}."))
+        except OSError as start_error:
+            messages.append(("error", "File Error", f"An error occurred while recovering the orders: {e}. "
+                             f"Could not start a new order log either, so orders will not survive a "
+                             f"restart: {start_error}"))
+    if journal.unrestored:
+        messages.append(("warning", "Order Recovery", "Could not bring back these orders from the last session:\n"
+                         + "\n".join(journal.unrestored.values())))
+    timings["orders"] = time.perf_counter() - started
+    return KitchenState(menu, inventory, engine, None, prep_stats, history, messages, timings)
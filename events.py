@@ -0,0 +1,33 @@
+from collections import deque
+from typing import List, NamedTuple, Optional
+
+from models import Order
+
+
+class OrderEvent(NamedTuple):
+    kind: str  # submitted, started, due, ready, completed, cancelled or rushed
+    order: Order
+    timestamp: float
+
+
+class EventBuffer:
+    # Collects engine events as they are published so a consumer on another loop (the Tk
+    # mainloop, a network writer) can take them in batches. push() and drain() only use deque
+    # append/popleft, which are thread-safe, so the publisher never waits for the consumer.
+
+    def __init__(self, maxlen: Optional[int] = None):
+        self._events = deque(maxlen=maxlen)  # oldest events are dropped first when full
+
+    def push(self, event: OrderEvent):
+        self._events.append(event)
+
+    def drain(self) -> List[OrderEvent]:
+        events = []
+        try:
+            while True:
+                events.append(self._events.popleft())
+        except IndexError:
+            return events
+
+    def __len__(self):
+        return len(self._events)
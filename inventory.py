@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, List, Optional
+import math
+
+from menu import ingredient_key
+from models import Dish
+
+
+class StockOutError(ValueError):
+    pass
+
+
+class _Stock:
+    __slots__ = ("on_hand", "reserved", "rate", "rate_time")
+
+    def __init__(self, on_hand: float):
+        self.on_hand = on_hand  # portions in the kitchen
+        self.reserved = 0.0  # portions promised to orders that have not started cooking
+        self.rate = 0.0  # decayed portions ordered per second
+        self.rate_time = 0.0  # timestamp the rate was last updated
+
+    def available(self) -> float:
+        return self.on_hand - self.reserved
+
+
+class Inventory:
+    # Portions left of each tracked ingredient (one portion per dish that lists it). Placing an
+    # order reserves its ingredients, starting to cook it consumes them and cancelling releases
+    # them; each step only touches the ingredients reserved for that order, even if the dish has
+    # been edited since. Ingredients without a stock level are never checked. When an ingredient
+    # runs out, the dishes using it are 86'd on the menu until it is back in stock.
+
+    def __init__(self, menu=None, block_stock_outs: bool = True, rate_half_life: float = 30):
+        self.menu = menu
+        self.block_stock_outs = block_stock_outs  # refuse orders that would overdraw, or just flag them
+        self.shortages: Dict[str, int] = {}  # ingredient -> orders accepted without enough stock
+        self._stock: Dict[str, _Stock] = {}
+        self._tau = rate_half_life * 60 / math.log(2)
+
+    def set_stock(self, ingredient: str, quantity: float):
+        key = ingredient_key(ingredient)
+        stock = self._stock.get(key)
+        if stock is None:
+            stock = self._stock[key] = _Stock(quantity)
+        else:
+            stock.on_hand = quantity
+        self._update_menu(key, stock)
+
+    def add_stock(self, ingredient: str, quantity: float):
+        key = ingredient_key(ingredient)
+        stock = self._stock.get(key)
+        if stock is None:
+            self.set_stock(ingredient, quantity)
+        else:
+            stock.on_hand += quantity
+            self._update_menu(key, stock)
+
+    def untrack(self, ingredient: str):
+        key = ingredient_key(ingredient)
+        if self._stock.pop(key, None) is not None and self.menu is not None:
+            self.menu.mark_in_stock(key, "stock")
+
+    def available(self, ingredient: str) -> Optional[float]:
+        # Portions not yet promised to an order, or None if the ingredient is not tracked
+        stock = self._stock.get(ingredient_key(ingredient))
+        return stock.available() if stock is not None else None
+
+    def levels(self) -> Dict[str, float]:
+        return {key: stock.available() for key, stock in self._stock.items()}
+
+    def reserve(self, dish: Dish, now: float, block: Optional[bool] = None) -> List[str]:
+        # Reserves one portion of each tracked ingredient, returning the ingredients reserved; keep
+        # them with the order to consume or release them later. Overdrawn ones are counted in
+        # shortages. Raises StockOutError without reserving anything if blocking and one would go
+        # negative.
+        block = self.block_stock_outs if block is None else block
+        tracked = [(key, self._stock[key]) for key in map(ingredient_key, dish.ingredients) if key in self._stock]
+        short = [key for key, stock in tracked if stock.available() < 1]
+        if short and block:
+            raise StockOutError(f"Not enough {', '.join(short)} left for {dish.name}.")
+
+        for key, stock in tracked:
+            stock.reserved += 1
+            stock.rate = stock.rate * math.exp(-max(0.0, now - stock.rate_time) / self._tau) + 1 / self._tau
+            stock.rate_time = now
+            self._update_menu(key, stock)
+        for key in short:
+            self.shortages[key] = self.shortages.get(key, 0) + 1
+        return [key for key, _ in tracked]
+
+    def release(self, ingredients: Iterable[str]):
+        # Gives back the portions reserved for an order that was cancelled before cooking
+        for key in ingredients:
+            stock = self._stock.get(key)
+            if stock is not None:
+                stock.reserved -= 1
+                self._update_menu(key, stock)
+
+    def consume(self, ingredients: Iterable[str]):
+        # The order started cooking: its reserved portions leave the kitchen
+        for key in ingredients:
+            stock = self._stock.get(key)
+            if stock is not None:
+                stock.reserved -= 1
+                stock.on_hand -= 1
+
+    def projected_run_out(self, ingredient: str, now: float) -> Optional[float]:
+        # Minutes until the ingredient runs out at the current order rate, None if not tracked
+        # or not being ordered
+        stock = self._stock.get(ingredient_key(ingredient))
+        if stock is None:
+            return None
+        return self._minutes_left(stock, now)
+
+    def projections(self, now: float) -> Dict[str, Optional[float]]:
+        return {key: self._minutes_left(stock, now) for key, stock in self._stock.items()}
+
+    def _minutes_left(self, stock: _Stock, now: float) -> Optional[float]:
+        rate = stock.rate * math.exp(-max(0.0, now - stock.rate_time) / self._tau)
+        if rate <= 1e-12:
+            return None
+        return max(0.0, stock.available()) / rate / 60
+
+    def _update_menu(self, key: str, stock: _Stock):
+        if self.menu is None:
+            return
+        if stock.available() < 1:
+            self.menu.mark_out_of_stock(key, "stock")
+        else:
+            self.menu.mark_in_stock(key, "stock")
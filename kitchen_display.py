@@ -0,0 +1,52 @@
+import time
+
+from kitchen_engine import KitchenEngine
+from order_board import Section, TicketRows
+
+
+def format_countdown(seconds: float) -> str:
+    if seconds <= 0:
+        return "READY" if seconds > -60 else f"{int(-seconds // 60)} min late"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def display_tickets(engine: KitchenEngine) -> TicketRows:
+    # Tickets for the kitchen screen: dishes at the pass first (cooked, or with their time up and
+    # waiting for the chef to call them done), then dishes on the stove counting down to their
+    # estimated completion, then waiting dishes counting down to order_time + expected prep time
+    # (when the table could have had them at the earliest).
+    # Countdowns are formatted when drawn, so refreshing them every poll only touches the rows in view.
+    snapshot = engine.snapshot()
+
+    def ready_text(order):
+        if order.status == "due":
+            return (f"Table {order.table_number}: {order.dish.name} - time up "
+                    f"{format_countdown(time.time() - order.ready_time.timestamp())} ago, done?")
+        return (f"Table {order.table_number}: {order.dish.name} - ready "
+                f"{format_countdown(time.time() - order.ready_time.timestamp())} ago")
+
+    def cooking_text(order):
+        return (f"Table {order.table_number}: {order.dish.name} ({order.station}) - "
+                f"{format_countdown(order.estimated_completion.timestamp() - time.time())}")
+
+    def waiting_text(order):
+        return (f"Table {order.table_number}: {order.dish.name} - due "
+                f"{format_countdown(order.order_time.timestamp() + order.prep_estimate * 60 - time.time())}")
+
+    def place(order):
+        if order.status == "pending":
+            return "waiting", order.station
+        if order.status == "due":
+            return "ready"
+        return order.status  # ready and cooking have sections; sent-out and cancelled orders leave
+
+    sections = [Section("ready", "Ready to send out", ready_text, "Nothing at the pass."),
+                Section("cooking", "Cooking", cooking_text, "Nothing on the stove.")]
+    sections += [Section(("waiting", station), f"Waiting: {station}", waiting_text, "No orders waiting.", "note",
+                         sort_key=lambda order: order.priority)
+                 for station in snapshot.pending]
+    tickets = TicketRows(sections, place)
+    tickets.load(snapshot.ready + snapshot.currently_cooking +
+                 [order for orders in snapshot.pending.values() for order in orders])
+    return tickets
@@ -0,0 +1,402 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import csv
+import heapq
+
+from events import OrderEvent
+from models import Dish, Order
+from order_book import OrderBook
+from order_history import OrderHistory
+from scheduling import (FifoPolicy, LongestPrepFirstPolicy, PriorityPolicy, ShortestPrepFirstPolicy,
+                        TableSyncPolicy)
+
+# Policy names accepted in a stations file
+STATION_POLICIES: Dict[str, Callable[[], PriorityPolicy]] = {
+    "fifo": FifoPolicy,
+    "longest-prep-first": LongestPrepFirstPolicy,
+    "shortest-prep-first": ShortestPrepFirstPolicy,
+    "table-sync": TableSyncPolicy,
+}
+
+
+class Station:
+    # One cooking lane: how many dishes it can cook at once, which dish types it cooks (by default
+    # the one it is named after) and how it picks the next one. Its pending orders live in the
+    # engine's OrderBook under the station's name.
+
+    def __init__(self, name: str, capacity: int, policy: Optional[PriorityPolicy] = None,
+                 dish_types: Optional[Iterable[str]] = None):
+        if capacity < 1:
+            raise ValueError(f"Station '{name}' needs at least one slot.")
+        self.name = name
+        self.capacity = capacity
+        self.policy = policy or FifoPolicy()
+        self.dish_types = tuple(dish_types) if dish_types else (name,)
+        self.cooking = 0
+        self.cooking_minutes = 0.0  # expected prep minutes of the dishes on the stove
+
+    def load(self, pending_minutes: float) -> float:
+        # Minutes of work per slot, counting the dishes on the stove, so that a queue of quick
+        # tapas weighs less than one of the same number of slow mains
+        return (pending_minutes + self.cooking_minutes) / self.capacity
+
+
+def default_stations() -> List[Station]:
+    # Up to 3 tapas (FIFO) and 2 main dishes (longest preparation first) at a time
+    return [Station("tapas", 3), Station("main dish", 2, LongestPrepFirstPolicy())]
+
+
+def table_sync_stations(window: float = 2) -> List[Station]:
+    # Same slots as default_stations, but dishes of a table are fired so they finish within
+    # `window` minutes of each other (see TableSyncPolicy)
+    policy = TableSyncPolicy(window)
+    return [Station("tapas", 3, policy), Station("main dish", 2, policy)]
+
+
+def load_stations(file_path: str) -> List[Station]:
+    # Reads a stations file laid out like Menu.csv, one station per line after the header:
+    #   name,capacity,policy,dish types
+    #   grill,2,longest-prep-first,"main dish, grill"
+    # An empty policy means fifo and empty dish types mean the station's own name. Stations naming
+    # the same policy share one instance, so table-sync lines up dishes across them.
+    policies: Dict[str, PriorityPolicy] = {}
+    stations = []
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # header
+        for line_number, row in enumerate(reader, start=2):
+            if not row or not "".join(row).strip():
+                continue
+            if len(row) != 4:
+                raise ValueError(f"{file_path}, line {line_number}: expected 4 fields, got {len(row)}.")
+            name, capacity, policy_name, dish_types = (field.strip() for field in row)
+            policy_name = policy_name.lower() or "fifo"
+            if policy_name not in STATION_POLICIES:
+                raise ValueError(f"{file_path}, line {line_number}: unknown policy '{policy_name}'.")
+            try:
+                capacity = int(capacity)
+            except ValueError:
+                raise ValueError(f"{file_path}, line {line_number}: capacity must be a whole number.") from None
+            if policy_name not in policies:
+                policies[policy_name] = STATION_POLICIES[policy_name]()
+            types = [dish_type.strip().lower() for dish_type in dish_types.split(",") if dish_type.strip()]
+            stations.append(Station(name, capacity, policies[policy_name], types or [name.lower()]))
+    if not stations:
+        raise ValueError(f"{file_path} defines no stations.")
+    return stations
+
+
+@dataclass(frozen=True)
+class KitchenSnapshot:
+    pending: Dict[str, List[Order]]  # station name -> orders, in the order they will be started
+    currently_cooking: List[Order]
+    completed_count: int
+    ready: List[Order]  # cooked and waiting to be sent out, oldest first
+
+
+class KitchenEngine:
+    # Headless order queue: no Tk, no I/O. Every call is O(log n) or better in the
+    # number of queued orders, except snapshot() which copies the queues out.
+
+    def __init__(self, stations: Optional[List[Station]] = None, history_limit: Optional[int] = 1000,
+                 journal=None, inventory=None, prep_stats=None, history: Optional[OrderHistory] = None):
+        self.book = OrderBook()
+        self.stations: Dict[str, Station] = {}  # name -> station
+        self.routes: Dict[str, List[Station]] = {}  # dish type -> stations that cook it
+        for station in stations or default_stations():
+            if station.name in self.stations:
+                raise ValueError(f"There are two stations named '{station.name}'.")
+            self.stations[station.name] = station
+            self.book.add_queue(station.name, station.policy)
+            for dish_type in station.dish_types:
+                self.routes.setdefault(dish_type, []).append(station)
+        # station name -> the other stations sharing a dish type with it, which it may take work from
+        self._peers: Dict[str, List[Station]] = {
+            name: [other for other in self.stations.values()
+                   if other is not station and set(other.dish_types) & set(station.dish_types)]
+            for name, station in self.stations.items()}
+        self.ready_orders: Dict[int, Order] = {}  # order_id -> cooked order waiting to be sent out
+        # Sent-out orders as compact records: the last history_limit in memory (all if None), unless
+        # an OrderHistory that also archives them to disk is given
+        self.completed_orders = history if history is not None else OrderHistory(keep=history_limit)
+        self.completed_count = 0
+        self.cancelled_count = 0
+        self.next_order_id = 1
+        self.journal = journal  # optional OrderJournal receiving every state transition
+        self.inventory = inventory  # optional Inventory reserving ingredients for every order
+        self.prep_stats = prep_stats  # optional PrepTimeStats learning prep times from sent-out dishes
+        self._subscribers: List[Callable[[OrderEvent], None]] = []
+        # (estimated completion timestamp, order_id) of every started order. Orders sent out by
+        # hand before they are due are left in and skipped when their entry comes up.
+        self._due: List[Tuple[float, int]] = []
+
+    @property
+    def currently_cooking(self) -> Dict[int, Order]:
+        return self.book.cooking
+
+    def cooks(self, dish_type: str) -> bool:
+        return dish_type in self.routes
+
+    def dispatch(self, dish: Dish) -> Station:
+        # Least loaded of the stations that cook the dish, by minutes of work per slot: O(k) in
+        # the k stations sharing its type
+        stations = self.routes.get(dish.type)
+        if not stations:
+            raise ValueError(f"No station cooks '{dish.type}' dishes.")
+        if len(stations) == 1:
+            return stations[0]
+        book = self.book
+        return min(stations, key=lambda station: station.load(book.pending_minutes(station.name)))
+
+    def submit_order(self, table_number: int, dish: Dish, order_time: Optional[datetime] = None) -> Order:
+        station = self.dispatch(dish)
+
+        order_time = order_time or datetime.now()
+        reserved = ()
+        if self.inventory is not None:
+            reserved = self.inventory.reserve(dish, order_time.timestamp())  # raises StockOutError when blocking
+
+        order = Order(table_number, dish, order_time, self.next_order_id)
+        order.reserved = reserved
+        self.next_order_id += 1
+        if self.prep_stats is not None:
+            order.prep_estimate = self.prep_stats.estimate(dish, station.name)
+        self.book.push(order, station.name)
+        self._record("submitted", order, order.order_time)
+        return order
+
+    def restore_order(self, order: Order, station: str):
+        # Puts back an order recovered from a journal, keeping its id and times. Not journaled.
+        # Orders of a station that has since been removed go to one that cooks their dish.
+        if station not in self.stations:
+            if not self.cooks(order.dish.type):
+                raise ValueError(f"No station '{station}' to restore order {order.order_id} to.")
+            station = self.dispatch(order.dish).name
+        if self.prep_stats is not None:
+            order.prep_estimate = self.prep_stats.estimate(order.dish, station)
+        self.book.push(order, station)
+        self.next_order_id = max(self.next_order_id, order.order_id + 1)
+        if self.inventory is not None:
+            order.reserved = self.inventory.reserve(order.dish, order.order_time.timestamp(), block=False)
+
+    def start_cooking(self, now: Optional[datetime] = None) -> List[Order]:
+        # Admit pending orders until the station limits are reached, returning the newly started ones
+        now = now or datetime.now()
+        timestamp = now.timestamp()
+        started = []
+
+        for name, station in self.stations.items():
+            while station.cooking < station.capacity:
+                order = self.book.pop(name, timestamp)
+                if order is None:
+                    break
+                started.append(self._start(station, order, now))
+
+        # Stations still idle take work from busier ones cooking the same dishes
+        for name, station in self.stations.items():
+            while station.cooking < station.capacity and self._peers[name]:
+                order = self._steal(station, timestamp)
+                if order is None:
+                    break
+                started.append(self._start(station, order, now))
+
+        return started
+
+    def _steal(self, station: Station, timestamp: float) -> Optional[Order]:
+        # Takes the order the most backed-up peer would start first among the dishes this station
+        # cooks and the peer's policy lets start now, even if other dishes are ahead of it
+        book = self.book
+        dish_types = station.dish_types
+        for peer in sorted(self._peers[station.name], key=lambda peer: book.pending_minutes(peer.name), reverse=True):
+            if not book.has_pending(peer.name, dish_types):
+                continue
+            ready = peer.policy.ready
+            order = book.first(peer.name, lambda order: order.dish.type in dish_types and ready(order, timestamp))
+            if order is not None:
+                book.take(order.order_id, timestamp)
+                order.station = station.name
+                return order
+        return None
+
+    def start_order(self, order_id: int, now: Optional[datetime] = None, station: Optional[str] = None) -> Order:
+        # Starts a specific pending order straight away, even if its station is already full. It
+        # cooks at the station it waited for unless another one is named.
+        now = now or datetime.now()
+        if station is not None and station not in self.stations:
+            raise ValueError(f"No station '{station}' to start order {order_id} at.")
+        order = self.book.take(order_id, now.timestamp())
+        if order is None:
+            raise ValueError(f"Order {order_id} is not waiting to be cooked.")
+        if station is not None:
+            order.station = station
+        return self._start(self.stations[order.station], order, now)
+
+    def next_ready_time(self) -> Optional[float]:
+        # Earliest timestamp at which a station with a free slot may start its next pending order,
+        # its own or one it could take from a peer
+        ready_times = []
+        for name, station in self.stations.items():
+            if station.cooking < station.capacity:
+                order = self.book.peek(name)
+                if order is not None:
+                    ready_times.append(station.policy.ready_at(order))
+                for peer in self._peers[name]:
+                    if self.book.has_pending(peer.name, station.dish_types):
+                        # The counts go by the type an order was queued with; a menu edit may have
+                        # changed it since, so the peer can hold none this station cooks after all
+                        order = self.book.first(peer.name, lambda order: order.dish.type in station.dish_types)
+                        if order is not None:
+                            ready_times.append(peer.policy.ready_at(order))
+        return min(ready_times) if ready_times else None
+
+    def _start(self, station: Station, order: Order, now: datetime) -> Order:
+        order.status = "cooking"
+        order.start_time = now
+        order.estimated_completion = now + timedelta(minutes=order.prep_estimate)
+        station.cooking += 1
+        station.cooking_minutes += order.prep_estimate
+        heapq.heappush(self._due, (order.estimated_completion.timestamp(), order.order_id))
+        if self.inventory is not None:
+            self.inventory.consume(order.reserved)
+        self._record("started", order, now)
+        return order
+
+    def tick(self, now: Optional[datetime] = None) -> List[Order]:
+        # Marks every dish whose preparation time is up as due, which frees its slot, then starts
+        # the next orders. Returns the dishes that became due. Only touches due entries:
+        # O(log n) per dish that is done, O(1) when none is.
+        now = now or datetime.now()
+        timestamp = now.timestamp()
+        ready = []
+        while self._due and self._due[0][0] <= timestamp:
+            order_id = heapq.heappop(self._due)[1]
+            if order_id in self.book.cooking:
+                ready.append(self.mark_due(order_id, now))
+        if ready:
+            self.start_cooking(now)
+        return ready
+
+    def next_due_time(self) -> Optional[float]:
+        # Timestamp at which the next dish on the stove will be ready, if any is cooking
+        while self._due and self._due[0][1] not in self.book.cooking:
+            heapq.heappop(self._due)
+        return self._due[0][0] if self._due else None
+
+    def mark_due(self, order_id: int, now: Optional[datetime] = None) -> Order:
+        # The dish's time is up: it leaves its slot and shows at the pass, but the chef has not
+        # called it done, so nothing is learned yet (see mark_ready and complete_order)
+        return self._ready(order_id, now or datetime.now(), "due")
+
+    def mark_ready(self, order_id: int, now: Optional[datetime] = None) -> Order:
+        # The chef says the dish is cooked: it leaves its slot, or is confirmed if its time was
+        # already up, and waits at the pass to be sent out. Either way it took until now.
+        now = now or datetime.now()
+        order = self.ready_orders.get(order_id)
+        if order is not None and order.status == "due":
+            order.status = "ready"
+            order.ready_time = now
+            self._record("ready", order, now)
+        else:
+            order = self._ready(order_id, now, "ready")
+        self._learn(order, now)
+        return order
+
+    def _ready(self, order_id: int, now: datetime, status: str) -> Order:
+        order = self.book.finish(order_id)
+        if order is None:
+            raise ValueError(f"Order {order_id} is not being prepared.")
+
+        order.status = status
+        order.ready_time = now
+        self._leave_slot(order)
+        self.ready_orders[order_id] = order
+        self._record(status, order, now)
+        return order
+
+    def _leave_slot(self, order: Order):
+        station = self.stations[order.station]
+        station.cooking -= 1
+        station.cooking_minutes -= order.prep_estimate
+
+    def _learn(self, order: Order, now: datetime, at_least: bool = False):
+        # Teaches the stats how long a dish took from start to the chef calling it done. A dish
+        # nobody called done only tells that it took at least until its time was up.
+        if self.prep_stats is not None:
+            minutes = (now - order.start_time).total_seconds() / 60
+            if at_least:
+                self.prep_stats.record_at_least(order.dish, order.station, minutes)
+            else:
+                self.prep_stats.record(order.dish, order.station, minutes)
+
+    def complete_order(self, order_id: int, now: Optional[datetime] = None) -> Order:
+        # Sends out a ready dish, or one still on the stove if the chef calls it done early
+        now = now or datetime.now()
+        order = self.ready_orders.pop(order_id, None)
+        if order is None:
+            order = self.book.finish(order_id)
+            if order is None:
+                raise ValueError(f"Order {order_id} is not being prepared.")
+            self._leave_slot(order)
+            order.ready_time = now
+            self._learn(order, now)
+        elif order.status == "due":
+            self._learn(order, order.ready_time, at_least=True)
+
+        order.status = "completed"
+        order.completion_time = now
+        self.completed_orders.append(order)
+        self.completed_count += 1
+        self._record("completed", order, order.completion_time)
+        return order
+
+    def cancel_order(self, order_id: int, now: Optional[datetime] = None) -> Order:
+        order = self.book.cancel(order_id)
+        if order is None:
+            raise ValueError(f"Order {order_id} is not waiting to be cooked.")
+
+        order.status = "cancelled"
+        self.cancelled_count += 1
+        if self.inventory is not None:
+            self.inventory.release(order.reserved)
+        self._record("cancelled", order, now or datetime.now())
+        return order
+
+    def rush_order(self, order_id: int, now: Optional[datetime] = None) -> Order:
+        # Moves a pending order ahead of everything its station's policy would pick next
+        order = self.book.get(order_id)
+        if order is None or not self.book.is_pending(order_id):
+            raise ValueError(f"Order {order_id} is not waiting to be cooked.")
+
+        order.rushed = True
+        self.book.reprioritise(order_id)
+        self._record("rushed", order, now or datetime.now())
+        return order
+
+    def subscribe(self, callback: Callable[[OrderEvent], None]) -> Callable[[], None]:
+        # Calls back with every order transition, in the caller's thread, right after it happens.
+        # Callbacks must be quick (e.g. EventBuffer.push). Returns a function that unsubscribes.
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def _record(self, event: str, order: Order, when: datetime):
+        if self.journal is not None:
+            self.journal.record(self, event, order, when.timestamp())
+        if self._subscribers:
+            order_event = OrderEvent(event, order, when.timestamp())
+            for callback in list(self._subscribers):
+                callback(order_event)
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        return self.book.get(order_id) or self.ready_orders.get(order_id)
+
+    def table_orders(self, table_number: int) -> List[Order]:
+        return self.book.table_orders(table_number)
+
+    def snapshot(self) -> KitchenSnapshot:
+        return KitchenSnapshot(
+            pending={name: self.book.pending_orders(name) for name in self.stations},
+            currently_cooking=list(self.book.cooking.values()),
+            completed_count=self.completed_count,
+            ready=list(self.ready_orders.values()),
+        )
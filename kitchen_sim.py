@@ -0,0 +1,304 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import csv
+import heapq
+import math
+import random
+
+from kitchen_engine import KitchenEngine, Station
+from menu_loader import RowError
+from models import Dish
+from scheduling import FifoPolicy, LongestPrepFirstPolicy, PriorityPolicy, ShortestPrepFirstPolicy, TableSyncPolicy
+
+# Used when the menu on disk is too small to make an interesting kitchen
+SAMPLE_MENU = [
+    Dish("Gambas", 5, ["Gambas", "Aceite", "Sal"], "tapas"),
+    Dish("Patatas Bravas", 8, ["Patatas", "Salsa brava"], "tapas"),
+    Dish("Croquetas", 6, ["Jamon", "Bechamel"], "tapas"),
+    Dish("Pimientos de Padron", 4, ["Pimientos", "Sal"], "tapas"),
+    Dish("Tortilla", 12, ["Huevos", "Patatas", "Cebolla"], "tapas"),
+    Dish("Paella", 25, ["Arroz", "Gambas", "Azafran"], "main dish"),
+    Dish("Entrecot", 15, ["Ternera", "Sal"], "main dish"),
+    Dish("Lubina", 18, ["Lubina", "Limon"], "main dish"),
+    Dish("Cochinillo", 35, ["Cochinillo"], "main dish"),
+]
+
+DEFAULT_CAPACITIES = {"tapas": 3, "main dish": 2}
+
+
+def _stations(policies: Dict[str, object], capacities: Dict[str, int]) -> List[Station]:
+    return [Station(dish_type, capacity, policies[dish_type]) for dish_type, capacity in capacities.items()]
+
+
+# Policy name -> function building a fresh station set for the given slot capacities
+POLICIES: Dict[str, Callable[[Dict[str, int]], List[Station]]] = {
+    "default": lambda capacities: _stations(
+        {"tapas": FifoPolicy(), "main dish": LongestPrepFirstPolicy()}, capacities),
+    "fifo": lambda capacities: _stations(
+        {dish_type: FifoPolicy() for dish_type in capacities}, capacities),
+    "shortest-prep-first": lambda capacities: _stations(
+        {dish_type: ShortestPrepFirstPolicy() for dish_type in capacities}, capacities),
+    "table-sync": lambda capacities: _stations(
+        dict.fromkeys(capacities, TableSyncPolicy()), capacities),
+}
+
+
+# Rank of an order under each policy the fast path replays without a KitchenEngine, from its prep
+# minutes: the stateless ones, which order by rank and then by order id (see scheduling.py).
+# FIFO's key is the order time, which only grows with the id when orders are replayed in turn.
+_FAST_RANKS: Dict[type, Callable[[int], int]] = {
+    FifoPolicy: lambda prep: 0,
+    LongestPrepFirstPolicy: lambda prep: -prep,
+    ShortestPrepFirstPolicy: lambda prep: prep,
+}
+
+
+class Arrival(NamedTuple):
+    offset: float  # seconds since the start of service
+    table_number: int
+    dish: Dish
+    visit: int  # orders of one party at one table; used for the completion spread
+
+
+def synthetic_arrivals(dishes: List[Dish], visits: int, visits_per_hour: float = 60, tables: int = 30,
+                       max_dishes_per_visit: int = 5, seed: int = 0) -> List[Arrival]:
+    # Poisson arrivals of parties, each ordering 1..max_dishes_per_visit dishes at once
+    rng = random.Random(seed)
+    rate = visits_per_hour / 3600
+    arrivals = []
+    offset = 0.0
+    for visit in range(visits):
+        offset += rng.expovariate(rate)
+        table_number = rng.randint(1, tables)
+        for _ in range(rng.randint(1, max_dishes_per_visit)):
+            arrivals.append(Arrival(offset, table_number, rng.choice(dishes), visit))
+    return arrivals
+
+
+def load_arrivals(file_path: str, dishes: List[Dish]) -> Tuple[List[Arrival], List[RowError]]:
+    # Recorded stream: offset_seconds,table_number,dish[,visit]; visit defaults to the table number.
+    # Rows for dishes that are not in `dishes`, or that cannot be read, are skipped and returned
+    # as errors, like load_menu_csv does with bad menu rows.
+    dishes_by_name = {dish.name: dish for dish in dishes}
+    arrivals = []
+    errors = []
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # Skip header row
+        for line, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            try:
+                offset, table_number, dish_name = row[:3]
+                visit = int(row[3]) if len(row) > 3 and row[3] else int(table_number)
+                offset, table_number = float(offset), int(table_number)
+            except ValueError:
+                errors.append(RowError(line, "expected offset_seconds,table_number,dish[,visit]"))
+                continue
+            dish = dishes_by_name.get(dish_name)
+            if dish is None:
+                errors.append(RowError(line, f"'{dish_name}' is not on the menu"))
+                continue
+            arrivals.append(Arrival(offset, table_number, dish, visit))
+    arrivals.sort(key=lambda arrival: arrival.offset)
+    return arrivals, errors
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+@dataclass(frozen=True)
+class SimulationReport:
+    policy: str
+    orders: int
+    duration_minutes: float  # from the first arrival until the last dish is sent out
+    throughput_per_hour: float
+    wait_p50: float  # minutes between placing an order and starting to cook it
+    wait_p95: float
+    wait_p99: float
+    utilisation: Dict[str, float]  # station -> fraction of slot time spent cooking
+    spread_p50: float  # minutes between the first and last dish of a visit coming out
+    spread_p95: float
+
+    def format(self) -> str:
+        utilisation = ", ".join(f"{name} {value:.0%}" for name, value in self.utilisation.items())
+        return (f"{self.policy:<20} {self.orders} orders, {self.throughput_per_hour:.1f}/h | "
+                f"wait p50 {self.wait_p50:.1f} p95 {self.wait_p95:.1f} p99 {self.wait_p99:.1f} min | "
+                f"spread p50 {self.spread_p50:.1f} p95 {self.spread_p95:.1f} min | {utilisation}")
+
+
+def simulate(arrivals: List[Arrival], policy: str = "default", capacities: Optional[Dict[str, int]] = None,
+             stations: Optional[List[Station]] = None, fast: bool = True) -> SimulationReport:
+    # Replays the arrivals against a fresh KitchenEngine. Dishes become ready exactly prep_time
+    # after they start (KitchenEngine.tick) and are sent out straight away; the clock jumps from
+    # one arrival, ready dish or policy wake-up to the next. Given stations (e.g. from
+    # load_stations) are used as they are, and `policy` only names the report.
+    # Kitchens whose stations all use a stateless policy and share no dish type are replayed by
+    # _simulate_fast instead, which gives the same report several times faster; fast=False
+    # always goes through the engine.
+    if stations is None:
+        stations = POLICIES[policy](capacities or DEFAULT_CAPACITIES)
+    engine = KitchenEngine(stations, history_limit=0)
+    if (fast and all(type(station.policy) in _FAST_RANKS for station in engine.stations.values())
+            and all(len(cooks) == 1 for cooks in engine.routes.values())):
+        return _simulate_fast(arrivals, policy, engine)
+
+    start = datetime(2000, 1, 1, 12)
+    base = start.timestamp()
+
+    visits = {}  # order_id -> visit
+    first_out = {}  # visit -> first completion timestamp
+    last_out = {}
+    waits = []
+    busy = dict.fromkeys(engine.stations, 0.0)
+
+    times = [base + arrival.offset for arrival in arrivals]  # timestamps, so the loop compares floats
+    count = len(arrivals)
+    index = 0
+    wake = None
+    now = base
+    orders = engine.book.orders
+    # Only policies that may hold an order back (table-sync) need the clock to stop when it may start
+    holds_back = any(type(station.policy).ready_at is not PriorityPolicy.ready_at
+                     for station in engine.stations.values())
+    while index < count or orders:
+        next_arrival = times[index] if index < count else math.inf
+        due = engine.next_due_time()
+        now = min(next_arrival, due if due is not None else math.inf, wake if wake is not None else math.inf)
+        now_time = start + timedelta(seconds=now - base)
+
+        # tick() already starts the next orders when dishes come off the stove, so start_cooking
+        # is only called again for new arrivals or a policy wake-up
+        ready = engine.tick(now_time)
+        for order in ready:
+            engine.complete_order(order.order_id, now_time)
+            waits.append((order.start_time - order.order_time).total_seconds() / 60)
+            busy[order.station] += order.dish.prep_time * 60
+            visit = visits.pop(order.order_id)
+            first_out.setdefault(visit, now)
+            last_out[visit] = now
+
+        arrived = index < count and times[index] <= now
+        while index < count and times[index] <= now:
+            arrival = arrivals[index]
+            # Orders of a party arrive together, at exactly `now`
+            order = engine.submit_order(arrival.table_number, arrival.dish, now_time)
+            visits[order.order_id] = arrival.visit
+            index += 1
+
+        if arrived or not ready:
+            engine.start_cooking(now_time)
+        if holds_back:
+            wake = engine.next_ready_time()
+            if wake is not None and wake <= now:
+                wake = None
+
+    duration = max(now - base - (arrivals[0].offset if arrivals else 0), 1e-9)
+    waits.sort()
+    spreads = sorted((last_out[visit] - first_out[visit]) / 60 for visit in first_out)
+    return SimulationReport(
+        policy=policy,
+        orders=len(arrivals),
+        duration_minutes=duration / 60,
+        throughput_per_hour=len(arrivals) / duration * 3600,
+        wait_p50=percentile(waits, 0.50),
+        wait_p95=percentile(waits, 0.95),
+        wait_p99=percentile(waits, 0.99),
+        utilisation={name: busy[name] / (station.capacity * duration) for name, station in engine.stations.items()},
+        spread_p50=percentile(spreads, 0.50),
+        spread_p95=percentile(spreads, 0.95),
+    )
+
+
+def _simulate_fast(arrivals: List[Arrival], policy: str, engine: KitchenEngine) -> SimulationReport:
+    # The engine's scheduling, step for step, for stations that each cook their own dish types
+    # with a stateless policy. Nothing is built per arrival: dishes and stations are looked up
+    # once before the loop, the clock counts whole microseconds (as datetime does), and both the
+    # queue keys (rank, then arrival) and the stove entries (ready time, then arrival) are packed
+    # into single ints, so every heap comparison is one int comparison.
+    names = list(engine.stations)
+    capacity = [station.capacity for station in engine.stations.values()]
+    ranks = [_FAST_RANKS[type(station.policy)] for station in engine.stations.values()]
+    station_of_type = {dish_type: names.index(cooks[0].name) for dish_type, cooks in engine.routes.items()}
+
+    count = len(arrivals)
+    scale = max(count, 1)  # packed key = major * scale + arrival index
+    arrival_time = [round(arrival.offset * 1_000_000) for arrival in arrivals]
+    station_of = []
+    for arrival in arrivals:
+        if arrival.dish.type not in station_of_type:
+            raise ValueError(f"No station cooks '{arrival.dish.type}' dishes.")
+        station_of.append(station_of_type[arrival.dish.type])
+    prep_seconds = [arrival.dish.prep_time * 60 for arrival in arrivals]
+    cook_time = [seconds * 1_000_000 * scale for seconds in prep_seconds]  # packed, like the stove entries
+    queue_key = [ranks[station](arrival.dish.prep_time) * scale + index
+                 for index, (arrival, station) in enumerate(zip(arrivals, station_of))]
+    visit_of = [arrival.visit for arrival in arrivals]
+    order_time = [0] * count  # microseconds, by arrival
+    start_time = [0] * count
+
+    pending = [[] for _ in names]  # station -> heap of queue keys
+    cooking = [0] * len(names)
+    on_stove = []  # heap of ready time * scale + arrival
+    waits = []
+    busy = [0] * len(names)  # prep seconds cooked per station
+    first_out = {}  # visit -> first completion, microseconds
+    last_out = {}
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    def start_cooking(now: int):
+        # Like KitchenEngine.start_cooking: stations in order, each filling its free slots
+        packed_now = now * scale
+        for station, queue in enumerate(pending):
+            while queue and cooking[station] < capacity[station]:
+                index = heappop(queue) % scale
+                cooking[station] += 1
+                start_time[index] = now
+                heappush(on_stove, packed_now + cook_time[index] + index)
+
+    index = 0
+    now = 0
+    # Dishes only wait while every slot of their station is taken, so the stove empties last
+    while index < count or on_stove:
+        now = arrival_time[index] if index < count else math.inf
+        if on_stove and on_stove[0] // scale <= now:
+            now = on_stove[0] // scale
+            limit = (now + 1) * scale
+            while on_stove and on_stove[0] < limit:
+                order = heappop(on_stove) % scale
+                station = station_of[order]
+                cooking[station] -= 1
+                waits.append((start_time[order] - order_time[order]) / 60_000_000)
+                busy[station] += prep_seconds[order]
+                visit = visit_of[order]
+                if visit not in first_out:
+                    first_out[visit] = now
+                last_out[visit] = now
+            start_cooking(now)
+
+        if index < count and arrival_time[index] <= now:
+            while index < count and arrival_time[index] <= now:
+                order_time[index] = now
+                heappush(pending[station_of[index]], queue_key[index])
+                index += 1
+            start_cooking(now)
+
+    duration = max(now / 1_000_000 - (arrivals[0].offset if arrivals else 0), 1e-9)
+    waits.sort()
+    spreads = sorted((last_out[visit] - first_out[visit]) / 60_000_000 for visit in first_out)
+    return SimulationReport(
+        policy=policy,
+        orders=count,
+        duration_minutes=duration / 60,
+        throughput_per_hour=count / duration * 3600,
+        wait_p50=percentile(waits, 0.50),
+        wait_p95=percentile(waits, 0.95),
+        wait_p99=percentile(waits, 0.99),
+        utilisation={name: busy[station] / (capacity[station] * duration) for station, name in enumerate(names)},
+        spread_p50=percentile(spreads, 0.50),
+        spread_p95=percentile(spreads, 0.95),
+    )
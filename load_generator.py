@@ -0,0 +1,210 @@
+# Plays orders into a kitchen at a realistic pace: a trace captured with --trace (see
+# order_trace.py) at 1x to 1000x its recorded speed, or Poisson arrivals over the menu's dishes.
+# Orders go into an in-process KitchenEngine, or to an order_server.py with --server, and the
+# report gives the end-to-end latency of each ticket (from when it was due to be placed until the
+# kitchen acknowledged it) and how many were dropped or late.
+#
+#   python load_generator.py --trace orders.trace.csv --speed 100
+#   python load_generator.py --rate 50 --seconds 30 --server 127.0.0.1:8765
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from kitchen_engine import KitchenEngine, Station, load_stations
+from kitchen_sim import percentile
+from menu import Menu
+from menu_loader import load_menu_csv
+from menu_store import MenuStore
+from models import Dish
+from order_client import OrderClient, OrderClientPool, ServerError
+from order_trace import TraceEntry, poisson_trace, read_trace
+
+CHEF_INTERVAL = 0.5  # seconds between the simulated chef's rounds when loading a server
+
+
+@dataclass
+class LoadReport:
+    target: str
+    speed: float
+    late_after: float  # seconds after its due time from which a ticket counts as late
+    orders: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)  # due -> acknowledged, seconds, of accepted tickets
+    late: int = 0
+    dropped: Counter = field(default_factory=Counter)  # reason -> tickets
+
+    def ticket(self, due: float, acknowledged: float):
+        latency = acknowledged - due
+        self.latencies.append(latency)
+        if latency > self.late_after:
+            self.late += 1
+
+    def format(self) -> str:
+        latencies = sorted(self.latencies)
+        dropped = sum(self.dropped.values())
+        lines = [f"{self.target} at {self.speed:g}x: {self.orders} tickets in {self.elapsed:.1f}s "
+                 f"({self.orders / max(self.elapsed, 1e-9):,.0f}/s), {len(latencies)} accepted, "
+                 f"{dropped} dropped, {self.late} late (over {self.late_after * 1000:.0f} ms)"]
+        if latencies:
+            lines.append(f"end-to-end latency: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+                         f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+        for reason, count in self.dropped.most_common(5):
+            lines.append(f"  dropped {count}: {reason}")
+        return "\n".join(lines)
+
+
+def replay_engine(entries: List[TraceEntry], menu: Menu, speed: float = 1, late_after: float = 0.1,
+                  stations: Optional[List[Station]] = None) -> LoadReport:
+    # The engine's clock follows the trace, so at 100x a 10-minute dish is ready after 6 seconds.
+    # Dishes are sent out as soon as they are ready and freed slots are filled straight away.
+    engine = KitchenEngine(stations)
+    report = LoadReport("engine", speed, late_after, orders=len(entries))
+    kitchen_start = datetime.now()
+    started = time.perf_counter()
+    for entry in entries:
+        due = started + entry.offset / speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        now = kitchen_start + timedelta(seconds=entry.offset)
+        for order in engine.tick(now):
+            engine.complete_order(order.order_id, now)
+        dish = menu.get(entry.dish)
+        if dish is None:
+            report.dropped[f"Dish '{entry.dish}' not found."] += 1
+            continue
+        try:
+            engine.submit_order(entry.table_number, dish, now)
+        except ValueError as e:
+            report.dropped[str(e)] += 1
+            continue
+        report.ticket(due, time.perf_counter())
+        engine.start_cooking(now)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+async def replay_server(entries: List[TraceEntry], host: str, port: int, speed: float = 1, late_after: float = 0.1,
+                        connections: int = 4, timeout: float = 5) -> LoadReport:
+    # Tickets are sent on time whether or not earlier ones have been answered, through a pool of
+    # batching connections. One chef screen starts what fits and sends out whatever is ready;
+    # the server cooks in real time, so at high speeds the queue grows.
+    report = LoadReport(f"server {host}:{port}", speed, late_after, orders=len(entries))
+    ready: List[int] = []
+
+    def on_events(events: List[dict]):
+        ready.extend(event["order"]["order_id"] for event in events if event["kind"] in ("due", "ready"))
+
+    pool = await OrderClientPool(host, port, size=connections).open()
+    chef = await OrderClient.connect(host, port, on_events)
+    await chef.subscribe()
+    chef_task = asyncio.ensure_future(_chef(chef, ready))
+
+    async def send(entry: TraceEntry, due: float):
+        try:
+            await asyncio.wait_for(pool.submit(entry.table_number, entry.dish), timeout)
+        except ServerError as e:
+            report.dropped[str(e)] += 1
+        except asyncio.TimeoutError:
+            report.dropped[f"No reply within {timeout:g}s."] += 1
+        except ConnectionError as e:
+            report.dropped[f"Connection lost: {e}"] += 1
+        else:
+            report.ticket(due, time.perf_counter())
+
+    started = time.perf_counter()
+    tickets = []
+    for entry in entries:
+        due = started + entry.offset / speed
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))  # also lets replies in when behind
+        tickets.append(asyncio.ensure_future(send(entry, due)))
+    await asyncio.gather(*tickets)
+    report.elapsed = time.perf_counter() - started
+
+    chef_task.cancel()
+    await chef.close()
+    await pool.close()
+    return report
+
+
+async def _chef(client: OrderClient, ready: List[int]):
+    while True:
+        await asyncio.sleep(CHEF_INTERVAL)
+        while ready:
+            try:
+                await client.request("complete", order_id=ready.pop())
+            except ServerError:
+                pass  # already sent out by another terminal
+        await client.request("start_cooking")
+
+
+def load_dishes(menu_db: str, menu_csv: str) -> List[Dish]:
+    # The menu QuickChefApp and order_server.py serve (Menu.db), or the CSV it would be imported
+    # from while there is none yet; the database is only read, never created
+    if os.path.exists(menu_db):
+        store = MenuStore(menu_db)
+        try:
+            dishes = store.load_dishes()
+        finally:
+            store.close()
+        if dishes:
+            return dishes
+    dishes, report = load_menu_csv(menu_csv)
+    if report.errors:
+        print(report.summary())
+    return dishes
+
+
+async def server_dishes(host: str, port: int) -> List[Dish]:
+    # The dishes a running server accepts orders for
+    client = await OrderClient.connect(host, port)
+    try:
+        return [Dish(dish["name"], dish["prep_time"], dish["ingredients"], dish["type"])
+                for dish in await client.request("menu") if dish["available"]]
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or synthesise orders against the kitchen.")
+    parser.add_argument("--trace", help="captured trace to replay; Poisson arrivals over the menu if omitted")
+    parser.add_argument("--speed", type=float, default=1, help="replay speed, e.g. 1 to 1000")
+    parser.add_argument("--rate", type=float, default=2, help="Poisson orders per second of trace time")
+    parser.add_argument("--seconds", type=float, default=60, help="trace time of Poisson arrivals")
+    parser.add_argument("--tables", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--menu-db", default="Menu.db", help="menu of the in-process engine")
+    parser.add_argument("--menu", default="Menu.csv", help="menu to read while there is no --menu-db")
+    parser.add_argument("--stations", help="stations file for the in-process engine")
+    parser.add_argument("--server", metavar="HOST:PORT", help="send the orders to an order_server.py")
+    parser.add_argument("--connections", type=int, default=4, help="connections to the server")
+    parser.add_argument("--late-ms", type=float, default=100, help="latency from which a ticket counts as late")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    late_after = args.late_ms / 1000
+    if args.server:
+        # Poisson orders are for the dishes the server serves, whatever this folder's menu says
+        host, _, port = args.server.rpartition(":")
+        host, port = host or "127.0.0.1", int(port)
+        entries = (read_trace(args.trace) if args.trace
+                   else poisson_trace(asyncio.run(server_dishes(host, port)), args.rate, args.seconds, args.tables,
+                                      args.seed))
+        report = asyncio.run(replay_server(entries, host, port, args.speed, late_after, args.connections))
+    else:
+        dishes = load_dishes(args.menu_db, args.menu)
+        entries = (read_trace(args.trace) if args.trace
+                   else poisson_trace(dishes, args.rate, args.seconds, args.tables, args.seed))
+        stations = load_stations(args.stations) if args.stations else None
+        report = replay_engine(entries, Menu(dishes), args.speed, late_after, stations)
+    print(report.format())
+
+
+if __name__ == "__main__":
+    main()
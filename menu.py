@@ -0,0 +1,137 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from models import Dish
+
+
+def ingredient_key(ingredient: str) -> str:
+    # "Gambas", " gambas" and "GAMBAS" are the same ingredient
+    return ingredient.strip().lower()
+
+
+class Menu:
+    # The dishes the kitchen can cook, indexed by name and by ingredient. Every add, update and
+    # remove keeps both indexes in step, so lookups by name are O(1) and finding (or 86'ing) the
+    # dishes that use an ingredient only touches those dishes.
+
+    def __init__(self, dishes: Iterable[Dish] = ()):
+        self._dishes: Dict[str, Dish] = {}  # name -> dish, in menu order
+        self._by_ingredient: Dict[str, Dict[str, Dish]] = {}  # ingredient key -> {name: dish}
+        self._out_of_stock: Dict[str, Set[str]] = {}  # ingredient key -> who 86'd it: "chef", "stock"
+        self._missing: Dict[str, int] = {}  # dish name -> number of its ingredients out of stock
+        for dish in dishes:
+            self.add(dish)
+
+    def __len__(self):
+        return len(self._dishes)
+
+    def __iter__(self) -> Iterator[Dish]:
+        return iter(self._dishes.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._dishes
+
+    def get(self, name: str) -> Optional[Dish]:
+        return self._dishes.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._dishes)
+
+    def add(self, dish: Dish):
+        if dish.name in self._dishes:
+            raise ValueError(f"A dish called '{dish.name}' is already on the menu.")
+        self._dishes[dish.name] = dish
+        self._index(dish)
+
+    def update(self, old_name: str, changes: Dish) -> Dish:
+        # Copies the changes into the existing Dish, so orders already holding it see them too
+        dish = self._dishes.get(old_name)
+        if dish is None:
+            raise ValueError(f"Dish '{old_name}' not found.")
+        if changes.name != old_name and changes.name in self._dishes:
+            raise ValueError(f"A dish called '{changes.name}' is already on the menu.")
+
+        self._unindex(dish)
+        del self._dishes[old_name]
+        dish.name = changes.name
+        dish.prep_time = changes.prep_time
+        dish.type = changes.type
+        dish.ingredients = changes.ingredients
+        self._dishes[dish.name] = dish
+        self._index(dish)
+        return dish
+
+    def remove(self, name: str) -> Dish:
+        dish = self._dishes.pop(name, None)
+        if dish is None:
+            raise ValueError(f"Dish '{name}' not found.")
+        self._unindex(dish)
+        return dish
+
+    def _index(self, dish: Dish):
+        missing = 0
+        for key in {ingredient_key(ingredient) for ingredient in dish.ingredients}:
+            self._by_ingredient.setdefault(key, {})[dish.name] = dish
+            missing += key in self._out_of_stock
+        if missing:
+            self._missing[dish.name] = missing
+
+    def _unindex(self, dish: Dish):
+        for key in {ingredient_key(ingredient) for ingredient in dish.ingredients}:
+            users = self._by_ingredient[key]
+            del users[dish.name]
+            if not users:
+                del self._by_ingredient[key]
+        self._missing.pop(dish.name, None)
+
+    def dishes_using(self, ingredient: str) -> List[Dish]:
+        return list(self._by_ingredient.get(ingredient_key(ingredient), {}).values())
+
+    def ingredients(self) -> List[str]:
+        return list(self._by_ingredient)
+
+    def mark_out_of_stock(self, ingredient: str, source: str = "chef") -> List[Dish]:
+        # 86's every dish using the ingredient, returning the dishes that just became unavailable.
+        # The chef's 86 and Inventory's (source "stock", when the portions run out) are kept apart,
+        # so stock coming back never lifts an 86 the chef made by hand, and the other way round.
+        key = ingredient_key(ingredient)
+        sources = self._out_of_stock.get(key)
+        if sources is not None:
+            sources.add(source)
+            return []
+        self._out_of_stock[key] = {source}
+        newly_unavailable = []
+        for dish in self._by_ingredient.get(key, {}).values():
+            count = self._missing.get(dish.name, 0)
+            if count == 0:
+                newly_unavailable.append(dish)
+            self._missing[dish.name] = count + 1
+        return newly_unavailable
+
+    def mark_in_stock(self, ingredient: str, source: str = "chef") -> List[Dish]:
+        # Undoes mark_out_of_stock by the same source, returning the dishes that can be ordered again
+        key = ingredient_key(ingredient)
+        sources = self._out_of_stock.get(key)
+        if sources is None or source not in sources:
+            return []
+        sources.discard(source)
+        if sources:
+            return []  # still 86'd by the other source
+        del self._out_of_stock[key]
+        available_again = []
+        for dish in self._by_ingredient.get(key, {}).values():
+            count = self._missing[dish.name] - 1
+            if count == 0:
+                del self._missing[dish.name]
+                available_again.append(dish)
+            else:
+                self._missing[dish.name] = count
+        return available_again
+
+    def out_of_stock(self) -> List[str]:
+        return sorted(self._out_of_stock)
+
+    def is_available(self, name: str) -> bool:
+        return name in self._dishes and name not in self._missing
+
+    def available(self) -> List[Dish]:
+        return [dish for name, dish in self._dishes.items() if name not in self._missing]
@@ -0,0 +1,82 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+import csv
+
+from models import Dish
+
+
+@dataclass(frozen=True)
+class RowError:
+    line: int  # line number in the file, counting the header as line 1
+    message: str
+
+
+@dataclass
+class MenuLoadReport:
+    rows: int = 0
+    loaded: int = 0
+    errors: List[RowError] = field(default_factory=list)
+
+    def summary(self, limit: int = 5) -> str:
+        lines = [f"Loaded {self.loaded} of {self.rows} dishes, skipped {len(self.errors)} rows."]
+        lines += [f"Line {error.line}: {error.message}" for error in self.errors[:limit]]
+        if len(self.errors) > limit:
+            lines.append(f"... and {len(self.errors) - limit} more.")
+        return "\n".join(lines)
+
+
+def iter_menu_csv(file_path: str, report: MenuLoadReport) -> Iterator[Dish]:
+    # Yields the valid dishes of a name,prep_time,type,ingredients CSV one row at a time. Bad rows
+    # and repeated names are recorded in the report instead of stopping the load; the first row
+    # with a name wins. Ingredient and type strings are shared between dishes, so a large menu
+    # holds one copy of "Sal" rather than one per dish.
+    strings: Dict[str, str] = {}
+    seen: Dict[str, int] = {}  # dish name -> line it was loaded from
+    errors = report.errors
+
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # Skip header row
+        for line, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            report.rows += 1
+            if len(row) != 4:
+                errors.append(RowError(line, f"expected 4 columns, found {len(row)}"))
+                continue
+
+            name, prep_time, dish_type, ingredients = row
+            name = name.strip()
+            if not name:
+                errors.append(RowError(line, "missing dish name"))
+                continue
+            if name in seen:
+                errors.append(RowError(line, f"'{name}' is already on line {seen[name]}"))
+                continue
+            try:
+                prep_minutes = int(prep_time)
+            except ValueError:
+                errors.append(RowError(line, f"preparation time '{prep_time}' is not a number"))
+                continue
+            if prep_minutes <= 0:
+                errors.append(RowError(line, f"preparation time must be positive, not {prep_minutes}"))
+                continue
+            dish_type = dish_type.strip().lower()
+            if not dish_type:
+                errors.append(RowError(line, "missing dish type"))
+                continue
+            ingredients_list = [strings.setdefault(ingredient, ingredient)
+                                for ingredient in ingredients.split(", ") if ingredient]
+            if not ingredients_list:
+                errors.append(RowError(line, "missing ingredients"))
+                continue
+
+            seen[name] = line
+            report.loaded += 1
+            yield Dish(name, prep_minutes, ingredients_list, strings.setdefault(dish_type, dish_type))
+
+
+def load_menu_csv(file_path: str) -> Tuple[List[Dish], MenuLoadReport]:
+    report = MenuLoadReport()
+    dishes = list(iter_menu_csv(file_path, report))
+    return dishes, report
@@ -0,0 +1,109 @@
+from typing import Iterable, List, Optional
+import csv
+import os
+import sqlite3
+
+from menu_loader import MenuLoadReport, iter_menu_csv
+from models import Dish
+
+CSV_HEADER = ["name", "prep_time", "type", "ingredients"]
+
+
+class MenuStore:
+    # The menu on disk, kept in SQLite so that adding, editing or deleting a dish writes only that
+    # row inside a transaction instead of rewriting the whole file. Dish names are the primary key,
+    # so lookups by name use the index. Menu.csv can still be imported and exported.
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS dishes ("
+            "name TEXT PRIMARY KEY, prep_time INTEGER NOT NULL, type TEXT NOT NULL, ingredients TEXT NOT NULL)")
+        self.connection.commit()
+
+    def data_version(self) -> int:
+        # Changes whenever another connection commits to the database (not on this one's own writes)
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_dishes(self) -> List[Dish]:
+        rows = self.connection.execute("SELECT name, prep_time, type, ingredients FROM dishes ORDER BY rowid")
+        return [_to_dish(row) for row in rows]
+
+    def get(self, name: str) -> Optional[Dish]:
+        row = self.connection.execute(
+            "SELECT name, prep_time, type, ingredients FROM dishes WHERE name = ?", (name,)).fetchone()
+        return _to_dish(row) if row else None
+
+    def add_dish(self, dish: Dish):
+        _check(dish)
+        try:
+            with self.connection:
+                self.connection.execute("INSERT INTO dishes VALUES (?, ?, ?, ?)", _to_row(dish))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"A dish called '{dish.name}' is already on the menu.")
+
+    def update_dish(self, old_name: str, dish: Dish):
+        # Replaces the dish stored as old_name, which may rename it
+        _check(dish)
+        try:
+            with self.connection:
+                cursor = self.connection.execute(
+                    "UPDATE dishes SET name = ?, prep_time = ?, type = ?, ingredients = ? WHERE name = ?",
+                    _to_row(dish) + (old_name,))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"A dish called '{dish.name}' is already on the menu.")
+        if cursor.rowcount == 0:
+            raise ValueError(f"Dish '{old_name}' not found.")
+
+    def delete_dish(self, name: str):
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM dishes WHERE name = ?", (name,))
+        if cursor.rowcount == 0:
+            raise ValueError(f"Dish '{name}' not found.")
+
+    def replace_all(self, dishes: Iterable[Dish]):
+        # Swaps the whole menu in one transaction; later dishes win over earlier ones with the same name
+        with self.connection:
+            self.connection.execute("DELETE FROM dishes")
+            self.connection.executemany("INSERT OR REPLACE INTO dishes VALUES (?, ?, ?, ?)",
+                                        (_to_row(dish) for dish in dishes))
+
+    def import_csv(self, file_path: str) -> MenuLoadReport:
+        # Streams the valid rows straight into the database; invalid ones are listed in the report
+        report = MenuLoadReport()
+        self.replace_all(iter_menu_csv(file_path, report))
+        return report
+
+    def export_csv(self, file_path: str) -> int:
+        # Written next to the target and renamed over it, so the CSV is never left half-written
+        dishes = self.load_dishes()
+        temp_path = file_path + ".tmp"
+        with open(temp_path, mode='w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_HEADER)
+            for dish in dishes:
+                writer.writerow([dish.name, dish.prep_time, dish.type, ", ".join(dish.ingredients)])
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+        return len(dishes)
+
+    def close(self):
+        self.connection.close()
+
+
+def _check(dish: Dish):
+    # The same rule as menu_loader's for Menu.csv rows
+    if dish.prep_time <= 0:
+        raise ValueError(f"Preparation time must be positive, not {dish.prep_time}.")
+
+
+def _to_row(dish: Dish) -> tuple:
+    return dish.name, dish.prep_time, dish.type, ", ".join(dish.ingredients)
+
+
+def _to_dish(row) -> Dish:
+    name, prep_time, dish_type, ingredients = row
+    return Dish(name, prep_time, ingredients.split(", "), dish_type)
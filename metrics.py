@@ -0,0 +1,249 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import os
+import threading
+import time
+
+from order_history import OrderRecord
+
+# Seconds, from sub-millisecond calls up to a long wait for a slow dish
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 60, 300, 600, 1800, 3600)
+
+# Called with (section name, seconds) after every timed section, e.g. to log slow calls
+ProfileHook = Callable[[str, float], None]
+
+
+class Counter:
+    # Like Gauge, may read a running total kept elsewhere (e.g. KitchenEngine.completed_count)
+    __slots__ = ("value", "function")
+
+    def __init__(self, function: Optional[Callable[[], float]] = None):
+        self.value = 0.0
+        self.function = function
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge:
+    # Either set by the code it measures or, with a function, read only when exported, which
+    # keeps values such as queue depth off the hot path entirely
+    __slots__ = ("value", "function")
+
+    def __init__(self, function: Optional[Callable[[], float]] = None):
+        self.value = 0.0
+        self.function = function
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Histogram:
+    # Fixed buckets, so observe() is one binary search and two additions; the total count is
+    # only added up when exported
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS):
+        # As floats: bisecting a float among ints compares about twice as slowly
+        self.bounds = tuple(float(bound) for bound in bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class _Family:
+    __slots__ = ("kind", "help", "children")
+
+    def __init__(self, kind: str, help_text: str):
+        self.kind = kind
+        self.help = help_text
+        self.children: Dict[Tuple[Tuple[str, str], ...], object] = {}  # sorted labels -> metric
+
+
+class MetricsRegistry:
+    # Named metrics with optional labels, exported in the Prometheus text format. Asking twice for
+    # the same name and labels returns the same metric, so callers look theirs up once and keep it.
+
+    def __init__(self, profile_hook: Optional[ProfileHook] = None):
+        self.profile_hook = profile_hook
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()  # creating metrics and exporting may happen on other threads
+
+    def counter(self, name: str, help_text: str = "", function: Optional[Callable[[], float]] = None,
+                **labels: str) -> Counter:
+        return self._get(name, "counter", help_text, labels, lambda: Counter(function))
+
+    def gauge(self, name: str, help_text: str = "", function: Optional[Callable[[], float]] = None,
+              **labels: str) -> Gauge:
+        return self._get(name, "gauge", help_text, labels, lambda: Gauge(function))
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS,
+                  **labels: str) -> Histogram:
+        return self._get(name, "histogram", help_text, labels, lambda: Histogram(buckets))
+
+    def _get(self, name: str, kind: str, help_text: str, labels: Dict[str, str], factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = _Family(kind, help_text)
+            elif family.kind != kind:
+                raise ValueError(f"Metric '{name}' is already a {family.kind}.")
+            metric = family.children.get(key)
+            if metric is None:
+                metric = family.children[key] = factory()
+            return metric
+
+    @contextmanager
+    def timer(self, name: str, help_text: str = "", **labels: str) -> Iterator[None]:
+        # Observes how long the block took in the `name` histogram and passes it to the profile hook
+        histogram = self.histogram(name, help_text, **labels)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            histogram.observe(elapsed)
+            if self.profile_hook is not None:
+                self.profile_hook(name, elapsed)
+
+    def render(self) -> str:
+        with self._lock:
+            families = [(name, family, list(family.children.items())) for name, family in self._families.items()]
+        lines: List[str] = []
+        for name, family, children in sorted(families, key=lambda item: item[0]):
+            if family.help:
+                lines.append(f"# HELP {name} {family.help}")
+            lines.append(f"# TYPE {name} {family.kind}")
+            for key, metric in children:
+                if family.kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.bounds + (float("inf"),), metric.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(key)} {metric.sum!r}")
+                    lines.append(f"{name}_count{_labels(key)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_labels(key)} {float(metric.get())!r}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_path: str):
+        # For node_exporter's textfile collector; renamed into place so it is never read half-written
+        temp_path = file_path + ".tmp"
+        with open(temp_path, mode='w', encoding='utf-8') as file:
+            file.write(self.render())
+        os.replace(temp_path, file_path)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9108):
+        # Serves GET /metrics from a background thread; call shutdown() on the result to stop.
+        # http.server is imported here so programs that never serve metrics start faster.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def log_slow_sections(threshold: float) -> ProfileHook:
+    # A profile hook printing every timed section that took longer than `threshold` seconds
+    def hook(name: str, seconds: float):
+        if seconds >= threshold:
+            print(f"slow: {name} took {seconds * 1000:.1f} ms")
+    return hook
+
+
+def _labels(key: Tuple[Tuple[str, str], ...]) -> str:
+    if not key:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+
+class KitchenMetrics:
+    # Instruments a KitchenEngine without adding anything to its hot path. Counts and queue
+    # depths are read from the engine only when the metrics are exported; the time each order
+    # spent waiting, cooking and at the pass is observed from the record its OrderHistory makes
+    # when the dish is sent out, which already carries plain timestamps.
+
+    def __init__(self, engine, registry: MetricsRegistry):
+        self.registry = registry
+        self._stations: Dict[str, Tuple[Histogram, Histogram, Histogram]] = {}
+        for name, station in engine.stations.items():
+            registry.gauge("kitchen_pending_orders", "Orders waiting to be cooked",
+                           function=lambda name=name: engine.book.pending_count(name), station=name)
+            registry.gauge("kitchen_cooking_orders", "Dishes on the stove",
+                           function=lambda station=station: station.cooking, station=name)
+        registry.gauge("kitchen_ready_orders", "Cooked dishes waiting to be sent out",
+                       function=lambda: len(engine.ready_orders))
+        registry.counter("kitchen_orders_submitted_total", "Orders placed",
+                         function=lambda: engine.next_order_id - 1)
+        registry.counter("kitchen_orders_completed_total", "Dishes sent out",
+                         function=lambda: engine.completed_count)
+        registry.counter("kitchen_orders_cancelled_total", "Orders cancelled before cooking",
+                         function=lambda: engine.cancelled_count)
+        self.unsubscribe = engine.completed_orders.subscribe(self._on_record)
+
+    def _on_record(self, record: OrderRecord, bisect_left=bisect_left):
+        # Called for every dish sent out, with the record the history makes anyway, so
+        # Histogram.observe() is written out inline and bisect_left is a local
+        try:
+            wait, cook, at_pass = self._stations[record.station]
+        except KeyError:
+            wait, cook, at_pass = self._add_station(record.station)
+        start_time = record.start_time
+        ready_time = record.ready_time
+        value = start_time - record.order_time
+        wait.counts[bisect_left(wait.bounds, value)] += 1
+        wait.sum += value
+        value = ready_time - start_time
+        cook.counts[bisect_left(cook.bounds, value)] += 1
+        cook.sum += value
+        value = record.completion_time - ready_time
+        at_pass.counts[bisect_left(at_pass.bounds, value)] += 1
+        at_pass.sum += value
+
+    def _add_station(self, station: str) -> Tuple[Histogram, Histogram, Histogram]:
+        registry = self.registry
+        histograms = self._stations[station] = (
+            registry.histogram("kitchen_wait_seconds", "From placing an order to starting it", station=station),
+            registry.histogram("kitchen_cook_seconds", "From starting a dish to it being ready", station=station),
+            registry.histogram("kitchen_pass_seconds", "From a dish being ready to sending it out", station=station),
+        )
+        return histograms
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List
+
+
+@dataclass
+class Dish:
+    name: str
+    prep_time: int  # in minutes
+    ingredients: List[str]
+    type: str  # e.g. tapas or main dish; cooked by the stations listing it (see Station.dish_types)
+
+
+class Order:
+    # Slots rather than an instance dict: a busy kitchen holds thousands of these
+    __slots__ = ("order_id", "table_number", "dish", "order_time", "status", "station", "rushed", "priority",
+                 "prep_estimate", "start_time", "estimated_completion", "ready_time", "completion_time", "reserved")
+
+    def __init__(self, table_number: int, dish: Dish, order_time: datetime, order_id: int = 0):
+        self.order_id = order_id
+        self.table_number = table_number
+        self.dish = dish
+        self.order_time = order_time
+        self.status = "pending"  # then cooking, due (time up, not called done yet) or ready, and completed; or cancelled
+        self.station = None  # name of the station queue holding the order
+        self.rushed = False
+        self.priority = order_time.timestamp()  # replaced by the station's policy key once queued
+        self.prep_estimate = dish.prep_time  # minutes the kitchen expects it to take (see PrepTimeStats)
+        self.start_time = None
+        self.estimated_completion = None
+        self.ready_time = None  # when it left the stove: called done by the chef, or its time ran out
+        self.completion_time = None
+        self.reserved = ()  # ingredient keys Inventory reserved for the order when it was placed
+
+
+    def __lt__(self, other):
+        return self.priority < other.priority
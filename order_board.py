@@ -0,0 +1,191 @@
+import tkinter as tk
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from events import OrderEvent
+from models import Order
+
+# (key, text, style). Keys identify rows between refreshes, e.g. an order id; the style is
+# "row" for a ticket, "heading" for a section title or "note" for text that cannot be clicked.
+BoardRow = Tuple[Hashable, str, str]
+
+
+class Section(NamedTuple):
+    key: Hashable
+    heading: str
+    text: Callable[[Order], str]  # text of an order's row, formatted when the row is drawn
+    empty: str  # shown when the section has no orders
+    style: str = "row"
+    sort_key: Optional[Callable[[Order], Any]] = None  # None keeps orders in the order they arrived
+
+
+class TicketRows:
+    # The rows of an order board, kept up to date from the engine's OrderEvents instead of a new
+    # snapshot per refresh. `place` names the section an order belongs in (None once it leaves
+    # the board); apply() only moves the orders in the events. Rows are formatted when the board
+    # asks for them, so a refresh formats one screenful however many tickets there are. Sections
+    # with a sort_key are re-sorted when anything changed, as a policy may re-plan orders without
+    # an event of their own; they are nearly in order already, which keeps that close to linear.
+
+    def __init__(self, sections: List[Section], place: Callable[[Order], Optional[Hashable]]):
+        self.sections = {section.key: section for section in sections}
+        self.place = place
+        self._orders: Dict[Hashable, Dict[int, Order]] = {section.key: {} for section in sections}
+        self._where: Dict[int, Hashable] = {}  # order_id -> section of an order on the board
+        self._layout: List[Any] = []  # a BoardRow for headings and empty notes, else an Order
+        self._stale = True
+
+    def load(self, orders: Iterable[Order]):
+        for orders_in_section in self._orders.values():
+            orders_in_section.clear()
+        self._where.clear()
+        for order in orders:
+            self._put(order)
+        self._stale = True
+
+    def apply(self, events: Iterable[OrderEvent]) -> bool:
+        # Returns True if any row was added, moved or removed
+        changed = False
+        for event in events:
+            changed = self._put(event.order) or changed
+        self._stale = self._stale or changed
+        return changed
+
+    def _put(self, order: Order) -> bool:
+        order_id = order.order_id
+        old = self._where.get(order_id)
+        new = self.place(order)
+        if new not in self._orders:
+            new = None
+        if old is not None and old != new:
+            del self._orders[old][order_id]
+            del self._where[order_id]
+        if new is not None:
+            self._orders[new][order_id] = order  # keeps its place if it was already in the section
+            self._where[order_id] = new
+        return old is not None or new is not None
+
+    def _relayout(self):
+        layout = []
+        for key, section in self.sections.items():
+            layout.append((key, section.heading, "heading"))
+            orders = self._orders[key]
+            if not orders:
+                layout.append(((key, "empty"), section.empty, "note"))
+            elif section.sort_key is None:
+                layout += orders.values()
+            else:
+                layout += sorted(orders.values(), key=section.sort_key)
+        self._layout = layout
+        self._stale = False
+
+    def __len__(self):
+        if self._stale:
+            self._relayout()
+        return len(self._layout)
+
+    def __getitem__(self, index: int) -> BoardRow:
+        if self._stale:
+            self._relayout()
+        entry = self._layout[index]
+        if type(entry) is tuple:
+            return entry
+        section = self.sections[self._where[entry.order_id]]
+        return entry.order_id, section.text(entry), section.style
+
+
+class OrderBoard(tk.Frame):
+    # A scrollable list of tickets drawn on a single Canvas. Only the rows in view have canvas
+    # items, and those are recycled as the list scrolls or changes, so refreshing a board with
+    # thousands of tickets costs the same as refreshing one screenful. The rows may be a list or
+    # TicketRows; only the ones in view are read, and only the items whose text actually changed
+    # are rewritten.
+
+    def __init__(self, master, on_click: Optional[Callable[[Hashable], None]] = None, row_height: int = 28,
+                 font=("Arial", 14), heading_font=("Arial", 16, "bold"), width: int = 520, height: int = 420):
+        super().__init__(master)
+        self.on_click = on_click
+        self.row_height = row_height
+        self.fonts = {"row": font, "note": font, "heading": heading_font}
+
+        self.canvas = tk.Canvas(self, width=width, height=height, highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self._yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self._rows: Sequence[BoardRow] = []
+        self._top = 0  # index of the first row in view
+        self._items: List[int] = []  # one canvas text item per visible slot
+        self._shown: List[Tuple[str, str]] = []  # (text, style) each slot currently displays
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", lambda event: self._scroll(-1 if event.delta > 0 else 1))
+        self.canvas.bind("<Button-4>", lambda event: self._scroll(-1))
+        self.canvas.bind("<Button-5>", lambda event: self._scroll(1))
+        self._resize_pool(height)
+
+    def set_rows(self, rows: Sequence[BoardRow]):
+        # Shows `rows`, which is kept (not copied): call refresh() after changing it in place
+        self._rows = rows
+        self.refresh()
+
+    def refresh(self):
+        self._top = self._clamp(self._top)
+        self._redraw()
+
+    def _clamp(self, top: int) -> int:
+        # The last slot is usually cut off by the bottom edge, so the last row may sit one above it
+        return max(0, min(top, len(self._rows) - len(self._items) + 1))
+
+    def rows(self) -> List[BoardRow]:
+        return list(self._rows)
+
+    def _on_resize(self, event):
+        self._resize_pool(event.height)
+
+    def _resize_pool(self, height: int):
+        visible = max(1, height // self.row_height + 1)
+        while len(self._items) < visible:
+            y = len(self._items) * self.row_height + self.row_height // 2
+            self._items.append(self.canvas.create_text(10, y, anchor="w", text="", font=self.fonts["row"]))
+            self._shown.append(("", "row"))
+        while len(self._items) > visible:
+            self.canvas.delete(self._items.pop())
+            self._shown.pop()
+        self._redraw()
+
+    def _redraw(self):
+        rows = self._rows
+        count = len(rows)
+        for slot, item in enumerate(self._items):
+            index = self._top + slot
+            shown = tuple(rows[index][1:]) if index < count else ("", "row")
+            if self._shown[slot] != shown:
+                text, style = shown
+                self.canvas.itemconfigure(item, text=text, font=self.fonts[style])
+                self._shown[slot] = shown
+
+        total = max(1, count)
+        self.scrollbar.set(self._top / total, min(1.0, (self._top + len(self._items)) / total))
+
+    def _scroll(self, rows: int):
+        top = self._clamp(self._top + rows)
+        if top != self._top:
+            self._top = top
+            self._redraw()
+
+    def _yview(self, action, *args):
+        # Scrollbar callback: ("moveto", fraction) or ("scroll", n, "units" | "pages")
+        if action == "moveto":
+            self._scroll(int(float(args[0]) * len(self._rows)) - self._top)
+        elif action == "scroll":
+            step = len(self._items) - 1 if args[1] == "pages" else 1
+            self._scroll(int(args[0]) * max(1, step))
+
+    def _on_click(self, event):
+        index = self._top + int(event.y // self.row_height)
+        if self.on_click is None or index >= len(self._rows):
+            return
+        key, _, style = self._rows[index]
+        if style == "row":
+            self.on_click(key)
@@ -0,0 +1,213 @@
+from typing import Callable, Dict, Iterable, List, Optional
+import heapq
+import itertools
+
+from models import Order
+from scheduling import PriorityPolicy, priority_key
+
+# Rebuild a queue's heap once more than half of it is cancelled or re-prioritised leftovers
+_COMPACT_MIN_SIZE = 64
+
+
+class _Queue:
+
+    def __init__(self, policy: PriorityPolicy):
+        self.policy = policy
+        # [key, sequence, order, dish type, minutes], order is None once the entry is stale. The
+        # type and minutes are those counted when the order was pushed: a menu edit changes the
+        # Dish in place, so counting down from the order itself would let the counts drift.
+        self.heap = []
+        self.size = 0  # live entries
+        self.stale = 0
+        self.minutes = 0.0  # expected prep minutes of the live entries
+        self.types: Dict[str, int] = {}  # dish type -> live entries of that type
+
+
+class OrderBook:
+    # The single store for every order that has not been sent out yet. Pending orders sit in one
+    # heap per station queue; cancelling or re-prioritising marks the old heap entry stale instead
+    # of searching for it, so insert, pop, cancel and re-prioritise are all O(log n) (amortised),
+    # and lookups by order id or table are O(1).
+
+    def __init__(self):
+        self.orders: Dict[int, Order] = {}  # order_id -> pending or cooking order
+        self.cooking: Dict[int, Order] = {}  # order_id -> order, in the order they were started
+        self._tables: Dict[int, Dict[int, Order]] = {}  # table_number -> {order_id: order}
+        self._queues: Dict[str, _Queue] = {}
+        self._entries: Dict[int, list] = {}  # order_id -> live heap entry of a pending order
+        self._sequence = itertools.count()  # keeps heap entries unique so orders are never compared
+
+    def add_queue(self, name: str, policy: PriorityPolicy):
+        self._queues[name] = _Queue(policy)
+
+    def policy(self, name: str) -> PriorityPolicy:
+        return self._queues[name].policy
+
+    def push(self, order: Order, queue_name: str):
+        if order.order_id in self.orders:
+            raise ValueError(f"Order {order.order_id} is already in the kitchen.")
+
+        queue = self._queues[queue_name]
+        order.station = queue_name
+        self.orders[order.order_id] = order
+        self._tables.setdefault(order.table_number, {})[order.order_id] = order
+        changed = queue.policy.admit(order)
+        entry = self._push_entry(queue, order, order.dish.type, order.prep_estimate)
+        self._count(queue, entry, 1)
+        self._reprioritise_all(changed)
+
+    def _push_entry(self, queue: _Queue, order: Order, dish_type: str, minutes: float) -> list:
+        order.priority = priority_key(queue.policy, order)
+        entry = [order.priority, next(self._sequence), order, dish_type, minutes]
+        self._entries[order.order_id] = entry
+        heapq.heappush(queue.heap, entry)
+        queue.size += 1
+        return entry
+
+    def peek(self, queue_name: str) -> Optional[Order]:
+        queue = self._queues[queue_name]
+        heap = queue.heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+            queue.stale -= 1
+        return heap[0][2] if heap else None
+
+    def first(self, queue_name: str, accept: Callable[[Order], bool]) -> Optional[Order]:
+        # Highest-priority pending order of the queue that `accept` takes. The heap is walked in
+        # priority order from the top, so this is O(k log k) in the k entries looked at rather
+        # than a sort of the whole queue.
+        heap = self._queues[queue_name].heap
+        frontier = [(heap[0], 0)] if heap else []  # entries compare by key and sequence, never by order
+        while frontier:
+            entry, index = heapq.heappop(frontier)
+            if entry[2] is not None and accept(entry[2]):
+                return entry[2]
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return None
+
+    def pop(self, queue_name: str, now: float) -> Optional[Order]:
+        # Removes the highest-priority pending order and marks it as cooking, unless the queue's
+        # policy says it may not start yet at timestamp `now`
+        order = self.peek(queue_name)
+        queue = self._queues[queue_name]
+        if order is None or not queue.policy.ready(order, now):
+            return None
+
+        entry = heapq.heappop(queue.heap)
+        queue.size -= 1
+        del self._entries[order.order_id]
+        self._count(queue, entry, -1)
+        self.cooking[order.order_id] = order
+        self._reprioritise_all(queue.policy.start(order, now))
+        return order
+
+    def take(self, order_id: int, now: float) -> Optional[Order]:
+        # Marks a specific pending order as cooking, wherever it is in its queue
+        entry = self._entries.pop(order_id, None)
+        if entry is None:
+            return None
+
+        order = entry[2]
+        queue = self._queues[order.station]
+        self._count(queue, entry, -1)
+        self._invalidate(queue, entry)
+        self.cooking[order_id] = order
+        self._reprioritise_all(queue.policy.start(order, now))
+        return order
+
+    def finish(self, order_id: int) -> Optional[Order]:
+        # Removes a cooking order from the book, returning None if it is not cooking
+        order = self.cooking.pop(order_id, None)
+        if order is not None:
+            self._forget(order)
+        return order
+
+    def cancel(self, order_id: int) -> Optional[Order]:
+        # Removes a pending order from the book, returning None if it is not pending
+        entry = self._entries.pop(order_id, None)
+        if entry is None:
+            return None
+
+        order = entry[2]
+        queue = self._queues[order.station]
+        self._count(queue, entry, -1)
+        self._invalidate(queue, entry)
+        self._forget(order)
+        queue.policy.release(order)
+        return order
+
+    def reprioritise(self, order_id: int) -> Optional[Order]:
+        # Recomputes a pending order's key, e.g. after it was rushed or its table's plan changed
+        entry = self._entries.get(order_id)
+        if entry is None:
+            return None
+
+        order = entry[2]
+        queue = self._queues[order.station]
+        if priority_key(queue.policy, order) != entry[0]:
+            self._invalidate(queue, entry)
+            self._push_entry(queue, order, entry[3], entry[4])
+        return order
+
+    def _reprioritise_all(self, orders):
+        for order in orders:
+            self.reprioritise(order.order_id)
+
+    def _invalidate(self, queue: _Queue, entry: list):
+        entry[2] = None
+        queue.size -= 1
+        queue.stale += 1
+        if queue.stale > _COMPACT_MIN_SIZE and queue.stale > queue.size:
+            queue.heap = [live for live in queue.heap if live[2] is not None]
+            heapq.heapify(queue.heap)
+            queue.stale = 0
+
+    @staticmethod
+    def _count(queue: _Queue, entry: list, change: int):
+        dish_type = entry[3]
+        queue.minutes += change * entry[4]
+        count = queue.types.get(dish_type, 0) + change
+        if count:
+            queue.types[dish_type] = count
+        else:
+            del queue.types[dish_type]
+
+    def _forget(self, order: Order):
+        del self.orders[order.order_id]
+        table_orders = self._tables[order.table_number]
+        del table_orders[order.order_id]
+        if not table_orders:
+            del self._tables[order.table_number]
+
+    def get(self, order_id: int) -> Optional[Order]:
+        return self.orders.get(order_id)
+
+    def is_pending(self, order_id: int) -> bool:
+        return order_id in self._entries
+
+    def table_orders(self, table_number: int) -> List[Order]:
+        # Pending and cooking orders for a table, in submission order
+        return list(self._tables.get(table_number, {}).values())
+
+    def tables(self) -> List[int]:
+        return list(self._tables)
+
+    def pending_count(self, queue_name: str) -> int:
+        return self._queues[queue_name].size
+
+    def pending_minutes(self, queue_name: str) -> float:
+        # Expected prep minutes of the queue's pending orders
+        return self._queues[queue_name].minutes
+
+    def has_pending(self, queue_name: str, dish_types: Iterable[str]) -> bool:
+        types = self._queues[queue_name].types
+        return any(types.get(dish_type) for dish_type in dish_types)
+
+    def pending_orders(self, queue_name: str) -> List[Order]:
+        # In the order they will be started
+        return [entry[2] for entry in sorted(self._queues[queue_name].heap) if entry[2] is not None]
+
+    def __len__(self):
+        return len(self.orders)
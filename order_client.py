@@ -0,0 +1,367 @@
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from events import OrderEvent
+from kitchen_engine import KitchenSnapshot
+from menu import Menu
+from models import Dish, Order
+
+
+class ServerError(ValueError):
+    pass
+
+
+def order_from_dict(data: dict) -> Order:
+    # Rebuilds an order sent by the server; the dish carries no ingredients
+    order = Order(data["table"], Dish(data["dish"], data["prep_time"], [], data["type"]),
+                  datetime.fromtimestamp(data["order_time"]), data["order_id"])
+    order.status = data["status"]
+    order.station = data["station"]
+    order.rushed = data["rushed"]
+    order.priority = tuple(data["priority"]) if isinstance(data["priority"], list) else data["priority"]
+    order.prep_estimate = data["prep_estimate"]
+    if data["start_time"] is not None:
+        order.start_time = datetime.fromtimestamp(data["start_time"])
+    if data["estimated_completion"] is not None:
+        order.estimated_completion = datetime.fromtimestamp(data["estimated_completion"])
+    if data["ready_time"] is not None:
+        order.ready_time = datetime.fromtimestamp(data["ready_time"])
+    return order
+
+
+class OrderClient:
+    # One connection to an OrderServer. Requests are pipelined: several may be in flight at once
+    # and each waits only for its own reply. After subscribe(), event batches go to on_events and
+    # the menu with its 86'd ingredients, whenever either changes, to on_menu.
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 on_events: Optional[Callable[[List[dict]], None]] = None,
+                 on_menu: Optional[Callable[[List[dict], List[str]], None]] = None):
+        self.reader = reader
+        self.writer = writer
+        self.on_events = on_events
+        self.on_menu = on_menu
+        self._ids = itertools.count(1)
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 8765,
+                      on_events: Optional[Callable[[List[dict]], None]] = None,
+                      on_menu: Optional[Callable[[List[dict], List[str]], None]] = None) -> "OrderClient":
+        reader, writer = await asyncio.open_connection(host, port, limit=2 ** 24)
+        return cls(reader, writer, on_events, on_menu)
+
+    async def request(self, op: str, **params):
+        # Returns the result, or raises ServerError with the server's message
+        if self._listener.done():
+            raise ConnectionError("Connection to the order server was closed.")
+        request_id = next(self._ids)
+        reply = self._waiting[request_id] = asyncio.get_running_loop().create_future()
+        self.writer.write((json.dumps(dict(params, id=request_id, op=op)) + "\n").encode())
+        await self.writer.drain()
+        return await reply
+
+    async def submit(self, orders: List[Tuple[int, str]]) -> List[dict]:
+        # Places a batch of (table, dish name) orders in one round trip. Each result is
+        # {"ok": True, "order": {...}} or {"ok": False, "error": "..."}.
+        return await self.request("submit", orders=[{"table": table, "dish": dish} for table, dish in orders])
+
+    async def subscribe(self):
+        await self.request("subscribe")
+
+    async def close(self):
+        self.writer.close()
+        self._listener.cancel()
+
+    async def _listen(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if "events" in message:
+                    if self.on_events is not None:
+                        self.on_events(message["events"])
+                    continue
+                if "menu" in message:
+                    if self.on_menu is not None:
+                        self.on_menu(message["menu"], message.get("out_of_stock", []))
+                    continue
+                reply = self._waiting.pop(message["id"], None)
+                if reply is None or reply.done():
+                    continue
+                if message["ok"]:
+                    reply.set_result(message["result"])
+                else:
+                    reply.set_exception(ServerError(message["error"]))
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            pass  # closed, or a line over the 16 MiB read limit
+        finally:
+            for reply in self._waiting.values():
+                if not reply.done():
+                    reply.set_exception(ConnectionError("Connection to the order server was closed."))
+            self._waiting.clear()
+
+
+class OrderClientPool:
+    # A few shared connections for many callers (e.g. every waiter on one tablet host). Orders
+    # submitted within batch_delay seconds of each other travel in a single submit request, so
+    # the server sees one message per batch instead of one per dish.
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, size: int = 4,
+                 batch_size: int = 64, batch_delay: float = 0.005):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.clients: List[OrderClient] = []
+        self._next = itertools.cycle(range(size))
+        self._batch: List[Tuple[Tuple[int, str], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def open(self) -> "OrderClientPool":
+        self.clients = [await OrderClient.connect(self.host, self.port) for _ in range(self.size)]
+        return self
+
+    def client(self) -> OrderClient:
+        return self.clients[next(self._next)]
+
+    async def request(self, op: str, **params):
+        return await self.client().request(op, **params)
+
+    async def submit(self, table_number: int, dish_name: str) -> dict:
+        # Resolves to the placed order, or raises ServerError if the server refused it
+        reply = asyncio.get_running_loop().create_future()
+        self._batch.append(((table_number, dish_name), reply))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_delay, self._flush)
+        return await reply
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if batch:
+            asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch: List[Tuple[Tuple[int, str], asyncio.Future]]):
+        try:
+            results = await self.client().submit([order for order, _ in batch])
+        except (ConnectionError, ServerError) as e:
+            for _, reply in batch:
+                reply.set_exception(e)
+            return
+        for (_, reply), result in zip(batch, results):
+            if result["ok"]:
+                reply.set_result(result["order"])
+            else:
+                reply.set_exception(ServerError(result["error"]))
+
+    async def close(self):
+        self._flush()
+        for client in self.clients:
+            await client.close()
+
+
+class RemoteKitchen:
+    # Stand-in for KitchenEngine backed by an OrderServer, for the Tk GUI. The asyncio loop runs
+    # on a background thread and the GUI never waits for it: reads come from a copy of the open
+    # orders that the event subscription keeps up to date, and actions return a Future of the
+    # server's answer, which fails with ServerError, ConnectionError or TimeoutError. Subscribers
+    # are called on the loop thread, so they must be thread-safe (EventBuffer.push is).
+
+    journal = None
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, timeout: float = 5):
+        # Connecting waits for the server (QuickChefApp does it on its loading thread)
+        self.timeout = timeout
+        self._subscribers: List[Callable[[OrderEvent], None]] = []
+        self._lock = threading.Lock()  # the copy below is updated on the loop thread and read on Tk's
+        self._orders: Dict[int, Order] = {}  # open orders, in the order they last changed
+        self._completed_count = 0
+        self._stations: List[dict] = []
+        self._dishes: List[dict] = []  # menu rows, as the server sends them
+        self._out_of_stock: List[str] = []  # ingredients 86'd on the server
+        self._held: Optional[List[dict]] = []  # events that arrived before the snapshot was in
+        self.menu_version = 0  # goes up each time the server sends an edited menu
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._client: OrderClient = self._send(
+            OrderClient.connect(host, port, self._publish, self._update_menu)).result()
+        self._send(self._load()).result()
+
+    def _send(self, coroutine) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(self._within_timeout(coroutine), self._loop)
+
+    async def _within_timeout(self, coroutine):
+        try:
+            return await asyncio.wait_for(coroutine, self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"The order server did not answer within {self.timeout} seconds.") from None
+
+    async def _load(self):
+        # The subscription answers with the queue as it stands, and its events follow on from there
+        stations = await self._client.request("stations")
+        dishes = await self._client.request("menu")
+        stock = await self._client.request("stock")
+        snapshot = await self._client.request("subscribe", snapshot=True)
+        with self._lock:
+            self._stations = stations
+            self._dishes = dishes
+            self._out_of_stock = stock["out_of_stock"]
+            # Cooking in the order the dishes started, ready oldest first, as the engine lists them
+            self._orders = {order["order_id"]: order_from_dict(order)
+                            for order in snapshot["cooking"] + snapshot["ready"]}
+            for orders in snapshot["pending"].values():
+                self._orders.update((order["order_id"], order_from_dict(order)) for order in orders)
+            self._completed_count = snapshot["completed_count"]
+            held, self._held = self._held, None
+        self._publish(held)
+
+    @property
+    def currently_cooking(self) -> Dict[int, Order]:
+        return {order.order_id: order for order in self.snapshot().currently_cooking}
+
+    def cooks(self, dish_type: str) -> bool:
+        return any(dish_type in station["dish_types"] for station in self._stations)
+
+    def menu(self) -> Menu:
+        # The server's menu and what is 86'd on it, as last sent; menu_version tells when either
+        # has changed
+        with self._lock:
+            return _menu_from_rows(self._dishes, self._out_of_stock)
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        with self._lock:
+            return self._orders.get(order_id)
+
+    def submit_order(self, table_number: int, dish: Dish,
+                     order_time: Optional[datetime] = None) -> "concurrent.futures.Future[Order]":
+        # The server stamps the order time
+        return self._send(self._submit(table_number, dish.name))
+
+    async def _submit(self, table_number: int, dish_name: str) -> Order:
+        result = (await self._client.submit([(table_number, dish_name)]))[0]
+        if not result["ok"]:
+            raise ServerError(result["error"])
+        return order_from_dict(result["order"])
+
+    def start_cooking(self) -> "concurrent.futures.Future[List[Order]]":
+        return self._send(self._orders_of("start_cooking"))
+
+    def mark_ready(self, order_id: int) -> "concurrent.futures.Future[Order]":
+        return self._send(self._order_of("ready", order_id=order_id))
+
+    def complete_order(self, order_id: int) -> "concurrent.futures.Future[Order]":
+        return self._send(self._order_of("complete", order_id=order_id))
+
+    def cancel_order(self, order_id: int) -> "concurrent.futures.Future[Order]":
+        return self._send(self._order_of("cancel", order_id=order_id))
+
+    def rush_order(self, order_id: int) -> "concurrent.futures.Future[Order]":
+        return self._send(self._order_of("rush", order_id=order_id))
+
+    def stock(self) -> "concurrent.futures.Future[Tuple[List[str], Dict[str, float], Dict[str, Optional[float]]]]":
+        # 86'd ingredients, portions left and minutes until they run out, as the server has them
+        return self._send(self._stock())
+
+    async def _stock(self):
+        stock = await self._client.request("stock")
+        return stock["out_of_stock"], stock["levels"], stock["projections"]
+
+    def set_stock(self, ingredient: str, quantity: int) -> concurrent.futures.Future:
+        return self._send(self._client.request("set_stock", ingredient=ingredient, quantity=quantity))
+
+    def mark_out_of_stock(self, ingredient: str) -> "concurrent.futures.Future[Tuple[List[str], None]]":
+        # Dishes 86'd on every terminal, like Menu.mark_out_of_stock
+        return self._send(self._stock_change("out_of_stock", ingredient))
+
+    def mark_in_stock(self, ingredient: str) -> "concurrent.futures.Future[Tuple[List[str], Optional[float]]]":
+        # Dishes available again, and the portions left if the server tracks the ingredient
+        return self._send(self._stock_change("in_stock", ingredient))
+
+    async def _stock_change(self, op: str, ingredient: str):
+        result = await self._client.request(op, ingredient=ingredient)
+        return result["dishes"], result.get("portions")
+
+    async def _order_of(self, op: str, **params) -> Order:
+        return order_from_dict(await self._client.request(op, **params))
+
+    async def _orders_of(self, op: str, **params) -> List[Order]:
+        return [order_from_dict(order) for order in await self._client.request(op, **params)]
+
+    def snapshot(self) -> KitchenSnapshot:
+        with self._lock:
+            orders = list(self._orders.values())
+            completed_count = self._completed_count
+        pending: Dict[str, List[Order]] = {station["name"]: [] for station in self._stations}
+        for order in orders:
+            if order.status == "pending":
+                pending.setdefault(order.station, []).append(order)
+        for queue in pending.values():
+            queue.sort(key=lambda order: order.priority)
+        return KitchenSnapshot(pending=pending,
+                               currently_cooking=[order for order in orders if order.status == "cooking"],
+                               completed_count=completed_count,
+                               ready=[order for order in orders if order.status in ("due", "ready")])
+
+    def subscribe(self, callback: Callable[[OrderEvent], None]) -> Callable[[], None]:
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def _publish(self, events: List[dict]):
+        order_events = []
+        with self._lock:
+            if self._held is not None:
+                self._held.extend(events)
+                return
+            for event in events:
+                order = order_from_dict(event["order"])
+                self._orders.pop(order.order_id, None)  # re-added at the end: ready and cooking stay oldest first
+                if event["kind"] == "completed":
+                    self._completed_count += 1
+                elif event["kind"] != "cancelled":
+                    self._orders[order.order_id] = order
+                order_events.append(OrderEvent(event["kind"], order, event["timestamp"]))
+        for order_event in order_events:
+            for callback in list(self._subscribers):
+                callback(order_event)
+
+    def _update_menu(self, dishes: List[dict], out_of_stock: List[str]):
+        with self._lock:
+            self._dishes = dishes
+            self._out_of_stock = out_of_stock
+            self.menu_version += 1
+
+    def close(self):
+        try:
+            self._send(self._client.close()).result()
+        except (ConnectionError, TimeoutError):
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def _dish_from_dict(data: dict) -> Dish:
+    return Dish(data["name"], data["prep_time"], data["ingredients"], data["type"])
+
+
+def _menu_from_rows(rows: List[dict], out_of_stock: List[str]) -> Menu:
+    # 86'ing the same ingredients as the server makes exactly the dishes it lists as unavailable
+    # unavailable here too
+    menu = Menu(_dish_from_dict(row) for row in rows)
+    for ingredient in out_of_stock:
+        menu.mark_out_of_stock(ingredient)
+    return menu
+
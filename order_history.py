@@ -0,0 +1,153 @@
+from collections import deque
+from typing import Callable, Iterator, List, Optional
+import os
+import sys
+
+from models import Order
+
+# First line of every segment, giving the layout of its lines. Layout 2 added ready_time; files
+# without the line are layout 1:  order_id,table,order_time,start_time,completion_time,rushed,station,dish
+SEGMENT_HEADER = "#layout 2\n"
+
+
+class OrderRecord:
+    # What is kept of an order once it has been sent out: a fixed set of slots instead of an
+    # instance dict, times as timestamps instead of datetime objects, and the dish and station
+    # names shared with the menu (or interned when read back from disk) rather than copied.
+    __slots__ = ("order_id", "table_number", "dish", "station", "order_time", "start_time",
+                 "ready_time", "completion_time", "rushed")
+
+    def __init__(self, order_id: int, table_number: int, dish: str, station: str, order_time: float,
+                 start_time: float, ready_time: float, completion_time: float, rushed: bool):
+        self.order_id = order_id
+        self.table_number = table_number
+        self.dish = dish
+        self.station = station
+        self.order_time = order_time
+        self.start_time = start_time
+        self.ready_time = ready_time  # when it left the stove (see Order.ready_time)
+        self.completion_time = completion_time
+        self.rushed = rushed
+
+    @classmethod
+    def from_order(cls, order: Order) -> "OrderRecord":
+        completion_time = order.completion_time.timestamp()
+        start_time = order.start_time.timestamp() if order.start_time else completion_time
+        ready_time = order.ready_time.timestamp() if order.ready_time else completion_time
+        return cls(order.order_id, order.table_number, order.dish.name, order.station,
+                   order.order_time.timestamp(), start_time, ready_time, completion_time, order.rushed)
+
+    def to_line(self) -> str:
+        return (f"{self.order_id},{self.table_number},{self.order_time!r},{self.start_time!r},"
+                f"{self.ready_time!r},{self.completion_time!r},{int(self.rushed)},{self.station},{self.dish}\n")
+
+    @classmethod
+    def from_line(cls, line: str, layout: int = 2) -> "OrderRecord":
+        if layout == 1:  # no ready_time: the dish counts as ready when it was sent out
+            order_id, table_number, order_time, start_time, completion_time, rushed, station, dish = \
+                line.rstrip("\n").split(",", 7)
+            ready_time = completion_time
+        else:
+            order_id, table_number, order_time, start_time, ready_time, completion_time, rushed, station, dish = \
+                line.rstrip("\n").split(",", 8)
+        return cls(int(order_id), int(table_number), sys.intern(dish), sys.intern(station), float(order_time),
+                   float(start_time), float(ready_time), float(completion_time), rushed == "1")
+
+
+class OrderHistory:
+    # Sent-out orders. The last `keep` stay in memory as OrderRecords; with an archive_dir every
+    # order is also appended to rolling segment files of `segment_size` orders
+    # (history-000001.csv, ...), and only the newest `max_segments` files are kept if it is set.
+    # Memory therefore stays flat however long the service runs.
+
+    def __init__(self, keep: Optional[int] = 1000, archive_dir: Optional[str] = None,
+                 segment_size: int = 10000, max_segments: Optional[int] = None):
+        self.recent = deque(maxlen=keep)  # all orders if keep is None
+        self.archive_dir = archive_dir
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.total = 0  # orders appended since this history was created
+        self._subscribers: List[Callable[[OrderRecord], None]] = []
+        self._file = None
+        self._segment = 0
+        self._segment_count = 0  # orders in the open segment
+        self._unsynced = False  # orders written since the last flush(sync=True)
+        if archive_dir is not None:
+            os.makedirs(archive_dir, exist_ok=True)
+            segments = self.segments()
+            self._segment = int(segments[-1][8:14]) if segments else 0
+
+    def subscribe(self, callback: Callable[[OrderRecord], None]) -> Callable[[], None]:
+        # Calls back with the record of every order appended from now on. Returns a function
+        # that unsubscribes.
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def append(self, order: Order):
+        if self.recent.maxlen == 0 and self.archive_dir is None and not self._subscribers:
+            self.total += 1  # only counting, e.g. in the simulator
+            return
+        record = OrderRecord.from_order(order)
+        self.recent.append(record)
+        self.total += 1
+        for callback in self._subscribers:
+            callback(record)
+        if self.archive_dir is not None:
+            if self._file is None or self._segment_count >= self.segment_size:
+                self._roll()
+            self._file.write(record.to_line())  # buffered; flushed with the order log (see OrderJournal)
+            self._segment_count += 1
+            self._unsynced = True
+
+    def _roll(self):
+        if self._file is not None:
+            self.flush(sync=True)  # the order log may already say these orders were sent out
+            self._file.close()
+        self._segment += 1
+        self._segment_count = 0
+        self._file = open(self._path(self._segment), mode='w', encoding='utf-8')
+        self._file.write(SEGMENT_HEADER)
+        if self.max_segments is not None:
+            for name in self.segments()[:-self.max_segments]:
+                os.remove(os.path.join(self.archive_dir, name))
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.archive_dir, f"history-{segment:06d}.csv")
+
+    def segments(self) -> List[str]:
+        # Segment file names, oldest first
+        if self.archive_dir is None:
+            return []
+        return sorted(name for name in os.listdir(self.archive_dir)
+                      if name.startswith("history-") and name.endswith(".csv"))
+
+    def archived(self) -> Iterator[OrderRecord]:
+        # Streams every order still on disk, oldest first, one segment at a time
+        self.flush()
+        for name in self.segments():
+            with open(os.path.join(self.archive_dir, name), mode='r', encoding='utf-8') as file:
+                layout = 1
+                for line in file:
+                    if line.startswith("#layout "):
+                        layout = int(line[8:])
+                    elif line.endswith("\n"):
+                        yield OrderRecord.from_line(line, layout)
+
+    def flush(self, sync: bool = False):
+        # With sync, waits for the disk too, but only if orders were archived since it last did
+        if self._file is not None:
+            self._file.flush()
+            if sync and self._unsynced:
+                os.fsync(self._file.fileno())
+                self._unsynced = False
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return len(self.recent)
+
+    def __iter__(self) -> Iterator[OrderRecord]:
+        return iter(self.recent)
@@ -0,0 +1,214 @@
+from datetime import datetime
+from typing import Dict, List
+import os
+import time
+
+from models import Dish, Order
+from order_history import OrderHistory
+
+EVENT_CODES = {"submitted": "S", "started": "C", "ready": "Y", "completed": "D", "cancelled": "X", "rushed": "R"}
+
+
+class OrderJournal:
+    # Append-only log of every order transition plus a periodic snapshot of the live orders, so
+    # that recovery only replays the events since the last snapshot. Log lines are
+    #   S,<order_id>,<table>,<order timestamp>,<prep_time>,<station>,<dish name>
+    #   C,<order_id>,<timestamp>,<station>    (started, at the station that cooks it)
+    #   Y|D|X|R,<order_id>,<timestamp>        (ready, done, cancelled, rushed)
+    #   Y,<order_id>,<timestamp>,due          (time up, not called done yet)
+    # The snapshot starts with G,<generation>,<next order id>,<completed count> followed by the
+    # S/C/Y/R lines that rebuild the live orders; the log starts with G,<generation>. A log is only
+    # replayed on top of the snapshot of the same generation, so a crash between writing a
+    # snapshot and starting the next log never applies an event twice.
+
+    def __init__(self, log_path: str, batch_size: int = 1, fsync: bool = True, snapshot_every: int = 10000):
+        self.log_path = log_path
+        self.snapshot_path = log_path + ".snapshot"
+        self.batch_size = batch_size  # events buffered before they are written out
+        self.fsync = fsync  # whether every write waits for the disk
+        self.snapshot_every = snapshot_every  # events between snapshots, 0 to only snapshot on recover
+        self.generation = 0
+        self._buffer: List[str] = []
+        self._events_since_snapshot = 0
+        self._file = None
+        # The engine's OrderHistory, set by recover. It is written out before the log, so an order
+        # the log says was sent out is always in the archive, which recover relies on.
+        self.history = None
+        self.unrestored: Dict[int, str] = {}  # order_id -> why recover could not bring it back
+
+    def record(self, engine, event: str, order: Order, timestamp: float):
+        if event == "submitted":
+            self._buffer.append(_submit_line(order, timestamp))
+        elif event == "started":
+            # Another station may have taken the order from the one it was queued at
+            self._buffer.append(f"C,{order.order_id},{timestamp!r},{order.station}\n")
+        elif event == "due":
+            self._buffer.append(f"Y,{order.order_id},{timestamp!r},due\n")
+        else:
+            self._buffer.append(f"{EVENT_CODES[event]},{order.order_id},{timestamp!r}\n")
+        self._events_since_snapshot += 1
+
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+        if self.snapshot_every and self._events_since_snapshot >= self.snapshot_every:
+            self.checkpoint(engine)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self.history is not None:
+            self.history.flush(sync=self.fsync)
+        if self._file is None:
+            self._file = open(self.log_path, mode='a', encoding='utf-8')
+            if self._file.tell() == 0:
+                self._file.write(f"G,{self.generation}\n")
+        self._file.write("".join(self._buffer))
+        self._buffer.clear()
+        self._sync(self._file)
+
+    def _sync(self, file):
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    def checkpoint(self, engine):
+        # Writes a snapshot of the engine's live orders and starts an empty log for it. Sent-out
+        # orders are only in the archive from here on, so it is written out first.
+        self.flush()
+        if self.history is not None:
+            self.history.flush(sync=self.fsync)
+        generation = self.generation + 1
+        lines = [f"G,{generation},{engine.next_order_id},{engine.completed_count}\n"]
+        live = list(engine.book.orders.values()) + list(engine.ready_orders.values())
+        for order in sorted(live, key=lambda o: o.order_id):
+            lines.append(_submit_line(order, order.order_time.timestamp()))
+            if order.rushed:
+                lines.append(f"R,{order.order_id},0.0\n")
+            if order.status in ("cooking", "due", "ready"):
+                lines.append(f"C,{order.order_id},{order.start_time.timestamp()!r}\n")
+            if order.status == "due":
+                lines.append(f"Y,{order.order_id},{order.ready_time.timestamp()!r},due\n")
+            elif order.status == "ready":
+                lines.append(f"Y,{order.order_id},{order.ready_time.timestamp()!r}\n")
+
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, mode='w', encoding='utf-8') as file:
+            file.writelines(lines)
+            self._sync(file)
+        os.replace(temp_path, self.snapshot_path)
+
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.log_path, mode='w', encoding='utf-8')
+        self._file.write(f"G,{generation}\n")
+        self._sync(self._file)
+        self.generation = generation
+        self._events_since_snapshot = 0
+
+    def recover(self, engine, dishes: List[Dish]) -> int:
+        # Rebuilds the engine's orders from the snapshot and the log after it, then compacts them
+        # into a fresh snapshot. Call before the engine takes new orders; returns the events replayed.
+        dishes_by_name = {dish.name: dish for dish in dishes}
+        # Replaying must neither log the events again, learn prep times a second time, nor archive
+        # the orders sent out before the restart again: the history has had them since then
+        journal, engine.journal = engine.journal, None
+        prep_stats, engine.prep_stats = engine.prep_stats, None
+        history, engine.completed_orders = engine.completed_orders, OrderHistory(keep=0)
+        self.history = history
+        self.unrestored = {}
+        replayed = 0
+        try:
+            snapshot_generation = 0
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, mode='r', encoding='utf-8') as file:
+                    _, generation, next_order_id, completed_count = file.readline().split(",")
+                    snapshot_generation = int(generation)
+                    engine.next_order_id = max(engine.next_order_id, int(next_order_id))
+                    engine.completed_count = int(completed_count)
+                    replayed += _replay(engine, file, dishes_by_name, self.unrestored)
+
+            if os.path.exists(self.log_path):
+                with open(self.log_path, mode='r', encoding='utf-8') as file:
+                    header = file.readline()
+                    # A log from an older generation is already contained in the snapshot
+                    if header.endswith("\n") and int(header.split(",")[1]) == snapshot_generation:
+                        replayed += _replay(engine, file, dishes_by_name, self.unrestored)
+            self.generation = snapshot_generation
+        finally:
+            engine.journal = journal
+            engine.prep_stats = prep_stats
+            engine.completed_orders = history
+
+        self.checkpoint(engine)
+        return replayed
+
+    def start_over(self, engine) -> List[str]:
+        # After recover failed: moves the log and its snapshot aside, where they can be looked
+        # into, and starts a new log from whatever orders the engine did get back, so the session
+        # is journaled all the same. Returns the paths the files were moved to.
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._buffer.clear()
+        suffix = time.strftime(".failed-%Y%m%d-%H%M%S")
+        moved = []
+        for path in (self.log_path, self.snapshot_path):
+            if os.path.exists(path):
+                os.replace(path, path + suffix)
+                moved.append(path + suffix)
+        self.checkpoint(engine)
+        return moved
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _submit_line(order: Order, timestamp: float) -> str:
+    return (f"S,{order.order_id},{order.table_number},{timestamp!r},{order.dish.prep_time},"
+            f"{order.station},{order.dish.name}\n")
+
+
+def _replay(engine, lines, dishes_by_name, unrestored: Dict[int, str]) -> int:
+    # Orders that cannot be put back (e.g. no station cooks their dish any more) are left out with
+    # their later events and noted in `unrestored`, instead of failing the whole recovery
+    replayed = 0
+    for line in lines:
+        if not line.endswith("\n"):
+            break  # torn write from a crash; everything before it is intact
+        fields = line[:-1].split(",", 6)
+        code, order_id = fields[0], int(fields[1])
+        if order_id in unrestored:
+            continue
+        if code == "S":
+            _, _, table_number, timestamp, prep_time, station, name = fields
+            # Dishes deleted from the menu since are rebuilt from the log
+            dish = dishes_by_name.get(name) or Dish(name, int(prep_time), [], station)
+            try:
+                engine.restore_order(Order(int(table_number), dish, datetime.fromtimestamp(float(timestamp)),
+                                           order_id), station)
+            except ValueError as e:
+                unrestored[order_id] = f"table {table_number}, {name}: {e}"
+                engine.next_order_id = max(engine.next_order_id, order_id + 1)  # its id stays taken
+                continue
+        elif code == "C":
+            # Older logs name no station, and a station may have been removed since
+            station = fields[3] if len(fields) > 3 and fields[3] in engine.stations else None
+            engine.start_order(order_id, datetime.fromtimestamp(float(fields[2])), station)
+        elif code == "Y":
+            if len(fields) > 3 and fields[3] == "due":
+                engine.mark_due(order_id, datetime.fromtimestamp(float(fields[2])))
+            else:
+                engine.mark_ready(order_id, datetime.fromtimestamp(float(fields[2])))
+        elif code == "D":
+            engine.complete_order(order_id, datetime.fromtimestamp(float(fields[2])))
+        elif code == "X":
+            engine.cancel_order(order_id)
+        elif code == "R":
+            engine.rush_order(order_id)
+        else:
+            raise ValueError(f"Unknown order log record: {line!r}")
+        replayed += 1
+    return replayed
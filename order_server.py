@@ -0,0 +1,404 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+from events import EventBuffer, OrderEvent
+from inventory import Inventory
+from kitchen_engine import KitchenEngine, load_stations
+from menu import Menu
+from menu_store import MenuStore
+from metrics import Histogram, KitchenMetrics, MetricsRegistry
+from models import Dish, Order
+from order_history import OrderHistory
+from order_log import OrderJournal
+from order_trace import TraceRecorder
+from prep_stats import PrepTimeStats
+
+# Protocol: one JSON object per line in each direction. Requests look like
+#   {"id": 7, "op": "submit", "orders": [{"table": 4, "dish": "Gambas"}, ...]}
+# (other ops: start_cooking, ready/complete/cancel/rush with an order_id, snapshot, status, menu,
+# prep_times, subscribe, stock, set_stock with an ingredient and quantity, out_of_stock/in_stock
+# with an ingredient)
+# and are answered with {"id": 7, "ok": true, "result": ...} or {"id": 7, "ok": false, "error": "..."}.
+# Clients that sent {"op": "subscribe"} also receive {"events": [...]} batches as orders change, and
+# {"menu": [...], "out_of_stock": [...]} when the menu is edited or a dish is 86'd or back;
+# {"op": "subscribe", "snapshot": true} answers with the snapshot the events follow on from.
+
+EVENT_INTERVAL = 0.05  # seconds between event batches sent to subscribers
+WRITE_HIGH_WATER = 256 * 1024  # bytes buffered for a client before waiting for it to read
+METRICS_WRITE_INTERVAL = 15  # seconds between rewrites of --metrics-file
+MENU_CHECK_INTERVAL = 1  # seconds between checks for dishes added or edited in Menu.db
+OPS = ("submit", "start_cooking", "ready", "complete", "cancel", "rush", "snapshot", "status", "stations",
+       "menu", "prep_times", "subscribe", "stock", "set_stock", "out_of_stock", "in_stock")
+
+
+def order_to_dict(order: Order) -> dict:
+    return {
+        "order_id": order.order_id,
+        "table": order.table_number,
+        "dish": order.dish.name,
+        "type": order.dish.type,
+        "prep_time": order.dish.prep_time,
+        "prep_estimate": order.prep_estimate,
+        "station": order.station,
+        "status": order.status,
+        "rushed": order.rushed,
+        "priority": order.priority,  # its station policy's key, so terminals list the queue in order
+        "order_time": order.order_time.timestamp(),
+        "start_time": order.start_time.timestamp() if order.start_time else None,
+        "estimated_completion": order.estimated_completion.timestamp() if order.estimated_completion else None,
+        "ready_time": order.ready_time.timestamp() if order.ready_time else None,
+    }
+
+
+class OrderServer:
+    # Holds the kitchen queue for every waiter tablet and kitchen screen. All engine calls run on
+    # the event loop thread, one request at a time, so the engine needs no locking; each call is
+    # O(log n), which keeps a single core responsive for hundreds of connected terminals.
+
+    def __init__(self, engine: KitchenEngine, menu: Menu, metrics: Optional[MetricsRegistry] = None,
+                 store: Optional[MenuStore] = None):
+        self.engine = engine
+        self.menu = menu
+        self.store = store  # Menu.db the menu came from, watched for edits made in QuickChefApp
+        self.events = EventBuffer()
+        self.engine.subscribe(self.events.push)
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+        self.connections = 0
+        self.metrics = metrics or MetricsRegistry()
+        self.metrics.gauge("order_server_connections", "Connected terminals", function=lambda: self.connections)
+        self.metrics.gauge("order_server_subscribers", "Terminals receiving events",
+                           function=lambda: len(self.subscribers))
+        # One histogram per known op, looked up without taking the registry lock; anything else
+        # is counted as "invalid" so a misbehaving client cannot add labels
+        self._latency: Dict[str, Histogram] = {
+            op: self.metrics.histogram("order_server_request_seconds", "Time spent handling a request", op=op)
+            for op in OPS + ("invalid",)}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._publisher: Optional[asyncio.Task] = None
+        self._menu_watcher: Optional[asyncio.Task] = None
+        self._out_of_stock = menu.out_of_stock()  # as last sent to the subscribers
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> int:
+        # Returns the port actually bound, useful with port=0
+        self._server = await asyncio.start_server(self._handle, host, port, limit=2 ** 20)
+        self._publisher = asyncio.ensure_future(self._publish_events())
+        if self.store is not None:
+            self._menu_watcher = asyncio.ensure_future(self._watch_menu())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for task in (self._publisher, self._menu_watcher):
+            if task is not None:
+                task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(self._respond(line, writer))
+                if writer.transport.get_write_buffer_size() > WRITE_HIGH_WATER:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def _respond(self, line: bytes, writer: asyncio.StreamWriter) -> bytes:
+        started = time.perf_counter()
+        request_id = None
+        op = "invalid"
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            op = request.get("op")
+            response = {"id": request_id, "ok": True, "result": self._dispatch(request, writer)}
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            response = {"id": request_id, "ok": False, "error": str(e)}
+        self._flush_journal()  # nothing is acknowledged before it is on disk
+        payload = (json.dumps(response) + "\n").encode()
+        latency = self._latency.get(op) if isinstance(op, str) else None
+        (latency or self._latency["invalid"]).observe(time.perf_counter() - started)
+        return payload
+
+    def _dispatch(self, request: dict, writer: asyncio.StreamWriter):
+        op = request["op"]
+        engine = self.engine
+        if op == "submit":
+            return [self._submit(order) for order in request["orders"]]
+        if op == "start_cooking":
+            return [order_to_dict(order) for order in engine.start_cooking()]
+        if op == "ready":
+            return order_to_dict(engine.mark_ready(int(request["order_id"])))
+        if op == "complete":
+            return order_to_dict(engine.complete_order(int(request["order_id"])))
+        if op == "cancel":
+            return order_to_dict(engine.cancel_order(int(request["order_id"])))
+        if op == "rush":
+            return order_to_dict(engine.rush_order(int(request["order_id"])))
+        if op == "snapshot":
+            return self._snapshot()
+        if op == "status":
+            return {
+                "pending": {name: engine.book.pending_count(name) for name in engine.stations},
+                "cooking": len(engine.currently_cooking),
+                "ready": len(engine.ready_orders),
+                "completed_count": engine.completed_count,
+                "connections": self.connections,
+            }
+        if op == "stations":
+            return [{"name": station.name, "capacity": station.capacity, "policy": station.policy.name,
+                     "dish_types": list(station.dish_types), "cooking": station.cooking,
+                     "pending": engine.book.pending_count(station.name)}
+                    for station in engine.stations.values()]
+        if op == "menu":
+            return self._menu_rows()
+        if op == "prep_times":
+            if engine.prep_stats is None:
+                return []
+            return [dataclasses.asdict(row) for row in engine.prep_stats.rows()]
+        if op == "subscribe":
+            # Events from before the snapshot go out to the other subscribers first, so the new
+            # one gets exactly the events that follow it
+            self._send_events()
+            self.subscribers.add(writer)
+            return self._snapshot() if request.get("snapshot") else True
+        if op in ("stock", "set_stock", "out_of_stock", "in_stock"):
+            return self._stock(op, request)
+        raise ValueError(f"Unknown operation '{op}'.")
+
+    def _snapshot(self) -> dict:
+        snapshot = self.engine.snapshot()
+        return {
+            "pending": {station: [order_to_dict(order) for order in orders]
+                        for station, orders in snapshot.pending.items()},
+            "cooking": [order_to_dict(order) for order in snapshot.currently_cooking],
+            "completed_count": snapshot.completed_count,
+            "ready": [order_to_dict(order) for order in snapshot.ready],
+        }
+
+    def _stock(self, op: str, request: dict):
+        # The chef's 86 and the stock levels live here, so every terminal sees the same dishes
+        # available; the dishes they change go out to the subscribers before the reply
+        inventory = self.engine.inventory
+        if op == "stock":
+            now = time.time()
+            return {"out_of_stock": self.menu.out_of_stock(),
+                    "levels": inventory.levels() if inventory is not None else {},
+                    "projections": inventory.projections(now) if inventory is not None else {}}
+        ingredient = str(request["ingredient"]).strip()
+        if not ingredient:
+            raise ValueError("Please enter an ingredient.")
+        if op == "set_stock":
+            if inventory is None:
+                raise ValueError("This kitchen does not track stock levels.")
+            inventory.set_stock(ingredient, int(request["quantity"]))
+            result = True
+        elif op == "out_of_stock":
+            result = {"dishes": [dish.name for dish in self.menu.mark_out_of_stock(ingredient)]}
+        else:
+            result = {"dishes": [dish.name for dish in self.menu.mark_in_stock(ingredient)],
+                      "portions": inventory.available(ingredient) if inventory is not None else None}
+        self._send_menu_changes()
+        return result
+
+    def _menu_message(self) -> dict:
+        return {"menu": self._menu_rows(), "out_of_stock": self._out_of_stock}
+
+    def _send_menu_changes(self):
+        # Orders reserving the last portion of an ingredient 86 dishes too, so this also runs with
+        # every event batch; comparing the (short) list of 86'd ingredients is all it costs then
+        out_of_stock = self.menu.out_of_stock()
+        if out_of_stock != self._out_of_stock:
+            self._out_of_stock = out_of_stock
+            self._broadcast(self._menu_message())
+
+    def _menu_rows(self) -> List[dict]:
+        return [{"name": dish.name, "prep_time": dish.prep_time, "type": dish.type,
+                 "ingredients": dish.ingredients, "available": self.menu.is_available(dish.name)}
+                for dish in self.menu]
+
+    def _submit(self, item: dict) -> dict:
+        # Each order of a batch succeeds or fails on its own
+        dish = self.menu.get(item["dish"])
+        if dish is None:
+            return {"ok": False, "error": f"Dish '{item['dish']}' not found."}
+        if not self.menu.is_available(dish.name):
+            return {"ok": False, "error": f"{dish.name} is 86'd: an ingredient is out of stock."}
+        try:
+            return {"ok": True, "order": order_to_dict(self.engine.submit_order(int(item["table"]), dish))}
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+
+    async def _publish_events(self):
+        # Also the kitchen's clock: dishes whose time is up are marked ready before each batch
+        while True:
+            await asyncio.sleep(EVENT_INTERVAL)
+            self.engine.tick()
+            self._flush_journal()
+            self._send_events()
+            self._send_menu_changes()
+
+    def _flush_journal(self):
+        # The journal batches the events of one request (a submit of a whole table is one write)
+        # but never holds them past it
+        if self.engine.journal is not None:
+            self.engine.journal.flush()
+
+    def _send_events(self):
+        events = self.events.drain()
+        if events and self.subscribers:
+            self._broadcast({"events": [_event_to_dict(event) for event in events]})
+
+    def _broadcast(self, message: dict):
+        payload = (json.dumps(message) + "\n").encode()
+        for writer in list(self.subscribers):
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+            else:
+                writer.write(payload)
+
+    async def _watch_menu(self):
+        # SQLite's data_version changes when another connection (QuickChefApp's menu management)
+        # commits, so checking it costs one query; the menu is only reread after an edit
+        version = self.store.data_version()
+        while True:
+            await asyncio.sleep(MENU_CHECK_INTERVAL)
+            current = self.store.data_version()
+            if current == version:
+                continue
+            version = current
+            try:
+                sync_menu(self.menu, self.store.load_dishes())
+            except Exception as e:  # sqlite3.Error, or a row the menu refuses
+                print(f"Could not reload the menu: {e}", flush=True)
+                continue
+            self._out_of_stock = self.menu.out_of_stock()
+            self._broadcast(self._menu_message())
+
+
+def sync_menu(menu: Menu, dishes: List[Dish]):
+    # Brings the menu in line with the dishes read from Menu.db. Dishes that stay keep their Dish
+    # object (orders already holding it see the changes) and the menu keeps its 86 flags; a renamed
+    # dish is removed and added under its new name.
+    names = {dish.name for dish in dishes}
+    for name in [name for name in menu.names() if name not in names]:
+        menu.remove(name)
+    for dish in dishes:
+        current = menu.get(dish.name)
+        if current is None:
+            menu.add(dish)
+        elif (current.prep_time, current.type, current.ingredients) != (dish.prep_time, dish.type, dish.ingredients):
+            menu.update(dish.name, dish)
+
+
+def _event_to_dict(event: OrderEvent) -> Dict:
+    return {"kind": event.kind, "timestamp": event.timestamp, "order": order_to_dict(event.order)}
+
+
+async def _write_metrics(registry: MetricsRegistry, file_path: str):
+    while True:
+        await asyncio.sleep(METRICS_WRITE_INTERVAL)
+        try:
+            registry.write(file_path)
+        except OSError as e:
+            print(f"Could not write metrics to {file_path}: {e}", flush=True)
+
+
+async def serve(host: str, port: int, menu_db: str, menu_csv: str, log_path: Optional[str],
+                stats_path: Optional[str], history_dir: Optional[str], metrics_port: Optional[int] = None,
+                metrics_file: Optional[str] = None, stations_path: Optional[str] = None,
+                trace_path: Optional[str] = None):
+    # The menu comes from Menu.db, like QuickChefApp's; the CSV is only imported into an empty one
+    store = MenuStore(menu_db)
+    dishes = store.load_dishes()
+    if not dishes:
+        report = store.import_csv(menu_csv)
+        if report.errors:
+            print(report.summary())
+        dishes = store.load_dishes()
+    menu = Menu(dishes)
+    inventory = Inventory(menu)  # stock levels are set from the terminals' Ingredient Stock screen
+    prep_stats = PrepTimeStats()
+    if stats_path and os.path.exists(stats_path):
+        prep_stats.load(stats_path)
+    history = OrderHistory(keep=500, archive_dir=history_dir)
+    stations = load_stations(stations_path) if stations_path else None
+    engine = KitchenEngine(stations, inventory=inventory, prep_stats=prep_stats, history=history)
+    if log_path:
+        # Written out at the end of every request and clock tick (see OrderServer._flush_journal)
+        journal = OrderJournal(log_path, batch_size=64)
+        try:
+            journal.recover(engine, dishes)
+        except (OSError, ValueError) as e:
+            moved = journal.start_over(engine)
+            print(f"Could not recover the orders: {e}. Kept {len(engine.book)} open orders and moved "
+                  f"the order log aside to {', '.join(moved)}.", flush=True)
+        for reason in journal.unrestored.values():
+            print(f"Could not bring back an order: {reason}", flush=True)
+        engine.journal = journal
+
+    trace = TraceRecorder(trace_path) if trace_path else None
+    if trace is not None:
+        engine.subscribe(trace.on_event)  # after recovery, so only new orders are recorded
+    registry = MetricsRegistry()
+    KitchenMetrics(engine, registry)
+    server = OrderServer(engine, menu, registry, store)
+    bound_port = await server.start(host, port)
+    print(f"Serving {len(menu)} dishes on {host}:{bound_port}", flush=True)
+    metrics_server = registry.serve(port=metrics_port) if metrics_port is not None else None
+    metrics_writer = asyncio.ensure_future(_write_metrics(registry, metrics_file)) if metrics_file else None
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if metrics_writer is not None:
+            metrics_writer.cancel()
+            registry.write(metrics_file)
+        if engine.journal is not None:
+            engine.journal.close()
+        if trace is not None:
+            trace.close()
+        if stats_path:
+            prep_stats.save(stats_path)
+        history.close()
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the kitchen queue to waiter and chef terminals.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--menu-db", default="Menu.db", help="the menu QuickChefApp edits; reread when it changes")
+    parser.add_argument("--menu", default="Menu.csv", help="menu to import when the --menu-db is empty")
+    parser.add_argument("--stations", help="stations file (name,capacity,policy,dish types); tapas and main dish if omitted")
+    parser.add_argument("--log", help="order log to recover from and append to")
+    parser.add_argument("--stats", help="learned prep times to load at start and save on exit")
+    parser.add_argument("--history", help="folder to archive sent-out orders to")
+    parser.add_argument("--trace", help="append every order placed to this trace file (see load_generator.py)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local port")
+    parser.add_argument("--metrics-file", help="rewrite Prometheus metrics to this file every 15 seconds")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.menu_db, args.menu, args.log, args.stats, args.history,
+                          args.metrics_port, args.metrics_file, args.stations, args.trace))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+from typing import Iterable, List, NamedTuple, Optional
+import csv
+import os
+import random
+
+from events import OrderEvent
+from models import Dish
+
+# Same columns as the recorded streams kitchen_sim.load_arrivals reads, plus when the order was
+# placed, so a captured trace can also be simulated. Visits are left empty: a terminal does not
+# know which orders of a table belong to one party.
+TRACE_HEADER = ["offset_seconds", "table_number", "dish", "visit", "timestamp"]
+
+
+class TraceEntry(NamedTuple):
+    offset: float  # seconds of service since the first order of the trace
+    table_number: int
+    dish: str
+
+
+class TraceRecorder:
+    # Appends every order placed in a KitchenEngine (or RemoteKitchen) to a trace file:
+    #   recorder = TraceRecorder("orders.trace.csv"); engine.subscribe(recorder.on_event)
+    # Offsets of a session carry on from the last offset already in the file, so a trace kept
+    # across sessions replays them back to back rather than waiting out the hours the kitchen
+    # was closed; the timestamp column keeps the wall-clock time. Lines are flushed as they are
+    # written.
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.base: Optional[float] = None  # timestamp at offset 0, set by the session's first order
+        self._resume_at = _last_offset(file_path) or 0.0
+        new_file = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+        self._file = open(file_path, mode='a', encoding='utf-8', newline='', buffering=1)
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(TRACE_HEADER)
+
+    def on_event(self, event: OrderEvent):
+        if event.kind == "submitted":
+            self.record(event.timestamp, event.order.table_number, event.order.dish.name)
+
+    def record(self, timestamp: float, table_number: int, dish_name: str):
+        if self.base is None:
+            self.base = timestamp - self._resume_at
+        self._writer.writerow([f"{timestamp - self.base:.3f}", table_number, dish_name, "", f"{timestamp:.3f}"])
+
+    def close(self):
+        self._file.close()
+
+
+def _last_offset(file_path: str) -> Optional[float]:
+    # Offset of the last order in the file, read from its tail rather than the whole trace
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, mode='rb') as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - 4096))
+        lines = file.read().decode('utf-8', errors='replace').splitlines()
+    for row in csv.reader(reversed(lines)):
+        try:
+            return float(row[0])
+        except (IndexError, ValueError):
+            continue  # the header, or a blank line
+    return None
+
+
+def read_trace(file_path: str) -> List[TraceEntry]:
+    # Reads a captured trace, or any offset_seconds,table_number,dish[,...] file, sorted by offset
+    entries = []
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # header
+        for line_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            try:
+                entries.append(TraceEntry(float(row[0]), int(row[1]), row[2]))
+            except (IndexError, ValueError):
+                raise ValueError(f"{file_path}, line {line_number}: expected offset_seconds,table_number,dish.") from None
+    entries.sort(key=lambda entry: entry.offset)
+    return entries
+
+
+def poisson_trace(dishes: Iterable[Dish], orders_per_second: float, seconds: float, tables: int = 30,
+                  seed: int = 0) -> List[TraceEntry]:
+    # Orders arriving independently at the given mean rate for `seconds`, each for a random dish
+    # and table
+    rng = random.Random(seed)
+    names = [dish.name for dish in dishes]
+    if not names:
+        raise ValueError("The menu has no dishes to order.")
+    entries = []
+    offset = rng.expovariate(orders_per_second)
+    while offset < seconds:
+        entries.append(TraceEntry(offset, rng.randint(1, tables), rng.choice(names)))
+        offset += rng.expovariate(orders_per_second)
+    return entries
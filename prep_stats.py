@@ -0,0 +1,152 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import csv
+import json
+import math
+import os
+
+from models import Dish
+
+# Sketch buckets are powers of GAMMA, so every quantile is within 1% of a value actually seen
+GAMMA = 1.02
+_LOG_GAMMA = math.log(GAMMA)
+
+
+class _Tracker:
+    # Running statistics of one stream of samples in constant memory: a mean that becomes
+    # exponentially decayed once `1 / smoothing` samples have been seen, and a log-bucket quantile
+    # sketch whose counts are halved whenever they add up to `max_weight`, so old services fade out.
+    # Values between one second and a day fit in under 600 buckets.
+    __slots__ = ("count", "mean", "buckets", "weight")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.buckets: Dict[int, float] = {}
+        self.weight = 0.0
+
+    def add(self, value: float, smoothing: float, max_weight: float):
+        self.count += 1
+        self.mean += (value - self.mean) * max(1 / self.count, smoothing)
+        index = math.ceil(math.log(max(value, 1e-3)) / _LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0.0) + 1
+        self.weight += 1
+        if self.weight >= max_weight:
+            self.buckets = {index: count / 2 for index, count in self.buckets.items() if count >= 0.01}
+            self.weight = sum(self.buckets.values())
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        if not self.buckets:
+            return None
+        rank = fraction * self.weight
+        seen = 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return 2 * GAMMA ** index / (GAMMA + 1)
+        return 2 * GAMMA ** max(self.buckets) / (GAMMA + 1)
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "buckets": self.buckets}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "_Tracker":
+        tracker = cls()
+        tracker.count = data["count"]
+        tracker.mean = data["mean"]
+        tracker.buckets = {int(index): count for index, count in data["buckets"].items()}
+        tracker.weight = sum(tracker.buckets.values())
+        return tracker
+
+
+@dataclass(frozen=True)
+class PrepTimeRow:
+    kind: str  # "dish" (values in minutes) or "station" (values are actual / typed prep time)
+    name: str
+    samples: int
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+
+
+class PrepTimeStats:
+    # Learns how long dishes really take from the orders the kitchen sends out. Each dish keeps
+    # its own statistics; each station keeps the ratio of actual to typed prep time, which is used
+    # for dishes it has not cooked often enough yet. estimate() falls back to the typed prep_time
+    # until `min_samples` samples exist. Memory is bounded by the number of dishes and stations.
+
+    def __init__(self, min_samples: int = 3, smoothing: float = 0.1, max_weight: float = 500):
+        self.min_samples = min_samples
+        self.smoothing = smoothing  # weight of each new sample in the mean once warmed up
+        self.max_weight = max_weight
+        self._dishes: Dict[str, _Tracker] = {}
+        self._stations: Dict[str, _Tracker] = {}
+
+    def record(self, dish: Dish, station: str, minutes: float):
+        if minutes <= 0:
+            return
+        self._tracker(self._dishes, dish.name).add(minutes, self.smoothing, self.max_weight)
+        if dish.prep_time > 0:  # MenuStore refuses zero, but a dish restored from an old log may have it
+            self._tracker(self._stations, station).add(minutes / dish.prep_time, self.smoothing, self.max_weight)
+
+    def record_at_least(self, dish: Dish, station: str, minutes: float):
+        # A dish sent out without the chef calling it done took at least `minutes`, the time it was
+        # given. It counts as taking that or the current estimate, whichever is longer, so that
+        # the dishes chefs call done early do not pull the estimate down on their own.
+        self.record(dish, station, max(minutes, self.estimate(dish, station)))
+
+    @staticmethod
+    def _tracker(trackers: Dict[str, _Tracker], name: str) -> _Tracker:
+        tracker = trackers.get(name)
+        if tracker is None:
+            tracker = trackers[name] = _Tracker()
+        return tracker
+
+    def estimate(self, dish: Dish, station: str) -> float:
+        # Expected minutes from starting the dish to it leaving the stove
+        tracker = self._dishes.get(dish.name)
+        if tracker is not None and tracker.count >= self.min_samples:
+            return tracker.mean
+        tracker = self._stations.get(station)
+        if tracker is not None and tracker.count >= self.min_samples:
+            return dish.prep_time * tracker.mean
+        return dish.prep_time
+
+    def quantile(self, dish_name: str, fraction: float) -> Optional[float]:
+        tracker = self._dishes.get(dish_name)
+        return tracker.quantile(fraction) if tracker is not None else None
+
+    def rows(self) -> List[PrepTimeRow]:
+        return ([_row("dish", name, tracker) for name, tracker in sorted(self._dishes.items())] +
+                [_row("station", name, tracker) for name, tracker in sorted(self._stations.items())])
+
+    def export_csv(self, file_path: str) -> int:
+        rows = self.rows()
+        with open(file_path, mode='w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["kind", "name", "samples", "mean", "p50", "p90", "p99"])
+            for row in rows:
+                writer.writerow([row.kind, row.name, row.samples, f"{row.mean:.2f}",
+                                 f"{row.p50:.2f}", f"{row.p90:.2f}", f"{row.p99:.2f}"])
+        return len(rows)
+
+    def save(self, file_path: str):
+        # Written next to the target and renamed over it, like MenuStore.export_csv
+        data = {"dishes": {name: tracker.to_dict() for name, tracker in self._dishes.items()},
+                "stations": {name: tracker.to_dict() for name, tracker in self._stations.items()}}
+        temp_path = file_path + ".tmp"
+        with open(temp_path, mode='w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temp_path, file_path)
+
+    def load(self, file_path: str):
+        with open(file_path, mode='r', encoding='utf-8') as file:
+            data = json.load(file)
+        self._dishes = {name: _Tracker.from_dict(tracker) for name, tracker in data["dishes"].items()}
+        self._stations = {name: _Tracker.from_dict(tracker) for name, tracker in data["stations"].items()}
+
+
+def _row(kind: str, name: str, tracker: _Tracker) -> PrepTimeRow:
+    return PrepTimeRow(kind, name, tracker.count, tracker.mean,
+                       tracker.quantile(0.5), tracker.quantile(0.9), tracker.quantile(0.99))
@@ -0,0 +1,139 @@
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+
+from models import Order
+
+# A policy turns an order into a sort key; the order with the smallest key is cooked first.
+# Keys are (number, order_id) so that ties always fall back to submission order. Policies use
+# order.prep_estimate, the learned preparation time, rather than the hand-typed dish.prep_time.
+PriorityKey = Tuple[float, int]
+
+RUSH_KEY = float("-inf")
+
+
+class PriorityPolicy:
+    name = "policy"
+
+    def key(self, order: Order) -> PriorityKey:
+        raise NotImplementedError
+
+    # Hooks called by the OrderBook. Stateless policies keep the defaults; the orders returned by
+    # admit/start are other pending orders whose key has changed and must be re-prioritised.
+
+    def admit(self, order: Order) -> Iterable[Order]:
+        return ()
+
+    def ready_at(self, order: Order) -> float:
+        # Earliest timestamp at which the order may start
+        return float("-inf")
+
+    def ready(self, order: Order, now: float) -> bool:
+        return self.ready_at(order) <= now
+
+    def start(self, order: Order, now: float) -> Iterable[Order]:
+        return ()
+
+    def release(self, order: Order):
+        # The order left the queue without being started (cancelled)
+        pass
+
+
+class FifoPolicy(PriorityPolicy):
+    name = "fifo"
+
+    def key(self, order: Order) -> PriorityKey:
+        return order.order_time.timestamp(), order.order_id
+
+
+class LongestPrepFirstPolicy(PriorityPolicy):
+    name = "longest-prep-first"
+
+    def key(self, order: Order) -> PriorityKey:
+        return -order.prep_estimate, order.order_id
+
+
+class ShortestPrepFirstPolicy(PriorityPolicy):
+    name = "shortest-prep-first"
+
+    def key(self, order: Order) -> PriorityKey:
+        return order.prep_estimate, order.order_id
+
+
+def priority_key(policy: PriorityPolicy, order: Order) -> PriorityKey:
+    # Rushed orders jump ahead of everything the policy would otherwise pick, FIFO among themselves
+    if order.rushed:
+        return RUSH_KEY, order.order_id
+    return policy.key(order)
+
+
+class _Course:
+    # The dishes of one table that are planned to finish together
+
+    def __init__(self, target: float):
+        self.target = target  # planned completion timestamp
+        self.pending: Dict[int, Order] = {}
+        self.fired = False  # set once any dish has started; later orders open a new course
+
+
+class TableSyncPolicy(PriorityPolicy):
+    # Fires every dish of a table's course so they all finish at the course target, which is the
+    # latest finish among its dishes. Each dish starts at target - prep_time and may be fired up to
+    # `window` minutes early to keep its station busy. Plans are updated incrementally: a new order
+    # only re-prioritises the other pending dishes of its own table, and only if the target moved.
+    # Share one instance between all stations so tapas and main dishes of a table line up.
+    # A dish that starts late holds back the rest of its course, but not the dishes already fired:
+    # a station kept full for longer than the window can still leave a course further apart.
+    name = "table-sync"
+
+    def __init__(self, window: float = 2):
+        self.window = window * 60
+        self._courses: Dict[int, _Course] = {}  # table_number -> course still accepting orders
+        self._order_courses: Dict[int, _Course] = {}  # order_id -> course of a pending order
+
+    def key(self, order: Order) -> PriorityKey:
+        return self._order_courses[order.order_id].target - order.prep_estimate * 60, order.order_id
+
+    def admit(self, order: Order) -> Iterable[Order]:
+        earliest_finish = order.order_time.timestamp() + order.prep_estimate * 60
+        course = self._courses.get(order.table_number)
+        if course is None or course.fired:
+            course = _Course(earliest_finish)
+            self._courses[order.table_number] = course
+
+        course.pending[order.order_id] = order
+        self._order_courses[order.order_id] = course
+        if earliest_finish <= course.target:
+            order.estimated_completion = datetime.fromtimestamp(course.target)
+            return ()
+        return self._move_target(course, earliest_finish, order)
+
+    def ready_at(self, order: Order) -> float:
+        if order.rushed:
+            return float("-inf")
+        return self.key(order)[0] - self.window
+
+    def start(self, order: Order, now: float) -> Iterable[Order]:
+        course = self._detach(order)
+        course.fired = True
+        finish = now + order.prep_estimate * 60
+        if finish <= course.target:
+            return ()
+        # Started late (its station was busy): hold back the rest of the course to match
+        return self._move_target(course, finish, None)
+
+    def release(self, order: Order):
+        self._detach(order)
+
+    def _detach(self, order: Order) -> _Course:
+        course = self._order_courses.pop(order.order_id)
+        del course.pending[order.order_id]
+        if not course.pending and self._courses.get(order.table_number) is course:
+            del self._courses[order.table_number]
+        return course
+
+    def _move_target(self, course: _Course, target: float, new_order) -> Iterable[Order]:
+        course.target = target
+        estimated_completion = datetime.fromtimestamp(target)
+        for pending in course.pending.values():
+            pending.estimated_completion = estimated_completion
+        return [pending for pending in course.pending.values() if pending is not new_order]
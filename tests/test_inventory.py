@@ -0,0 +1,80 @@
+import unittest
+from datetime import datetime
+
+from inventory import Inventory, StockOutError
+from kitchen_engine import KitchenEngine
+from menu import Menu
+from models import Dish
+
+START = datetime(2024, 5, 1, 19, 0)
+
+
+class InventoryTest(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu([Dish("Paella", 20, ["Rice", "prawns"], "main dish"),
+                          Dish("Gambas", 5, ["prawns"], "tapas"),
+                          Dish("Patatas bravas", 8, ["potato"], "tapas")])
+        self.inventory = Inventory(self.menu)
+        self.engine = KitchenEngine(inventory=self.inventory)
+
+    def order(self, name: str, table_number: int = 1):
+        return self.engine.submit_order(table_number, self.menu.get(name), START)
+
+    def test_placing_reserves_starting_consumes_and_cancelling_releases(self):
+        self.inventory.set_stock("prawns", 3)
+        self.inventory.set_stock("rice", 5)
+        paella, gambas = self.order("Paella"), self.order("Gambas")
+        self.assertEqual(self.inventory.levels(), {"prawns": 1, "rice": 4})
+
+        self.engine.start_order(paella.order_id, START)
+        self.assertEqual(self.inventory.levels(), {"prawns": 1, "rice": 4})
+        self.engine.cancel_order(gambas.order_id)  # only the cancelled order's portion comes back
+        self.assertEqual(self.inventory.levels(), {"prawns": 2, "rice": 4})
+        self.inventory.untrack("rice")
+        self.assertEqual(self.inventory.levels(), {"prawns": 2})
+        self.order("Patatas bravas")  # untracked ingredients are never checked
+        self.assertEqual(self.inventory.levels(), {"prawns": 2})
+
+    def test_an_order_that_would_overdraw_is_refused_without_reserving(self):
+        self.inventory.set_stock("prawns", 1)
+        self.inventory.set_stock("rice", 0)
+        with self.assertRaises(StockOutError):
+            self.order("Paella")
+        self.assertEqual(self.inventory.levels(), {"prawns": 1, "rice": 0})
+        self.assertEqual(len(self.engine.book), 0)
+        self.assertEqual(self.inventory.shortages, {})
+
+    def test_without_blocking_overdrawn_orders_are_taken_and_counted(self):
+        self.inventory.block_stock_outs = False
+        self.inventory.set_stock("prawns", 1)
+        self.order("Gambas")
+        self.order("Gambas", table_number=2)
+        self.assertEqual(self.inventory.levels(), {"prawns": -1})
+        self.assertEqual(self.inventory.shortages, {"prawns": 1})
+
+    def test_running_out_86s_the_dishes_until_the_stock_is_back(self):
+        self.inventory.set_stock("prawns", 2)
+        gambas = self.order("Gambas")
+        self.assertTrue(self.menu.is_available("Paella"))
+        self.order("Gambas", table_number=2)
+        self.assertEqual(self.menu.out_of_stock(), ["prawns"])
+        self.assertEqual([dish.name for dish in self.menu.available()], ["Patatas bravas"])
+
+        self.engine.cancel_order(gambas.order_id)  # the released portion can be ordered again
+        self.assertTrue(self.menu.is_available("Gambas"))
+        self.order("Gambas", table_number=3)
+        self.assertFalse(self.menu.is_available("Gambas"))
+        self.inventory.add_stock("Prawns", 4)
+        self.assertTrue(self.menu.is_available("Paella"))
+
+    def test_the_chefs_86_outlasts_a_restock(self):
+        self.inventory.set_stock("prawns", 0)
+        self.menu.mark_out_of_stock("prawns")
+        self.inventory.set_stock("prawns", 10)
+        self.assertFalse(self.menu.is_available("Gambas"))
+        self.menu.mark_in_stock("prawns")
+        self.assertTrue(self.menu.is_available("Gambas"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import unittest
+from datetime import datetime, timedelta
+
+from kitchen_engine import KitchenEngine, Station, default_stations, table_sync_stations
+from menu import Menu
+from models import Dish
+from prep_stats import PrepTimeStats
+from scheduling import TableSyncPolicy
+
+START = datetime(2024, 5, 1, 19, 0)
+
+
+def minutes(value: float) -> datetime:
+    return START + timedelta(minutes=value)
+
+
+class LearningTest(unittest.TestCase):
+    def setUp(self):
+        self.stats = PrepTimeStats(min_samples=3)
+        self.engine = KitchenEngine(prep_stats=self.stats)
+        self.paella = Dish("Paella", 10, ["rice"], "main dish")
+
+    def cook(self, called_done_after=None, sent_out_after=20):
+        # Starts a Paella at START, lets its time run out, then has the chef call it done (or not)
+        order = self.engine.submit_order(1, self.paella, START)
+        self.engine.start_cooking(START)
+        self.engine.tick(minutes(order.prep_estimate))
+        if called_done_after is not None:
+            self.engine.mark_ready(order.order_id, minutes(called_done_after))
+        self.engine.complete_order(order.order_id, minutes(sent_out_after))
+        return order
+
+    def test_time_up_frees_the_slot_without_learning(self):
+        order = self.engine.submit_order(1, self.paella, START)
+        self.engine.start_cooking(START)
+        self.assertEqual(self.engine.tick(minutes(10)), [order])
+        self.assertEqual(order.status, "due")
+        self.assertEqual(order.ready_time, minutes(10))
+        self.assertEqual(self.engine.stations[order.station].cooking, 0)
+        self.assertEqual(self.stats.rows(), [])
+
+    def test_dishes_running_longer_than_the_estimate_are_learned(self):
+        for _ in range(3):
+            order = self.cook(called_done_after=15)
+            self.assertEqual(order.ready_time, minutes(15))
+        self.assertAlmostEqual(self.stats.estimate(self.paella, "main dish"), 15)
+
+    def test_dishes_nobody_called_done_count_as_at_least_their_estimate(self):
+        # Only the early ones are called done; the rest are sent out when their time is up
+        for _ in range(3):
+            self.cook(called_done_after=6)
+            self.cook()
+        self.assertGreater(self.stats.estimate(self.paella, "main dish"), 7)  # 6 from the early ones alone
+
+    def test_a_dish_called_done_early_is_learned_from_the_stove(self):
+        order = self.engine.submit_order(1, self.paella, START)
+        self.engine.start_cooking(START)
+        self.engine.mark_ready(order.order_id, minutes(7))
+        self.assertEqual(order.status, "ready")
+        self.assertEqual(self.stats.rows()[0].mean, 7)
+
+
+class TableSyncTest(unittest.TestCase):
+    PAELLA = Dish("Paella", 20, ["rice"], "main dish")
+    TORTILLA = Dish("Tortilla", 9, ["egg"], "main dish")
+    STEAK = Dish("Steak", 15, ["beef"], "main dish")
+    GAMBAS = Dish("Gambas", 5, ["prawns"], "tapas")
+    CROQUETAS = Dish("Croquetas", 8, ["ham"], "tapas")
+
+    def serve(self, stations) -> dict:
+        # The two tortillas keep both main dish slots busy, so table 3's paella starts 9 minutes
+        # late, though before any of its tapas is due to fire. Every dish is sent out when its time
+        # is up. Returns table -> when its dishes were ready.
+        engine = KitchenEngine(stations)
+        for at, table_number, dishes in ((0, 1, [self.TORTILLA, self.GAMBAS]),
+                                         (0, 2, [self.TORTILLA, self.CROQUETAS]),
+                                         (0, 3, [self.PAELLA, self.GAMBAS, self.CROQUETAS]),
+                                         (12, 4, [self.STEAK, self.GAMBAS])):
+            for dish in dishes:
+                engine.submit_order(table_number, dish, minutes(at))
+        finished = {}
+        for step in range(240):
+            now = minutes(step / 4)
+            for order in engine.tick(now):
+                engine.complete_order(order.order_id, now)
+                finished.setdefault(order.table_number, []).append(order.ready_time)
+            engine.start_cooking(now)
+        self.assertEqual(engine.completed_count, 9)
+        return finished
+
+    def test_every_dish_of_a_table_finishes_within_the_window(self):
+        finished = self.serve(table_sync_stations(window=2))
+        for table_number, ready_times in finished.items():
+            with self.subTest(table=table_number):
+                self.assertLessEqual(max(ready_times) - min(ready_times), timedelta(minutes=2))
+        self.assertEqual(max(finished[3]), minutes(29))  # held back to match the late paella
+
+    def test_without_it_the_tapas_are_ready_long_before_the_mains(self):
+        finished = self.serve(default_stations())
+        self.assertGreater(max(finished[3]) - min(finished[3]), timedelta(minutes=10))
+
+
+class SharedStationsTest(unittest.TestCase):
+    # The grill cooks mains and fried dishes, the fryer only fried ones
+    STEAK = Dish("Steak", 20, ["beef"], "main dish")
+    CHIPS = Dish("Chips", 5, ["potato"], "fried")
+
+    def kitchen(self, policy=None) -> KitchenEngine:
+        return KitchenEngine([Station("grill", 1, policy, ["main dish", "fried"]),
+                              Station("fryer", 1, policy, ["fried"])])
+
+    def queue_at_grill(self, engine: KitchenEngine, table_number: int, order_time: datetime):
+        # Chips only go to the grill while the fryer has more work queued, here a platter that is
+        # cancelled straight after
+        platter = engine.submit_order(99, Dish("Fritto misto", 60, ["squid"], "fried"), order_time)
+        chips = engine.submit_order(table_number, self.CHIPS, order_time)
+        engine.cancel_order(platter.order_id)
+        self.assertEqual((platter.station, chips.station), ("fryer", "grill"))
+        return chips
+
+    def test_dispatch_weighs_the_minutes_queued_not_the_orders(self):
+        engine = self.kitchen()
+        engine.submit_order(1, self.STEAK, START)
+        self.assertEqual([engine.submit_order(2, self.CHIPS, START).station for _ in range(2)], ["fryer", "fryer"])
+        # One steak (20 minutes) at the grill is more work than two chips (10 minutes) at the fryer
+        self.assertEqual(engine.submit_order(3, self.CHIPS, START).station, "fryer")
+
+    def test_an_idle_station_takes_a_dish_stuck_behind_one_it_cannot_cook(self):
+        engine = self.kitchen()
+        engine.submit_order(1, self.STEAK, START)
+        engine.start_cooking(START)
+        engine.submit_order(2, self.STEAK, START)
+        chips = self.queue_at_grill(engine, 3, START)  # behind the second steak
+
+        self.assertEqual(engine.start_cooking(START), [chips])
+        self.assertEqual(chips.station, "fryer")
+        self.assertEqual([order.dish.name for order in engine.book.pending_orders("grill")], ["Steak"])
+        self.assertEqual(engine.book.pending_minutes("grill"), 20)
+
+    def test_stealing_waits_for_the_peer_policy(self):
+        # Table-sync holds table 2's chips so they finish with its steak, wherever they are cooked
+        engine = self.kitchen(TableSyncPolicy())
+        engine.submit_order(1, self.STEAK, START)
+        engine.start_cooking(START)
+        engine.submit_order(2, self.STEAK, START)
+        chips = self.queue_at_grill(engine, 2, START)
+
+        self.assertEqual(engine.start_cooking(START), [])
+        self.assertEqual(chips.status, "pending")
+
+    def test_editing_a_dish_type_while_it_is_queued_keeps_the_counts(self):
+        engine = self.kitchen(TableSyncPolicy())
+        menu = Menu([Dish("Croquetas", 5, ["ham"], "fried")])
+        engine.submit_order(1, self.STEAK, START)
+        engine.start_cooking(START)
+        platter = engine.submit_order(99, Dish("Fritto misto", 60, ["squid"], "fried"), START)
+        croquetas = engine.submit_order(2, menu.get("Croquetas"), START)
+        self.assertEqual(croquetas.station, "grill")
+
+        menu.update("Croquetas", Dish("Croquetas", 5, ["ham"], "main dish"))
+        # The grill still counts a fried dish the fryer cannot find: no steal and no crash
+        self.assertIsNotNone(engine.next_ready_time())
+        engine.cancel_order(croquetas.order_id)
+        engine.cancel_order(platter.order_id)
+        self.assertFalse(engine.book.has_pending("grill", ["fried", "main dish"]))
+        self.assertEqual(engine.book.pending_minutes("grill"), 0)
+        self.assertIsNone(engine.next_ready_time())
+
+        chips = self.queue_at_grill(engine, 3, START)
+        self.assertEqual(engine.start_cooking(minutes(30)), [chips])
+        self.assertEqual(chips.station, "fryer")
+
+
+if __name__ == "__main__":
+    unittest.main()
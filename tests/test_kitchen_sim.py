@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from kitchen_sim import POLICIES, SAMPLE_MENU, load_arrivals, simulate, synthetic_arrivals
+
+
+class LoadArrivalsTest(unittest.TestCase):
+    def test_orders_for_dishes_off_the_menu_are_skipped_and_reported(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "orders.trace.csv")
+            with open(path, mode='w', encoding='utf-8') as file:
+                file.write("offset_seconds,table_number,dish,visit,timestamp\n"
+                           "30.000,2,Paella,,1714590030.000\n"
+                           "0.000,1,Tortilla de patatas,,1714590000.000\n"
+                           "45.000,3,Gambas,7,1714590045.000\n"
+                           "soon,4,Gambas,,\n")
+            arrivals, errors = load_arrivals(path, SAMPLE_MENU)
+
+        self.assertEqual([(arrival.offset, arrival.dish.name, arrival.visit) for arrival in arrivals],
+                         [(30.0, "Paella", 2), (45.0, "Gambas", 7)])
+        self.assertEqual([error.line for error in errors], [3, 5])
+        self.assertIn("'Tortilla de patatas' is not on the menu", errors[0].message)
+
+
+class SimulateTest(unittest.TestCase):
+    def arrivals(self):
+        # Busy enough that dishes queue at both stations
+        return synthetic_arrivals(SAMPLE_MENU, 2000, visits_per_hour=6, seed=7)
+
+    def test_every_policy_gives_the_same_report_for_the_same_seed(self):
+        for policy in POLICIES:
+            with self.subTest(policy=policy):
+                self.assertEqual(simulate(self.arrivals(), policy), simulate(self.arrivals(), policy))
+
+    def test_the_fast_path_schedules_like_the_engine(self):
+        arrivals = self.arrivals()
+        for policy in ("default", "fifo", "shortest-prep-first"):
+            with self.subTest(policy=policy):
+                fast, engine = simulate(arrivals, policy), simulate(arrivals, policy, fast=False)
+                self.assertGreater(engine.wait_p95, 0)
+                for field in ("duration_minutes", "wait_p50", "wait_p95", "wait_p99", "spread_p50", "spread_p95"):
+                    self.assertAlmostEqual(getattr(fast, field), getattr(engine, field), places=6, msg=field)
+                for station, utilisation in engine.utilisation.items():
+                    self.assertAlmostEqual(fast.utilisation[station], utilisation, places=9)
+
+
+if __name__ == "__main__":
+    unittest.main()
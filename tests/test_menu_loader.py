@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from menu_loader import load_menu_csv
+from menu_store import MenuStore
+
+MENU_CSV = ("name,prep_time,type,ingredients\n"
+            "Paella,20,Main Dish,\"rice, prawns, saffron\"\n"
+            "Gambas,5,tapas\n"
+            "Tortilla,quick,tapas,\"egg, potato\"\n"
+            "Croquetas,0,tapas,\"ham, milk\"\n"
+            "\n"
+            "Paella,25,main dish,rice\n"
+            ",5,tapas,olives\n"
+            "Pimientos,6,,peppers\n"
+            "Pulpo,12,tapas,\n"
+            "Gazpacho,3,tapas,\"tomato, peppers\"\n")
+
+
+class LoadMenuCsvTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.path = os.path.join(self.folder, "Menu.csv")
+        with open(self.path, mode='w', encoding='utf-8') as file:
+            file.write(MENU_CSV)
+
+    def test_bad_rows_are_skipped_and_reported_while_the_rest_loads(self):
+        dishes, report = load_menu_csv(self.path)
+
+        self.assertEqual([(dish.name, dish.prep_time, dish.type, dish.ingredients) for dish in dishes],
+                         [("Paella", 20, "main dish", ["rice", "prawns", "saffron"]),
+                          ("Gazpacho", 3, "tapas", ["tomato", "peppers"])])
+        self.assertEqual((report.rows, report.loaded), (9, 2))  # the blank line is no row
+        self.assertEqual([(error.line, error.message) for error in report.errors], [
+            (3, "expected 4 columns, found 3"),
+            (4, "preparation time 'quick' is not a number"),
+            (5, "preparation time must be positive, not 0"),
+            (7, "'Paella' is already on line 2"),
+            (8, "missing dish name"),
+            (9, "missing dish type"),
+            (10, "missing ingredients"),
+        ])
+        self.assertEqual(report.summary(limit=2).splitlines(), [
+            "Loaded 2 of 9 dishes, skipped 7 rows.",
+            "Line 3: expected 4 columns, found 3",
+            "Line 4: preparation time 'quick' is not a number",
+            "... and 5 more.",
+        ])
+
+    def test_importing_into_the_store_keeps_only_the_valid_dishes(self):
+        store = MenuStore(os.path.join(self.folder, "Menu.db"))
+        self.addCleanup(store.close)
+        report = store.import_csv(self.path)
+
+        self.assertEqual(len(report.errors), 7)
+        self.assertEqual([dish.name for dish in store.load_dishes()], ["Paella", "Gazpacho"])
+        self.assertEqual(store.get("Paella").prep_time, 20)  # the first row with a name wins
+
+
+if __name__ == "__main__":
+    unittest.main()
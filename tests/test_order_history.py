@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from kitchen_engine import KitchenEngine
+from models import Dish
+from order_history import OrderHistory
+
+START = datetime(2024, 5, 1, 19, 0)
+PAELLA = Dish("Paella", 10, ["rice"], "main dish")
+
+
+class OrderHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_records_keep_when_the_dish_left_the_stove(self):
+        engine = KitchenEngine()
+        late, early = (engine.submit_order(table, PAELLA, START) for table in (1, 2))
+        engine.start_cooking(START)
+        engine.mark_ready(early.order_id, START + timedelta(minutes=7))
+        engine.tick(START + timedelta(minutes=10))
+        engine.mark_ready(late.order_id, START + timedelta(minutes=14))
+        for order in (late, early):
+            engine.complete_order(order.order_id, START + timedelta(minutes=20))
+        ready_times = {record.table_number: record.ready_time for record in engine.completed_orders}
+        self.assertEqual(ready_times, {1: (START + timedelta(minutes=14)).timestamp(),
+                                       2: (START + timedelta(minutes=7)).timestamp()})
+
+    def test_segments_of_both_layouts_are_read_back(self):
+        with open(os.path.join(self.folder.name, "history-000001.csv"), mode='w', encoding='utf-8') as file:
+            file.write("1,4,100.0,160.0,900.0,0,main dish,Paella, large\n")  # layout 1, no ready_time
+        history = OrderHistory(archive_dir=self.folder.name)
+        engine = KitchenEngine(history=history)
+        order = engine.submit_order(5, PAELLA, START)
+        engine.start_cooking(START)
+        engine.mark_ready(order.order_id, START + timedelta(minutes=12))
+        engine.complete_order(order.order_id, START + timedelta(minutes=15))
+        history.close()
+
+        old, new = OrderHistory(archive_dir=self.folder.name).archived()
+        self.assertEqual((old.dish, old.ready_time, old.completion_time), ("Paella, large", 900.0, 900.0))
+        self.assertEqual((new.table_number, new.ready_time), (5, (START + timedelta(minutes=12)).timestamp()))
+
+
+if __name__ == "__main__":
+    unittest.main()
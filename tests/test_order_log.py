@@ -0,0 +1,174 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from kitchen_engine import KitchenEngine
+from models import Dish
+from order_history import OrderHistory
+from order_log import OrderJournal
+
+START = datetime(2024, 5, 1, 19, 0)
+PAELLA = Dish("Paella", 10, ["rice"], "main dish")
+
+
+class RecoverTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.folder.name, "orders.log")
+        self.history_dir = os.path.join(self.folder.name, "history")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def run_session(self, work=None, crash=False, snapshot_every=0) -> KitchenEngine:
+        history = OrderHistory(archive_dir=self.history_dir)
+        engine = KitchenEngine(history=history)
+        journal = OrderJournal(self.log_path, snapshot_every=snapshot_every)
+        journal.recover(engine, [PAELLA])
+        engine.journal = journal
+        if work is not None:
+            work(engine)
+        if not crash:  # a crash leaves only what was written out so far
+            journal.close()
+            history.close()
+        return engine
+
+    def archived_tables(self):
+        return [record.table_number for record in OrderHistory(archive_dir=self.history_dir).archived()]
+
+    def snapshot_generation(self) -> int:
+        with open(self.log_path + ".snapshot", mode='r', encoding='utf-8') as file:
+            return int(file.readline().split(",")[1])
+
+    def live_orders(self, engine: KitchenEngine):
+        orders = list(engine.book.orders.values()) + list(engine.ready_orders.values())
+        return sorted((order.order_id, order.table_number, order.status, order.station, order.rushed,
+                       order.start_time, order.ready_time) for order in orders)
+
+    def test_orders_sent_out_before_a_restart_are_archived_once(self):
+        def serve(engine):
+            for table in (1, 2):
+                order = engine.submit_order(table, PAELLA, START)
+                engine.start_cooking(START)
+                engine.complete_order(order.order_id, START + timedelta(minutes=12))
+            engine.submit_order(3, PAELLA, START)
+
+        self.run_session(serve)
+        engine = self.run_session()
+        self.run_session()
+        self.assertEqual(self.archived_tables(), [1, 2])
+        self.assertEqual(engine.completed_count, 2)
+        self.assertEqual(len(engine.book), 1)
+
+    def test_orders_sent_out_before_a_crash_are_archived(self):
+        def serve(engine):
+            order = engine.submit_order(1, PAELLA, START)
+            engine.start_cooking(START)
+            engine.complete_order(order.order_id, START + timedelta(minutes=12))
+            engine.submit_order(2, PAELLA, START)
+
+        crashed = self.run_session(serve, crash=True)  # kept alive so its files are never closed
+        engine = self.run_session()
+        self.assertEqual(self.archived_tables(), [1])
+        self.assertEqual(engine.completed_count, 1)
+        self.assertEqual([order.table_number for order in engine.book.orders.values()], [2])
+        del crashed
+
+    def test_a_torn_last_line_is_left_out(self):
+        self.run_session(lambda engine: [engine.submit_order(table, PAELLA, START) for table in (1, 2)])
+        with open(self.log_path, mode='a', encoding='utf-8') as file:
+            file.write(f"S,3,3,{START.timestamp()!r},10,main d")  # the crash hit mid-write
+
+        engine = self.run_session(lambda engine: engine.submit_order(4, PAELLA, START))
+        self.assertEqual([(order.order_id, order.table_number) for order in engine.book.orders.values()],
+                         [(1, 1), (2, 2), (3, 4)])
+        # The new log starts clean, so the order placed after the torn line survives the next restart
+        engine = self.run_session()
+        self.assertEqual([order.table_number for order in engine.book.orders.values()], [1, 2, 4])
+
+    def test_a_log_older_than_the_snapshot_is_not_replayed(self):
+        def serve(engine):
+            order = engine.submit_order(1, PAELLA, START)
+            engine.rush_order(order.order_id, START)
+            engine.start_cooking(START)
+            engine.submit_order(2, PAELLA, START)
+
+        self.run_session(serve)
+        with open(self.log_path, mode='r', encoding='utf-8') as file:
+            old_log = file.read()
+        self.run_session()  # snapshots the orders and starts a log of the next generation
+        # A crash between writing that snapshot and starting the new log leaves the old one behind
+        with open(self.log_path, mode='w', encoding='utf-8') as file:
+            file.write(old_log)
+
+        engine = KitchenEngine()
+        journal = OrderJournal(self.log_path)
+        journal.recover(engine, [PAELLA])
+        journal.close()
+        self.assertEqual(journal.unrestored, {})
+        self.assertEqual([(order_id, status, rushed) for order_id, _, status, _, rushed, _, _
+                          in self.live_orders(engine)], [(1, "cooking", True), (2, "pending", False)])
+        self.assertEqual(engine.next_order_id, 3)
+
+    def test_a_restart_after_checkpoints_brings_back_every_order(self):
+        def serve(engine):
+            # Snapshots are taken every 3 events, so they fall between every kind of transition
+            for table in range(1, 7):
+                engine.submit_order(table, PAELLA, START)
+            engine.rush_order(6, START)
+            engine.cancel_order(5, START)
+            engine.start_cooking(START + timedelta(minutes=1))  # 6 (rushed) and 1
+            engine.start_order(2, START + timedelta(minutes=2))
+            engine.tick(START + timedelta(minutes=11))  # 6 and 1 are due, and 3 takes a free slot
+            engine.mark_ready(2, START + timedelta(minutes=8))
+            engine.complete_order(1, START + timedelta(minutes=12))
+
+        served = self.run_session(serve, snapshot_every=3)
+        self.assertGreater(self.snapshot_generation(), 3)
+        engine = self.run_session(snapshot_every=3)
+
+        self.assertEqual(self.live_orders(engine), self.live_orders(served))
+        self.assertEqual([status for _, _, status, _, _, _, _ in self.live_orders(engine)],
+                         ["ready", "cooking", "pending", "due"])
+        self.assertEqual((engine.completed_count, engine.next_order_id), (1, 7))
+        self.assertEqual(self.archived_tables(), [1])
+
+    def test_orders_no_station_cooks_any_more_are_skipped_and_reported(self):
+        self.run_session(lambda engine: engine.submit_order(1, PAELLA, START))
+        # A dessert from a session that had a dessert station, then a rush of the Paella
+        with open(self.log_path, mode='a', encoding='utf-8') as file:
+            file.write(f"S,2,2,{START.timestamp()!r},2,dessert,Sorbet\nC,2,{START.timestamp()!r},dessert\n"
+                       f"R,1,{START.timestamp()!r}\n")
+
+        engine = KitchenEngine()
+        journal = OrderJournal(self.log_path)
+        journal.recover(engine, [PAELLA])
+        journal.close()
+        self.assertEqual(list(journal.unrestored), [2])
+        self.assertIn("table 2, Sorbet", journal.unrestored[2])
+        self.assertEqual([(order.order_id, order.rushed) for order in engine.book.orders.values()], [(1, True)])
+        self.assertEqual(engine.next_order_id, 3)
+
+    def test_a_log_that_cannot_be_read_is_moved_aside_and_a_new_one_started(self):
+        self.run_session(lambda engine: engine.submit_order(1, PAELLA, START))
+        with open(self.log_path, mode='a', encoding='utf-8') as file:
+            file.write(f"S,2,2,{START.timestamp()!r},10,main dish,Paella\nZ,2,0.0\n")
+
+        engine = KitchenEngine()
+        journal = OrderJournal(self.log_path)
+        with self.assertRaises(ValueError):
+            journal.recover(engine, [PAELLA])
+        moved = journal.start_over(engine)
+        self.assertEqual(len(moved), 2)
+        self.assertTrue(all(os.path.exists(path) for path in moved))
+        engine.journal = journal
+        engine.submit_order(3, PAELLA, START)
+        journal.close()
+
+        engine = self.run_session()
+        self.assertEqual([order.table_number for order in engine.book.orders.values()], [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from inventory import Inventory
+from kitchen_engine import KitchenEngine
+from menu import Menu
+from models import Dish
+from order_client import OrderClient, RemoteKitchen, ServerError
+from order_server import OrderServer
+
+PAELLA = Dish("Paella", 10, ["rice", "prawns"], "main dish")
+GAMBAS = Dish("Gambas", 5, ["prawns"], "tapas")
+
+
+def wait_for(condition, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the server.")
+        time.sleep(0.01)
+
+
+class ServerTestCase(unittest.TestCase):
+    # An OrderServer on a loopback port, its event loop on a thread of its own
+
+    def setUp(self):
+        menu = Menu([Dish(dish.name, dish.prep_time, list(dish.ingredients), dish.type) for dish in (PAELLA, GAMBAS)])
+        self.engine = KitchenEngine(inventory=Inventory(menu))
+        self.server = OrderServer(self.engine, menu)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.port = self.call(self.server.start("127.0.0.1", 0))
+        self.terminals = []
+        self.clients = []
+
+    def tearDown(self):
+        for terminal in self.terminals:
+            terminal.close()
+        for client in self.clients:
+            self.call(client.close())
+        self.call(self.server.stop())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    def terminal(self) -> RemoteKitchen:
+        terminal = RemoteKitchen("127.0.0.1", self.port)
+        self.terminals.append(terminal)
+        return terminal
+
+    def client(self, **callbacks) -> OrderClient:
+        client = self.call(OrderClient.connect("127.0.0.1", self.port, **callbacks))
+        self.clients.append(client)
+        return client
+
+
+class EventStreamTest(ServerTestCase):
+    def test_an_order_submitted_by_one_client_reaches_the_others(self):
+        events = []
+        watcher, waiter = self.client(on_events=events.extend), self.client()
+        self.call(watcher.subscribe())
+
+        # Tortilla is not on the menu: refused, and nothing is published for it
+        results = self.call(waiter.submit([(4, "Paella"), (4, "Gambas"), (5, "Tortilla")]))
+        self.assertEqual([result["ok"] for result in results], [True, True, False])
+        order_ids = [result["order"]["order_id"] for result in results[:2]]
+
+        wait_for(lambda: sum(event["kind"] == "submitted" for event in events) >= 2)
+        submitted = [event for event in events if event["kind"] == "submitted"]
+        self.assertEqual([(event["order"]["order_id"], event["order"]["table"], event["order"]["dish"])
+                          for event in submitted], [(order_ids[0], 4, "Paella"), (order_ids[1], 4, "Gambas")])
+        self.assertEqual(len(self.engine.book), 2)
+
+
+class StockTest(ServerTestCase):
+    def test_an_86_on_one_terminal_reaches_the_others(self):
+        chef, waiter = self.terminal(), self.terminal()
+        version = waiter.menu_version
+        self.assertEqual(chef.mark_out_of_stock("Rice").result(), (["Paella"], None))
+
+        wait_for(lambda: waiter.menu_version != version)
+        self.assertFalse(waiter.menu().is_available("Paella"))
+        self.assertTrue(waiter.menu().is_available("Gambas"))
+        with self.assertRaises(ServerError):
+            waiter.submit_order(4, PAELLA).result()
+
+        version = waiter.menu_version
+        self.assertEqual(chef.mark_in_stock("rice").result(), (["Paella"], None))
+        wait_for(lambda: waiter.menu_version != version)
+        self.assertTrue(waiter.menu().is_available("Paella"))
+
+    def test_stock_set_on_a_terminal_is_used_up_by_every_terminal(self):
+        chef, waiter = self.terminal(), self.terminal()
+        chef.set_stock("prawns", 1).result()
+        version = chef.menu_version
+        waiter.submit_order(4, GAMBAS).result()
+
+        wait_for(lambda: chef.menu_version != version)
+        self.assertEqual(chef.menu().available(), [])
+        out_of_stock, levels, _ = chef.stock().result()
+        self.assertEqual((out_of_stock, levels), (["prawns"], {"prawns": 0}))
+        # A terminal connecting now gets the 86 with the menu
+        self.assertFalse(self.terminal().menu().is_available("Gambas"))
+
+
+if __name__ == "__main__":
+    unittest.main()
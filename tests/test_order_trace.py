@@ -0,0 +1,21 @@
+import os
+import tempfile
+import unittest
+
+from order_trace import TraceRecorder, read_trace
+
+
+class TraceRecorderTest(unittest.TestCase):
+    def test_sessions_replay_back_to_back(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "orders.trace.csv")
+            for session_start in (1000.0, 90000.0):  # a day apart
+                recorder = TraceRecorder(path)
+                recorder.record(session_start, 1, "Paella")
+                recorder.record(session_start + 30, 2, "Gambas")
+                recorder.close()
+            self.assertEqual([entry.offset for entry in read_trace(path)], [0, 30, 30, 60])
+
+
+if __name__ == "__main__":
+    unittest.main()